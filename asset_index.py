@@ -0,0 +1,85 @@
+import sys
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+from json_cache import load_json_model
+
+
+class AssetIndex:
+    """
+    资源索引（assets/indexes/<id>.json）的紧凑表示。
+    不再为每个对象保留一个字典：名字放在列表中（sys.intern），
+    哈希以 20 字节原始值连续存放在一个 bytes 中，大小放在 array 中，第 i 个对象对应三者的第 i 项。
+    通过 AssetIndex.load 读取时转换结果缓存在 <id>.json.bin，索引未变化时跳过 JSON 解析。
+    """
+
+    __slots__ = ("json_sha1", "names", "hashes", "sizes", "virtual", "map_to_resources")
+
+    CACHE_VERSION = 1
+
+    def __init__(self, json_sha1: str, names: List[str], hashes: bytes, sizes: array,
+                 virtual: bool = False, map_to_resources: bool = False):
+        self.json_sha1 = json_sha1
+        self.names = names
+        self.hashes = hashes
+        self.sizes = sizes
+        self.virtual = virtual
+        self.map_to_resources = map_to_resources
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def hash(self, i: int) -> str:
+        return self.hashes[i * 20:i * 20 + 20].hex()
+
+    def entries(self) -> Iterator[Tuple[str, str, int]]:
+        """按索引顺序返回 (资源名, 哈希, 大小)"""
+        hashes = self.hashes
+        for i, (name, size) in enumerate(zip(self.names, self.sizes)):
+            yield name, hashes[i * 20:i * 20 + 20].hex(), size
+
+    def objects(self) -> Iterator[Tuple[str, int]]:
+        """按哈希去重后的 (哈希, 大小)"""
+        seen = set()
+        hashes = self.hashes
+        for i, size in enumerate(self.sizes):
+            digest = hashes[i * 20:i * 20 + 20]
+            if digest in seen:
+                continue
+            seen.add(digest)
+            yield digest.hex(), size
+
+    @property
+    def total_size(self) -> int:
+        return sum(size for _, size in self.objects())
+
+    @classmethod
+    def from_json(cls, data: Dict, json_sha1: str = "") -> "AssetIndex":
+        objects = data.get("objects", {})
+        names = []
+        hashes = bytearray()
+        sizes = array("Q")
+        for name, meta in objects.items():
+            names.append(sys.intern(name))
+            hashes += bytes.fromhex(meta["hash"])
+            sizes.append(meta.get("size", 0))
+        return cls(json_sha1, names, bytes(hashes), sizes,
+                   bool(data.get("virtual")), bool(data.get("map_to_resources")))
+
+    def to_data(self) -> tuple:
+        return ("\0".join(self.names), self.hashes, self.sizes.tobytes(), self.virtual, self.map_to_resources)
+
+    @classmethod
+    def from_data(cls, data: tuple, json_sha1: str) -> "AssetIndex":
+        names, hashes, sizes_raw, virtual, map_to_resources = data
+        sizes = array("Q")
+        sizes.frombytes(sizes_raw)
+        names = [sys.intern(name) for name in names.split("\0")] if names else []
+        if len(hashes) != len(names) * 20 or len(sizes) != len(names):
+            raise ValueError("资源索引缓存已损坏")
+        return cls(json_sha1, names, hashes, sizes, virtual, map_to_resources)
+
+    @classmethod
+    def load(cls, path: str) -> "AssetIndex":
+        """读取索引文件；文件不存在时抛出 OSError，内容不是合法 JSON 时抛出 ValueError"""
+        return load_json_model(cls, path)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import os.path
+import threading
+from typing import Dict, List, Optional
+
+from asset_index import AssetIndex
+from file_util import atomic_write_json, contained_path
+from object_store import link_file
+
+
+class AssetLayout:
+    """
+    旧版本按名字读取资源：legacy 索引（virtual）放在 assets/virtual/<索引名>，
+    pre-1.6 索引（map_to_resources）放在游戏目录的 resources 下。
+    文件从 objects 中的哈希文件硬链接过来（不支持时退回 reflink、复制），
+    .layout.json 记录每个名字当前对应的哈希，再次安装时只处理哈希变化的条目。
+    """
+
+    RECORD_NAME = ".layout.json"
+    # 不用符号链接：Windows 上普通用户无法创建，旧版本游戏也可能不跟随
+    LINK_MODES = ["hardlink", "reflink", "copy"]
+
+    def __init__(self, root: str, objects_path: str):
+        self.root = root
+        self.objects_path = objects_path
+        self.record_path = os.path.join(root, self.RECORD_NAME)
+        self.link_modes: List[str] = list(self.LINK_MODES)
+        # 资源名 -> 哈希
+        self._record: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+        # _link_sync 在多个线程中同时执行，_record 的修改和保存时的拷贝都在这个锁内
+        self._record_lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(self.record_path, "r", encoding="utf-8") as f:
+                self._record = json.load(f)
+        except (OSError, ValueError):
+            self._record = {}
+
+    @staticmethod
+    def layout_root(index: AssetIndex, index_id: str, assets_root: str, game_directory: str) -> Optional[str]:
+        """索引需要按名字展开时返回展开目录，否则返回 None"""
+        if index.map_to_resources:
+            return os.path.join(game_directory, "resources")
+        if index.virtual:
+            return os.path.join(assets_root, "virtual", index_id)
+        return None
+
+    @classmethod
+    def for_index(cls, index: AssetIndex, index_id: str, assets_root: str,
+                  game_directory: str) -> Optional["AssetLayout"]:
+        root = cls.layout_root(index, index_id, assets_root, game_directory)
+        if root is None:
+            return None
+        return cls(root, os.path.join(assets_root, "objects"))
+
+    def _target(self, name: str) -> Optional[str]:
+        # 防止 ../ 之类的名字写到目录之外
+        return contained_path(self.root, name)
+
+    def diff(self, index: AssetIndex, force: bool = False) -> Dict[str, List[str]]:
+        """
+        返回需要（重新）链接的条目：哈希 -> 资源名列表；
+        同时删除上次展开过、但已不在索引中的文件。force=True 时所有条目都重新链接。
+        """
+        names = set(index.names)
+        for name in [n for n in self._record if n not in names]:
+            target = self._target(name)
+            if target is not None:
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+            with self._record_lock:
+                del self._record[name]
+            self._dirty = True
+        pending: Dict[str, List[str]] = {}
+        for name, hash_, _ in index.entries():
+            if not force and self._record.get(name) == hash_:
+                continue
+            pending.setdefault(hash_, []).append(name)
+        return pending
+
+    def _link_sync(self, hash_: str, names: List[str]):
+        src = os.path.join(self.objects_path, hash_[:2], hash_)
+        for name in names:
+            target = self._target(name)
+            if target is None:
+                continue
+            link_file(src, target, self.link_modes)
+            with self._record_lock:
+                self._record[name] = hash_
+        self._dirty = True
+
+    def _link_many_sync(self, pending: Dict[str, List[str]]):
+        for hash_, names in pending.items():
+            self._link_sync(hash_, names)
+
+    async def link(self, hash_: str, names: List[str]):
+        """对象已在 objects 中时调用，生成指向它的所有资源名"""
+        await asyncio.to_thread(self._link_sync, hash_, names)
+
+    async def link_many(self, pending: Dict[str, List[str]]):
+        if pending:
+            await asyncio.to_thread(self._link_many_sync, pending)
+
+    def _save_sync(self, record: Dict[str, str]):
+        atomic_write_json(self.record_path, record, ensure_ascii=False, separators=(",", ":"))
+
+    async def save(self):
+        async with self._lock:
+            if self._dirty:
+                self._dirty = False
+                with self._record_lock:
+                    record = dict(self._record)
+                await asyncio.to_thread(self._save_sync, record)
+
+
+def game_assets_path(minecraft_folder_path: str, index_id: str, game_directory: str) -> str:
+    """启动参数 ${game_assets}：优先 assets/virtual/<索引名>，只展开到 resources 的旧版本用 resources"""
+    virtual = os.path.join(minecraft_folder_path, "assets", "virtual", index_id)
+    resources = os.path.join(game_directory, "resources")
+    if (not os.path.exists(os.path.join(virtual, AssetLayout.RECORD_NAME))
+            and os.path.exists(os.path.join(resources, AssetLayout.RECORD_NAME))):
+        return resources
+    return virtual
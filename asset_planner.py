@@ -0,0 +1,99 @@
+import asyncio
+import os
+import os.path
+from typing import Dict, Iterable, List, Optional, Set
+
+from asset_index import AssetIndex
+
+ASSETS_BASE_URL = "https://resources.download.minecraft.net"
+
+
+class AssetPlan:
+    __slots__ = ("names", "unique", "present", "missing")
+
+    def __init__(self):
+        # 索引中的条目数（可能多个名字指向同一哈希）
+        self.names = 0
+        self.unique = 0
+        self.present = 0
+        # 需要下载的对象：哈希 -> 大小
+        self.missing: Dict[str, int] = {}
+
+    @property
+    def missing_bytes(self) -> int:
+        return sum(self.missing.values())
+
+    def summary(self) -> str:
+        return (f"{self.names} 个资源条目，{self.unique} 个不同对象，已存在 {self.present}，"
+                f"需下载 {len(self.missing)}（{self.missing_bytes / 1024 / 1024:.1f} MiB）")
+
+
+class AssetPlanner:
+    """
+    资源下载计划：按哈希合并一个或多个资源索引中的对象，
+    用 objects 下 256 个子目录各一次的目录列表判断哪些对象已在磁盘上，
+    只把缺失的哈希交给下载器。
+    对象文件总是先写入 .part 再原子改名，目录中出现的哈希文件名即代表完整的文件；
+    内容是否被外部修改由 IntegrityChecker 负责检查。
+    目录列表在同一个 planner 中只读取一次，之后通过 mark_present 增量更新。
+    """
+
+    def __init__(self, objects_path: str):
+        self.objects_path = objects_path
+        self._buckets: Optional[List[Set[str]]] = None
+
+    def _scan_sync(self) -> List[Set[str]]:
+        buckets = []
+        for i in range(256):
+            try:
+                buckets.append(set(os.listdir(os.path.join(self.objects_path, f"{i:02x}"))))
+            except OSError:
+                buckets.append(set())
+        return buckets
+
+    def object_path(self, hash_: str) -> str:
+        return os.path.join(self.objects_path, hash_[:2], hash_)
+
+    @staticmethod
+    def object_url(hash_: str) -> str:
+        return f"{ASSETS_BASE_URL}/{hash_[:2]}/{hash_}"
+
+    def is_present(self, hash_: str) -> bool:
+        if self._buckets is None:
+            self._buckets = self._scan_sync()
+        return hash_ in self._buckets[int(hash_[:2], 16)]
+
+    def mark_present(self, hash_: str):
+        if self._buckets is not None:
+            self._buckets[int(hash_[:2], 16)].add(hash_)
+
+    def invalidate(self):
+        """磁盘被外部修改后调用，下次规划时重新读取目录列表"""
+        self._buckets = None
+
+    def plan_sync(self, indexes: Iterable[AssetIndex], trust_disk: bool = True) -> AssetPlan:
+        """trust_disk=False 时（强制校验）所有对象都列为缺失，交给下载器逐个校验"""
+        plan = AssetPlan()
+        seen: Set[str] = set()
+        for index in indexes:
+            plan.names += len(index)
+            for hash_, size in index.objects():
+                if hash_ in seen:
+                    continue
+                seen.add(hash_)
+                if trust_disk and self.is_present(hash_):
+                    plan.present += 1
+                else:
+                    plan.missing[hash_] = size
+        plan.unique = len(seen)
+        return plan
+
+    async def plan(self, indexes: Iterable[AssetIndex], trust_disk: bool = True) -> AssetPlan:
+        return await asyncio.to_thread(self.plan_sync, list(indexes), trust_disk)
+
+    def plan_files_sync(self, index_paths: Iterable[str], trust_disk: bool = True) -> AssetPlan:
+        return self.plan_sync([AssetIndex.load(path) for path in index_paths], trust_disk)
+
+    async def plan_files(self, index_paths: Iterable[str], trust_disk: bool = True) -> AssetPlan:
+        """读取和规划都在线程中完成，大索引不会阻塞事件循环"""
+        return await asyncio.to_thread(self.plan_files_sync, list(index_paths), trust_disk)
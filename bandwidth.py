@@ -0,0 +1,96 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# 当前任务的下载是否属于后台流量。调度器的后台 worker 会设置它，由它创建的子任务（分段下载等）自动继承
+_background: ContextVar[bool] = ContextVar("background_traffic", default=False)
+
+
+def is_background() -> bool:
+    return _background.get()
+
+
+@contextmanager
+def background():
+    """在此范围内提交的下载任务按后台流量调度和限速"""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class TokenBucket:
+    """
+    令牌桶：令牌按 rate 字节/秒生成，最多积攒 burst 字节。
+    取令牌时先扣除，不够时按欠下的量等待，多个下载同时取令牌时总速率仍为 rate。
+    rate 为 0 表示不限速。
+    """
+
+    def __init__(self, rate: float = 0.0, burst: Optional[float] = None):
+        self.rate = 0.0
+        self.burst = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: float, burst: Optional[float] = None):
+        self._refill()
+        self.rate = max(0.0, rate)
+        # 默认允许 0.1 秒的突发，至少一个网络读取块
+        self.burst = burst if burst is not None else max(64 * 1024, self.rate / 10)
+        self._tokens = min(self._tokens, self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def consume(self, size: int) -> float:
+        """返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        self._tokens -= size
+        if self._tokens >= 0:
+            return 0.0
+        delay = -self._tokens / self.rate
+        await asyncio.sleep(delay)
+        return delay
+
+
+class BandwidthLimiter:
+    """
+    下载限速，分前台和后台两类流量：
+    rate 限制所有下载的总速率，background_rate 另外限制后台预下载的速率（单位都是字节/秒，0 为不限）。
+    后台流量只使用空闲的带宽：前台下载开始时调度器立即中止后台下载，前台全部完成后再继续。
+    """
+
+    def __init__(self, rate: float = 0.0, background_rate: float = 0.0):
+        self.total = TokenBucket(rate)
+        self.background = TokenBucket(background_rate)
+
+    def set_rates(self, rate: float, background_rate: Optional[float] = None):
+        self.total.set_rate(rate)
+        if background_rate is not None:
+            self.background.set_rate(background_rate)
+
+    def read_size(self) -> int:
+        """
+        限速时每次从连接读取的最大字节数，0 表示不限速、按网络到达的大小读取。
+        数据先读入再等待，并发的每个连接最多超前一次读取的量，所以按速率取较小的块（约 1/256 秒的流量）。
+        """
+        rate = self.total.rate
+        if is_background() and self.background.rate > 0:
+            rate = min(rate, self.background.rate) if rate > 0 else self.background.rate
+        if rate <= 0:
+            return 0
+        return int(min(64 * 1024, max(4 * 1024, rate / 256)))
+
+    async def acquire(self, size: int) -> float:
+        """收到 size 字节后调用，超过限速时在这里等待，返回等待的秒数"""
+        waited = await self.background.consume(size) if is_background() else 0.0
+        return waited + await self.total.consume(size)
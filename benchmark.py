@@ -0,0 +1,1397 @@
+"""
+下载性能基准测试。
+
+在本地启动一个模拟 Mojang 的 aiohttp 服务器（tests/fake_mojang.py，版本清单、版本 JSON、资源索引、资源文件、库、客户端 jar，
+内容按随机种子生成），可以设置延迟、带宽上限、错误率和传输中途断开的比例；
+然后在子进程中依次运行冷安装、热安装、校验和崩溃后续传等场景，
+记录耗时、CPU 时间、峰值内存、峰值打开的 socket 数、客户端侧的新建连接（握手）数和连接复用率，
+以及服务器侧的请求数、流量和连接数，结果保存为 JSON。
+
+    python benchmark.py --output result.json
+    python benchmark.py --latency 0.05 --bandwidth 20 --disconnect-rate 0.02 --baseline result.json
+
+logflood 子命令测试游戏日志管道：子进程尽快输出大量 log4j XML 事件，
+记录事件循环的最大延迟、内存占用、界面收到的批次数和每批大小。
+
+    python benchmark.py logflood --lines 200000
+
+startup 子命令在 Qt 的 offscreen 平台下反复冷启动 main.py，记录从创建进程到窗口可以交互的耗时、
+各启动阶段的耗时（见 startup_profiler.py）和启动时是否导入了应延迟的模块。
+
+    python benchmark.py startup --repeat 10 --budget-ms 800
+
+ratelimit 子命令检查下载限速：先在限速下安装一次，比较稳定阶段的实际速率与上限；
+再在后台预下载的同时开始前台安装，检查后台速率、前台进行期间后台是否让出，以及前台速率。
+
+    python benchmark.py ratelimit --limit 8 --background-limit 4 --tolerance 0.1
+
+modpack 子命令在服务器上生成几百个模组，打包成 .mrpack 和 CurseForge 整合包（服务器同时模拟 CurseForge API），
+依次测试首次导入、再次导入（不应产生下载）、导入到一半中断后继续，以及另一个实例导入同样模组的 CurseForge 整合包
+（文件按哈希从对象库链接，不应产生下载），并检查每个文件的 sha512 和 overrides。
+
+    python benchmark.py modpack --mods 300
+
+stream 子命令比较单个文件的下载循环：改进前每次读 1 KiB、每块一次线程池写入、下载完再读一遍文件算 SHA1，
+与现在的大块读取、缓冲写入、边下载边算 SHA1、写临时文件后原子替换；分别下载一个 50 MB 文件和几百个 4 KB 文件，
+记录耗时和 CPU 时间（服务器在同一进程内，两种做法的服务器开销相同），并检查下载过程中目标路径上是否出现过半截文件。
+
+    python benchmark.py stream --large-mb 50 --small-files 500
+
+resolve 子命令生成一个 500 个库的整合包式版本 JSON（共用的 LWJGL 规则、按系统版本和 features 的规则、
+老格式 natives、重复的库），比较改进前逐个库遍历规则的做法与 LibraryResolver 的首次解析和同一进程内再次解析（按版本 JSON 的 sha1 命中）。
+
+    python benchmark.py resolve --libraries 500
+
+models 子命令生成一个 5000 个名字的资源索引和 500 个库的版本 JSON，分别比较直接 json.loads、首次读取（解析后写 .bin 缓存）
+和再次读取（命中缓存）的耗时，以及读取结果保留的内存和读取期间的峰值内存；并检查修改 JSON 后缓存失效、重新写入。
+
+    python benchmark.py models --assets 5000
+
+natives 子命令生成一个完整的 1.8.9 式（classifiers + natives）和 1.20 式（natives-xxx 构件）的版本，
+分别测试首次安装（下载的同时解压）、再次启动（不下载也不重新解压）、只解压（与逐个 jar 串行解压对比），
+并检查解压出的动态库内容和 exclude 规则。
+
+    python benchmark.py natives --repeat 5
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import os.path
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+from bandwidth import BandwidthLimiter, is_background
+
+# 模拟服务器放在 tests/ 中，与测试共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests"))
+from fake_mojang import ASSET_INDEX_ID, VERSION_ID, FakeMojangServer, ServerConfig, local_installer  # noqa: E402
+
+# 子进程模拟崩溃时使用的退出码
+CRASH_EXIT_CODE = 75
+SCENARIOS = ["cold", "warm", "verify", "resume"]
+# 与基线比较的指标，数值越小越好
+COMPARED_METRICS = ["wall_time", "cpu_time", "peak_rss_kb", "peak_sockets"]
+
+
+def _open_sockets() -> Optional[int]:
+    """当前进程打开的 socket 数（仅 Linux）"""
+    fd_dir = "/proc/self/fd"
+    try:
+        names = os.listdir(fd_dir)
+    except OSError:
+        return None
+    count = 0
+    for name in names:
+        try:
+            if os.readlink(os.path.join(fd_dir, name)).startswith("socket:"):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+def _rss_kb() -> Optional[int]:
+    """当前常驻内存（仅 Linux）"""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_kb() -> Optional[int]:
+    # Linux 上 ru_maxrss 会继承 fork 出子进程时父进程的内存，读取 exec 之后的 VmHWM
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上单位是字节，Linux 上是 KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+async def _client(args) -> Dict:
+    """在子进程中运行一个场景，进程级的资源统计只包含客户端本身"""
+    installer = local_installer(args.server, args.dir, args.store, args.concurrency)
+    peak_sockets = 0
+
+    async def sample():
+        nonlocal peak_sockets
+        while True:
+            sockets = _open_sockets()
+            if sockets is not None:
+                peak_sockets = max(peak_sockets, sockets)
+            if args.crash_after_bytes and installer.downloader is not None \
+                    and installer.metrics.bytes_received >= args.crash_after_bytes:
+                # 模拟进程崩溃：不执行任何清理和保存
+                os._exit(CRASH_EXIT_CODE)
+            await asyncio.sleep(0.02)
+
+    sampler = asyncio.create_task(sample())
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    ok = True
+    error = None
+    async with installer:
+        installer.begin_tracking()
+        try:
+            if args.scenario == "verify":
+                report, _ = await installer.verify(VERSION_ID, full=args.full, repair=False)
+                ok = report.ok
+            else:
+                results = await installer.install_many([VERSION_ID])
+                error = results[VERSION_ID]
+                ok = error is None
+        except Exception as e:
+            ok = False
+            error = e
+        snapshot = installer.metrics.snapshot()
+        connections = installer.sessions.stats.snapshot()
+    wall_time = time.perf_counter() - started
+    cpu_time = time.process_time() - cpu_started
+    sampler.cancel()
+    return {
+        "ok": ok,
+        "error": str(error) if error else None,
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        "peak_rss_kb": _peak_rss_kb(),
+        "peak_sockets": peak_sockets if _open_sockets() is not None else None,
+        "bytes_received": snapshot["bytes_received"],
+        "files_completed": snapshot["files_completed"],
+        "files_cached": snapshot["files_cached"],
+        "retries": snapshot["retries"],
+        "files_failed": snapshot["files_failed"],
+        # 客户端侧的连接统计，与服务器侧的 connections（实际接受的 TCP 连接数）对照
+        "http_requests": connections["requests"],
+        "connections_created": connections["connections_created"],
+        "connections_reused": connections["connections_reused"],
+        "reuse_rate": connections["reuse_rate"],
+        "connect_time": connections["connect_time"],
+        "dns_cache_hits": connections["dns_cache_hits"],
+        "dns_cache_misses": connections["dns_cache_misses"],
+    }
+
+
+async def _run_client_process(server: FakeMojangServer, scenario: str, work_dir: str, args,
+                              crash_after_bytes: int = 0, full: bool = False) -> Dict:
+    result_path = os.path.join(work_dir, f"{scenario}.result.json")
+    command = [sys.executable, os.path.abspath(__file__), "client", "--server", server.base_url,
+               "--dir", os.path.join(work_dir, "minecraft"), "--store", os.path.join(work_dir, "store"),
+               "--scenario", scenario, "--result", result_path, "--concurrency", str(args.concurrency)]
+    if crash_after_bytes:
+        command += ["--crash-after-bytes", str(crash_after_bytes)]
+    if full:
+        command.append("--full")
+    server.reset_stats()
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.DEVNULL if not args.verbose else None,
+        stderr=asyncio.subprocess.DEVNULL if not args.verbose else None
+    )
+    return_code = await process.wait()
+    if crash_after_bytes and return_code == CRASH_EXIT_CODE:
+        result = {"crashed": True}
+    else:
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = {"ok": False, "error": f"子进程退出码 {return_code}"}
+    result["server"] = dict(server.stats)
+    return result
+
+
+async def run_suite(args) -> Dict:
+    config = ServerConfig(args.latency, args.bandwidth * 1024 * 1024, args.error_rate, args.disconnect_rate,
+                          args.seed)
+    server = FakeMojangServer(config, args.assets, args.libraries, args.large_libraries,
+                              int(args.client_mb * 1024 * 1024))
+    await server.start()
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    runs: Dict[str, List[Dict]] = {s: [] for s in scenarios}
+    root = tempfile.mkdtemp(prefix="ecl-bench-")
+    try:
+        for i in range(args.repeat):
+            work_dir = os.path.join(root, f"run{i}")
+            # cold / warm / verify 依次在同一目录上运行
+            if {"cold", "warm", "verify"} & set(scenarios):
+                cold = await _run_client_process(server, "cold", work_dir, args)
+                if "cold" in runs:
+                    runs["cold"].append(cold)
+                if "warm" in runs:
+                    runs["warm"].append(await _run_client_process(server, "warm", work_dir, args))
+                if "verify" in runs:
+                    runs["verify"].append(await _run_client_process(server, "verify", work_dir, args,
+                                                                    full=args.full_verify))
+            if "resume" in runs:
+                # 下载到一半时强制退出，再次安装时统计续传的耗时和额外流量
+                resume_dir = os.path.join(root, f"resume{i}")
+                crash = await _run_client_process(server, "cold", resume_dir, args,
+                                                  crash_after_bytes=int(server.content_bytes * args.crash_at))
+                result = await _run_client_process(server, "resume", resume_dir, args)
+                result["crash"] = crash
+                transferred = crash["server"]["bytes_sent"] + result["server"]["bytes_sent"]
+                result["transfer_overhead"] = transferred / server.content_bytes - 1
+                runs["resume"].append(result)
+    finally:
+        await server.stop()
+        if args.keep:
+            print(f"工作目录保留在 {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "version": 1,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": _environment(),
+        "config": {
+            "server": config.to_dict(),
+            "assets": args.assets, "libraries": args.libraries, "large_libraries": args.large_libraries,
+            "client_mb": args.client_mb, "content_bytes": server.content_bytes,
+            "concurrency": args.concurrency, "repeat": args.repeat,
+        },
+        "scenarios": {name: {"median": _median(results), "runs": results} for name, results in runs.items()},
+    }
+
+
+def _median(results: List[Dict]) -> Dict:
+    median = {}
+    for key in COMPARED_METRICS + ["bytes_received", "connections_created", "reuse_rate"]:
+        values = [r[key] for r in results if isinstance(r.get(key), (int, float))]
+        if values:
+            median[key] = statistics.median(values)
+    median["ok"] = all(r.get("ok") for r in results)
+    return median
+
+
+def _environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "commit": commit}
+
+
+def compare(result: Dict, baseline: Dict) -> List[tuple]:
+    """返回 [(场景, 指标, 基线值, 当前值, 变化比例)]"""
+    rows = []
+    for name, current in result["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for key in COMPARED_METRICS:
+            old, new = base["median"].get(key), current["median"].get(key)
+            if old and new is not None:
+                rows.append((name, key, old, new, new / old - 1))
+    return rows
+
+
+def print_summary(result: Dict):
+    for name, scenario in result["scenarios"].items():
+        median = scenario["median"]
+        server = scenario["runs"][-1]["server"] if scenario["runs"] else {}
+        line = (f"{name:7s} {'成功' if median['ok'] else '失败'}  耗时 {median.get('wall_time', 0):.2f}s  "
+                f"CPU {median.get('cpu_time', 0):.2f}s  峰值内存 {median.get('peak_rss_kb', 0) / 1024:.0f} MiB  "
+                f"峰值 socket {median.get('peak_sockets')}  请求 {server.get('requests')}  "
+                f"连接 {server.get('connections')}  流量 {server.get('bytes_sent', 0) / 1024 / 1024:.1f} MiB")
+        if median.get("connections_created") is not None:
+            line += (f"  新建连接 {median['connections_created']:.0f}  "
+                     f"连接复用率 {median.get('reuse_rate', 0) * 100:.1f}%")
+        if name == "resume" and scenario["runs"]:
+            line += f"  额外流量 {scenario['runs'][-1]['transfer_overhead'] * 100:.1f}%"
+        print(line)
+
+
+# logflood 子进程：模拟模组加载时的日志暴增，每 50 条带一个异常堆栈，stderr 夹杂普通文本
+_FLOOD_SCRIPT = """
+import sys, time
+out = sys.stdout
+levels = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+trace = "java.lang.IllegalStateException: bench\\n" + "\\tat net.example.Mod.load(Mod.java:42)\\n" * 20
+for i in range({lines}):
+    level = levels[i % len(levels)]
+    event = ('<log4j:Event logger="net.example.Mod{{0}}" timestamp="{{1}}" level="{{2}}" thread="Worker-Main-{{3}}">\\n'
+             '  <log4j:Message><![CDATA[Loading mod resource {{4}} &amp; <ok>]]></log4j:Message>\\n'
+             .format(i % 97, int(time.time() * 1000), level, i % 8, i))
+    if i % 50 == 0:
+        event += '  <log4j:Throwable><![CDATA[' + trace + ']]></log4j:Throwable>\\n'
+    out.write(event + '</log4j:Event>\\n')
+    if i % 1000 == 0:
+        sys.stderr.write("plain stderr line " + str(i) + "\\n")
+out.flush()
+"""
+
+
+async def run_log_flood(args) -> Dict:
+    from game_log import GameLogPipeline
+
+    work_dir = tempfile.mkdtemp(prefix="ecl-logflood-")
+    pipeline = GameLogPipeline(os.path.join(work_dir, "latest.log"), capacity=args.capacity,
+                               max_bytes=args.max_log_mb * 1024 * 1024)
+    batches = []
+    ui_time = 0.0
+
+    def on_batch(records, skipped):
+        # 与界面相同：每批格式化后一次性追加
+        nonlocal ui_time
+        started = time.perf_counter()
+        "\n".join(r.format() for r in records)
+        ui_time += time.perf_counter() - started
+        batches.append((len(records), skipped))
+
+    pipeline.on_batch = on_batch
+    lags = []
+    rss = []
+    stop = False
+
+    async def tick():
+        interval = 0.01
+        while not stop:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - started - interval)
+            if len(lags) % 5 == 0:
+                rss.append(_rss_kb())
+
+    rss_before = _rss_kb()
+    ticker = asyncio.create_task(tick())
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", _FLOOD_SCRIPT.format(lines=args.lines),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    exit_code = await pipeline.run(process)
+    wall_time = time.perf_counter() - started
+    stop = True
+    await ticker
+    log_files = [name for name in os.listdir(work_dir) if name.endswith(".log")]
+    log_bytes = sum(os.path.getsize(os.path.join(work_dir, name)) for name in log_files)
+    if not args.keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    lags.sort()
+    samples = [r for r in rss if r is not None]
+    return {
+        "ok": exit_code == 0 and pipeline.lines == args.lines + (args.lines + 999) // 1000,
+        "records": pipeline.lines,
+        "wall_time": wall_time,
+        "records_per_second": pipeline.lines / wall_time,
+        "loop_lag_max_ms": lags[-1] * 1000 if lags else None,
+        "loop_lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else None,
+        "ui_batches": len(batches),
+        "ui_max_batch": max((n for n, _ in batches), default=0),
+        "ui_skipped": sum(s for _, s in batches),
+        "ui_time": ui_time,
+        "buffer_records": len(pipeline.buffer),
+        "log_files": len(log_files),
+        "log_bytes": log_bytes,
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": max(samples) if samples else None,
+    }
+
+
+def run_startup(args) -> Dict:
+    main_dir = os.path.dirname(os.path.abspath(__file__))
+    reports = []
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="ecl-startup-") as work_dir:
+        report_path = os.path.join(work_dir, "startup.json")
+        env = dict(os.environ, QT_QPA_PLATFORM=args.platform, ECL_STARTUP_PROFILE=report_path,
+                   ECL_STARTUP_QUIT="1")
+        output = None if args.verbose else subprocess.DEVNULL
+        for _ in range(args.repeat):
+            started = time.time()
+            try:
+                subprocess.run([sys.executable, os.path.join(main_dir, "main.py")], cwd=main_dir, env=env,
+                               stdout=output, stderr=output, timeout=args.timeout, check=True)
+                with open(report_path, "r", encoding="utf-8") as f:
+                    report = json.load(f)
+                os.remove(report_path)
+            except (subprocess.SubprocessError, OSError, ValueError) as e:
+                print(f"启动失败: {e}")
+                failures += 1
+                continue
+            report["wall_ms"] = (report["finished_at"] - started) * 1000
+            reports.append(report)
+
+    def median(key):
+        values = [r[key] for r in reports if r.get(key) is not None]
+        return statistics.median(values) if values else None
+
+    phases = {}
+    for report in reports:
+        for phase, elapsed in report["phases_ms"].items():
+            phases.setdefault(phase, []).append(elapsed)
+    deferred = sorted({name for r in reports for name in r["deferred_modules_loaded"]})
+    wall_ms = median("wall_ms")
+    return {
+        "ok": bool(reports) and not failures and not deferred
+              and (args.budget_ms is None or wall_ms <= args.budget_ms),
+        "runs": len(reports),
+        "failures": failures,
+        "wall_ms": wall_ms,
+        "wall_ms_max": max((r["wall_ms"] for r in reports), default=None),
+        "interpreter_ms": median("interpreter_ms"),
+        **{f"{phase}_ms": statistics.median(values) for phase, values in phases.items()},
+        "modules": median("modules"),
+        "deferred_modules_loaded": deferred,
+    }
+
+
+class _CountingLimiter(BandwidthLimiter):
+    """按流量类别统计经过限速的字节数，另外统计前台下载进行期间的后台流量"""
+
+    def __init__(self, rate: float, background_rate: float):
+        super().__init__(rate, background_rate)
+        self.scheduler = None
+        self.foreground_bytes = 0
+        self.background_bytes = 0
+        self.background_during_foreground = 0
+
+    async def acquire(self, size: int) -> float:
+        if is_background():
+            self.background_bytes += size
+            if self.scheduler is not None and self.scheduler.foreground_active:
+                self.background_during_foreground += size
+        else:
+            self.foreground_bytes += size
+        return await super().acquire(size)
+
+
+def _window_rate(samples: List[tuple], index: int, start: float, end: float) -> Optional[float]:
+    """samples 为 (时间, 前台字节数, 后台字节数)，返回 [start, end] 内的平均速率"""
+    inside = [s for s in samples if start <= s[0] <= end]
+    if len(inside) < 2 or inside[-1][0] <= inside[0][0]:
+        return None
+    return (inside[-1][index] - inside[0][index]) / (inside[-1][0] - inside[0][0])
+
+
+async def run_ratelimit(args) -> Dict:
+    from installer import Installer
+    from prefetch import Prefetcher
+
+    cap = args.limit * 1024 * 1024
+    background_cap = args.background_limit * 1024 * 1024
+    server = FakeMojangServer(ServerConfig(seed=args.seed), args.assets, args.libraries, args.large_libraries,
+                              int(args.client_mb * 1024 * 1024))
+    await server.start()
+    root = tempfile.mkdtemp(prefix="ecl-ratelimit-")
+
+    def make_installer(name: str) -> Installer:
+        installer = local_installer(server.base_url, os.path.join(root, name), os.path.join(root, f"{name}-store"),
+                                     args.concurrency)
+        installer.limiter = _CountingLimiter(cap, background_cap)
+        return installer
+
+    async def sample(limiter: _CountingLimiter, samples: List[tuple]):
+        while True:
+            samples.append((time.perf_counter(), limiter.foreground_bytes, limiter.background_bytes))
+            await asyncio.sleep(0.05)
+
+    def within(rate: Optional[float], limit: float) -> bool:
+        return rate is not None and abs(rate / limit - 1) <= args.tolerance
+
+    result: Dict = {"limit": cap, "background_limit": background_cap, "content_bytes": server.content_bytes}
+    try:
+        # 1. 只有前台下载
+        installer = make_installer("foreground")
+        samples: List[tuple] = []
+        async with installer:
+            sampler = asyncio.create_task(sample(installer.limiter, samples))
+            started = time.perf_counter()
+            error = (await installer.install_many([VERSION_ID]))[VERSION_ID]
+            finished = time.perf_counter()
+            sampler.cancel()
+        rate = _window_rate(samples, 1, started + args.warmup, finished - args.warmup)
+        result.update({
+            "install_ok": error is None,
+            "install_time": finished - started,
+            "foreground_rate": rate,
+            "foreground_rate_ok": within(rate, cap),
+        })
+
+        # 2. 后台预下载进行中开始前台安装
+        installer = make_installer("prefetch")
+        samples = []
+        async with installer:
+            installer.limiter.scheduler = installer.scheduler
+            prefetcher = Prefetcher(installer, os.path.join(root, "prefetch", "background"), recent=0)
+            sampler = asyncio.create_task(sample(installer.limiter, samples))
+            background_started = time.perf_counter()
+            prefetch_task = prefetcher.start()
+            await asyncio.sleep(args.foreground_after)
+            foreground_started = time.perf_counter()
+            await installer.install(VERSION_ID, os.path.join(root, "prefetch", "foreground"))
+            foreground_finished = time.perf_counter()
+            prefetched = await asyncio.wait_for(prefetch_task, args.timeout)
+            sampler.cancel()
+        background_rate = _window_rate(samples, 2, background_started + args.warmup, foreground_started)
+        rate = _window_rate(samples, 1, foreground_started + args.warmup, foreground_finished - args.warmup)
+        limiter = installer.limiter
+        result.update({
+            "prefetch_ok": all(e is None for e in prefetched.values()),
+            "background_rate": background_rate,
+            "background_rate_ok": not background_cap or within(background_rate, min(background_cap, cap)),
+            "background_bytes_during_foreground": limiter.background_during_foreground,
+            "background_yielded": limiter.background_during_foreground <= args.slack_kb * 1024,
+            "foreground_rate_with_prefetch": rate,
+            "foreground_rate_with_prefetch_ok": within(rate, cap),
+            "background_bytes": limiter.background_bytes,
+        })
+    finally:
+        await server.stop()
+        if args.keep:
+            print(f"工作目录保留在 {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    result["ok"] = all(result[key] for key in ("install_ok", "foreground_rate_ok", "prefetch_ok",
+                                                "background_rate_ok", "background_yielded",
+                                                "foreground_rate_with_prefetch_ok"))
+    return result
+
+
+def _build_modpacks(server: FakeMojangServer, work_dir: str, mods: int, max_kb: int,
+                    seed: int) -> Tuple[str, Dict[str, str], str, Dict[str, str]]:
+    """
+    在服务器上生成模组文件，写出引用它们的 .mrpack 和 CurseForge 整合包（都依赖 VERSION_ID 原版）。
+    .mrpack 中约 5% 的条目在另一个路径重复使用已有的文件，另有一个只用于服务端的文件和一个被 overrides 覆盖的模组。
+    返回 (.mrpack 路径, 期望的 {相对路径: sha512}, CurseForge 整合包路径, 期望的 {相对路径: sha512})。
+    """
+    rng = random.Random(seed)
+    index_files = []
+    manifest_files = []
+    expected: Dict[str, str] = {}
+    expected_curseforge: Dict[str, str] = {}
+    unique = []
+    for i in range(mods):
+        if unique and rng.random() < 0.05:
+            entry = dict(rng.choice(unique), path=f"mods/copy{i}.jar")
+            index_files.append(entry)
+            expected[entry["path"]] = entry["hashes"]["sha512"]
+            continue
+        resource_pack = i % 50 == 49
+        name = f"pack{i}.zip" if resource_pack else f"mod{i}.jar"
+        data = rng.randbytes(rng.randint(10 * 1024, max_kb * 1024))
+        info = server.add(f"/data/p{i}/versions/v1/{name}", data)
+        sha512 = hashlib.sha512(data).hexdigest()
+        path = f"{'resourcepacks' if resource_pack else 'mods'}/{name}"
+        entry = {"path": path, "hashes": {"sha1": info["sha1"], "sha512": sha512},
+                 "env": {"client": "required", "server": "required"}, "downloads": [info["url"]],
+                 "fileSize": info["size"]}
+        index_files.append(entry)
+        unique.append(entry)
+        expected[path] = expected_curseforge[path] = sha512
+        project_id, file_id = 1000 + i, 3000000 + i * 7
+        server.curseforge_projects[project_id] = {"id": project_id, "classId": 12 if resource_pack else 6}
+        server.curseforge_files[file_id] = {
+            "id": file_id, "modId": project_id, "fileName": name, "downloadUrl": info["url"],
+            "fileLength": info["size"], "hashes": [{"value": info["sha1"], "algo": 1}],
+        }
+        manifest_files.append({"projectID": project_id, "fileID": file_id, "required": True})
+    server_only = server.add("/data/server/versions/v1/server-only.jar", rng.randbytes(1024))
+    index_files.append({"path": "mods/server-only.jar", "hashes": {"sha1": server_only["sha1"]},
+                        "env": {"client": "unsupported", "server": "required"},
+                        "downloads": [server_only["url"]], "fileSize": server_only["size"]})
+
+    overrides = {f"config/mod{i}.toml": f"enabled = true\nvalue = {i}\n".encode() for i in range(40)}
+    # 覆盖下载列表中的一个模组
+    overrides["mods/mod0.jar"] = b"patched mod0"
+    client_overrides = {"options.txt": b"lang:zh_cn\n", "config/mod0.toml": b"client = true\n"}
+    for path, data in overrides.items():
+        expected[path] = expected_curseforge[path] = hashlib.sha512(data).hexdigest()
+    for path, data in client_overrides.items():
+        expected[path] = hashlib.sha512(data).hexdigest()
+
+    mrpack_path = os.path.join(work_dir, "bench.mrpack")
+    with zipfile.ZipFile(mrpack_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("modrinth.index.json", json.dumps({
+            "formatVersion": 1, "game": "minecraft", "versionId": "1.0", "name": "bench-pack",
+            "files": index_files, "dependencies": {"minecraft": VERSION_ID},
+        }))
+        for path, data in overrides.items():
+            zf.writestr(f"overrides/{path}", data)
+        for path, data in client_overrides.items():
+            zf.writestr(f"client-overrides/{path}", data)
+    curseforge_path = os.path.join(work_dir, "bench-curseforge.zip")
+    with zipfile.ZipFile(curseforge_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps({
+            "minecraft": {"version": VERSION_ID, "modLoaders": []}, "manifestType": "minecraftModpack",
+            "manifestVersion": 1, "name": "bench-pack", "version": "1.0", "files": manifest_files,
+            "overrides": "overrides",
+        }))
+        for path, data in overrides.items():
+            zf.writestr(f"overrides/{path}", data)
+    return mrpack_path, expected, curseforge_path, expected_curseforge
+
+
+def _check_game_directory(game_directory: str, expected: Dict[str, str]) -> List[str]:
+    """返回缺失或 sha512 不一致的文件"""
+    bad = []
+    for path, sha512 in expected.items():
+        full_path = os.path.join(game_directory, path)
+        try:
+            with open(full_path, "rb") as f:
+                ok = hashlib.sha512(f.read()).hexdigest() == sha512
+        except OSError:
+            ok = False
+        if not ok:
+            bad.append(path)
+    return bad
+
+
+async def run_modpack(args) -> Dict:
+    from modpack import CurseForgeAPI, ModpackInstaller
+
+    server = FakeMojangServer(ServerConfig(latency=args.latency, seed=args.seed), args.assets, args.libraries,
+                              args.large_libraries, int(args.client_mb * 1024 * 1024))
+    await server.start()
+    root = tempfile.mkdtemp(prefix="ecl-modpack-")
+    mrpack_path, expected, curseforge_path, expected_curseforge = _build_modpacks(
+        server, root, args.mods, args.max_mod_kb, args.seed)
+
+    async def import_pack(name: str, store: str, pack_path: str, expected_files: Dict[str, str],
+                          cancel_after_bytes: int = 0) -> Dict:
+        game_directory = os.path.join(root, name)
+        installer = local_installer(server.base_url, game_directory, os.path.join(root, store), args.concurrency)
+        statuses = []
+        installer.on_status = statuses.append
+        progress = []
+        server.reset_stats()
+        interrupted = False
+        error = None
+        started = time.perf_counter()
+        async with installer:
+            installer.begin_tracking()
+            importer = ModpackInstaller(installer, CurseForgeAPI(installer.session, server.base_url, "bench"))
+            task = asyncio.create_task(importer.install(pack_path))
+            while not task.done():
+                progress.append(installer.scheduler.meter.progress)
+                if cancel_after_bytes and installer.metrics.bytes_received >= cancel_after_bytes:
+                    task.cancel()
+                    break
+                await asyncio.wait({task}, timeout=0.05)
+            try:
+                await task
+            except asyncio.CancelledError:
+                interrupted = True
+            except Exception as e:
+                error = e
+            meter = installer.scheduler.meter
+            snapshot = installer.metrics.snapshot()
+        bad = [] if interrupted else _check_game_directory(game_directory, expected_files)
+        return {
+            "ok": error is None and not interrupted and not bad,
+            "error": str(error) if error else None,
+            "interrupted": interrupted,
+            "wall_time": time.perf_counter() - started,
+            "bytes_sent": server.stats["bytes_sent"],
+            "requests": server.stats["requests"],
+            "files": meter.files_total,
+            "files_cached": snapshot["files_cached"],
+            "bad_files": bad[:10],
+            "progress_samples": len(set(progress)),
+            "status_updates": len(statuses),
+        }
+
+    result: Dict = {"mods": args.mods, "content_bytes": server.content_bytes}
+    try:
+        result["cold"] = await import_pack("a", "store", mrpack_path, expected)
+        result["warm"] = await import_pack("a", "store", mrpack_path, expected)
+        # 下载到一半时中断，再次导入时从校验索引和续传日志继续
+        crash = await import_pack("b", "store-b", mrpack_path, expected,
+                                  cancel_after_bytes=int(server.content_bytes * args.crash_at))
+        resume = await import_pack("b", "store-b", mrpack_path, expected)
+        resume["crash"] = crash
+        resume["transfer_overhead"] = (crash["bytes_sent"] + resume["bytes_sent"]) / server.content_bytes - 1
+        result["resume"] = resume
+        # 另一个实例导入同样模组的 CurseForge 整合包，全部从共享对象库链接
+        result["curseforge"] = await import_pack("c", "store", curseforge_path, expected_curseforge)
+    finally:
+        await server.stop()
+        if args.keep:
+            print(f"工作目录保留在 {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    # 新的游戏目录还没有缓存版本清单，只允许下载清单本身
+    manifest_size = len(server.blobs["/mc/game/version_manifest_v2.json"])
+    result["ok"] = (all(result[s]["ok"] for s in ("cold", "warm", "resume", "curseforge"))
+                    and result["resume"]["crash"]["interrupted"]
+                    and result["warm"]["bytes_sent"] == 0 and result["curseforge"]["bytes_sent"] <= manifest_size)
+    return result
+
+
+async def _download_1k(session, url: str, target_path: str, expected_sha1: str) -> bool:
+    """对照组：改进前 SmartDownloader.download 的下载循环"""
+    import aiofiles
+
+    from downloader import SmartDownloader
+
+    async with session.get(url) as resp:
+        resp.raise_for_status()
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        async with aiofiles.open(target_path, "wb") as f:
+            while True:
+                chunk = await asyncio.wait_for(resp.content.read(1024), timeout=10.0)
+                if not chunk:
+                    break
+                await f.write(chunk)
+    return await SmartDownloader.calculate_sha1(target_path) == expected_sha1
+
+
+async def run_stream(args) -> Dict:
+    import aiohttp
+
+    from downloader import SmartDownloader
+
+    server = FakeMojangServer(ServerConfig(seed=args.seed), 0, 0, 0, 0)
+    await server.start()
+    rng = random.Random(args.seed)
+    large = server.add("/stream/large.bin", rng.randbytes(int(args.large_mb * 1000 * 1000)))
+    small = [server.add(f"/stream/small/{i}.bin", rng.randbytes(4 * 1024)) for i in range(args.small_files)]
+    root = tempfile.mkdtemp(prefix="ecl-stream-")
+
+    async def measure(variant: str, run: int, files: List[Dict]) -> Dict:
+        work_dir = os.path.join(root, f"{variant}-{run}-{len(files)}")
+        targets = [os.path.join(work_dir, f"{i}.bin") for i in range(len(files))]
+        partial_seen = False
+        semaphore = asyncio.Semaphore(args.concurrency)
+        async with aiohttp.ClientSession() as session:
+            # 只比较下载循环本身，不分段
+            smart = SmartDownloader(session, segment_count=1)
+
+            async def fetch(info: Dict, target_path: str) -> bool:
+                async with semaphore:
+                    if variant == "1k":
+                        return await _download_1k(session, info["url"], target_path, info["sha1"])
+                    return await smart.download(info["url"], target_path, expected_sha1=info["sha1"],
+                                                expected_size=info["size"])
+
+            async def watch():
+                # 目标路径出现时文件必须已经完整
+                nonlocal partial_seen
+                while True:
+                    for target_path, info in zip(targets, files):
+                        try:
+                            if os.path.getsize(target_path) != info["size"]:
+                                partial_seen = True
+                        except OSError:
+                            pass
+                    await asyncio.sleep(0.005)
+
+            watcher = asyncio.create_task(watch()) if len(files) == 1 else None
+            server.reset_stats()
+            cpu_started = time.process_time()
+            started = time.perf_counter()
+            results = await asyncio.gather(*(fetch(info, path) for info, path in zip(files, targets)))
+            wall_time = time.perf_counter() - started
+            cpu_time = time.process_time() - cpu_started
+            if watcher is not None:
+                watcher.cancel()
+        ok = all(results) and all(os.path.getsize(p) == info["size"] for p, info in zip(targets, files))
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return {"ok": ok, "wall_time": wall_time, "cpu_time": cpu_time, "partial_seen": partial_seen}
+
+    result: Dict = {}
+    try:
+        for name, files in (("large", [large]), ("small", small)):
+            for variant in ("1k", "smart"):
+                runs = [await measure(variant, run, files) for run in range(args.repeat)]
+                result[f"{name}_{variant}"] = {
+                    "ok": all(r["ok"] for r in runs),
+                    "wall_time": statistics.median(r["wall_time"] for r in runs),
+                    "cpu_time": statistics.median(r["cpu_time"] for r in runs),
+                    "partial_seen": any(r["partial_seen"] for r in runs),
+                }
+            old, new = result[f"{name}_1k"], result[f"{name}_smart"]
+            result[f"{name}_speedup"] = old["wall_time"] / new["wall_time"] if new["wall_time"] else None
+            result[f"{name}_cpu_ratio"] = new["cpu_time"] / old["cpu_time"] if old["cpu_time"] else None
+    finally:
+        await server.stop()
+        if args.keep:
+            print(f"工作目录保留在 {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    result["ok"] = (all(result[f"{name}_{variant}"]["ok"] for name in ("large", "small") for variant in ("1k", "smart"))
+                    and not result["large_smart"]["partial_seen"])
+    return result
+
+
+def _build_library_profile(count: int, seed: int, os_name: str) -> Dict:
+    """生成有 count 个库的版本 JSON，规则和 natives 的比例参照 Forge/NeoForge 整合包"""
+    rng = random.Random(seed)
+    # 原版 LWJGL 库共用的几组规则
+    shared_rules = [
+        [{"action": "allow"}, {"action": "disallow", "os": {"name": "osx"}}],
+        [{"action": "allow", "os": {"name": "osx"}}],
+        [{"action": "allow", "os": {"name": os_name, "arch": "x86"}}],
+    ]
+    libraries = []
+    for i in range(count):
+        path = f"bench/mod{i % 97}/lib{i}/1.0/lib{i}-1.0.jar"
+        kind = rng.random()
+        if kind < 0.05 and libraries:
+            # 父版本和加载器重复声明的库
+            libraries.append(dict(rng.choice(libraries)))
+            continue
+        artifact = {"path": path, "url": f"https://libraries.minecraft.net/{path}",
+                    "sha1": hashlib.sha1(path.encode()).hexdigest(), "size": rng.randint(1024, 1024 * 1024)}
+        lib: Dict = {"name": f"bench.mod{i % 97}:lib{i}:1.0", "downloads": {"artifact": artifact}}
+        if kind < 0.25:
+            lib["rules"] = rng.choice(shared_rules)
+        elif kind < 0.30:
+            lib["rules"] = [{"action": "allow", "os": {"name": os_name, "version": r"^\d+\."}}]
+        elif kind < 0.35:
+            lib["rules"] = [{"action": "allow", "features": {"is_demo_user": True}}]
+        elif kind < 0.40:
+            classifier = {**artifact, "path": path.replace(".jar", f"-natives-{os_name}.jar")}
+            lib["natives"] = {os_name: f"natives-{os_name}"}
+            lib["downloads"]["classifiers"] = {f"natives-{os_name}": classifier}
+            lib["extract"] = {"exclude": ["META-INF/"]}
+        libraries.append(lib)
+    return {"id": "bench-modded", "libraries": libraries}
+
+
+def _resolve_baseline(libraries: List[Dict], libraries_folder_path: str) -> List[str]:
+    """对照组：改进前 download_libraries 的做法，每次都取平台信息、逐个库遍历规则并拼接路径"""
+    os_name = platform.system().lower()
+    arch = platform.machine().lower()
+    paths = []
+    for lib in libraries:
+        rules = lib.get("rules")
+        if rules:
+            result = None
+            for rule in rules:
+                os_rule = rule.get("os", {})
+                if os_rule:
+                    if "name" in os_rule and os_rule["name"] != os_name:
+                        continue
+                    if "arch" in os_rule and os_rule["arch"] != arch:
+                        continue
+                result = rule["action"] == "allow"
+            if not result:
+                continue
+        downloads = lib.get("downloads", {})
+        artifact = downloads.get("artifact")
+        if artifact:
+            paths.append(os.path.join(libraries_folder_path, artifact["path"]))
+        classifiers = downloads.get("classifiers")
+        natives = lib.get("natives")
+        if classifiers and natives:
+            key = natives.get(os_name)
+            if key and key in classifiers:
+                paths.append(os.path.join(libraries_folder_path, classifiers[key]["path"]))
+    return paths
+
+
+def run_resolve(args) -> Dict:
+    from library_resolver import LibraryResolver, PlatformInfo
+    from version_json import VersionJson
+
+    data = _build_library_profile(args.libraries, args.seed, PlatformInfo().name)
+    raw = json.dumps(data).encode()
+    json_sha1 = hashlib.sha1(raw).hexdigest()
+    libraries_folder_path = os.path.join("minecraft", "libraries")
+
+    def per_call(function) -> float:
+        """重复 iterations 次，取 repeat 轮的中位数，返回每次调用的微秒数"""
+        rounds = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for _ in range(args.iterations):
+                function()
+            rounds.append((time.perf_counter() - started) / args.iterations * 1e6)
+        return statistics.median(rounds)
+
+    parsed = json.loads(raw)
+    version_json = VersionJson.from_json(parsed, json_sha1)
+    memo = LibraryResolver()
+    artifacts = memo.resolve(version_json, json_sha1)
+    paths = [os.path.join(libraries_folder_path, a.path) for a in artifacts]
+    result: Dict = {
+        "libraries": len(data["libraries"]),
+        "resolved": len(artifacts),
+        "natives": sum(a.native for a in artifacts),
+        # 两种做法都要先读取版本 JSON，单独列出
+        "json_load_us": per_call(lambda: json.loads(raw)),
+        "version_json_us": per_call(lambda: VersionJson.from_json(parsed, json_sha1)),
+        "baseline_us": per_call(lambda: _resolve_baseline(parsed["libraries"], libraries_folder_path)),
+        # 新的进程第一次解析
+        "cold_us": per_call(lambda: LibraryResolver().resolve(version_json, json_sha1)),
+        # 同一进程内再次安装、校验或启动
+        "memo_us": per_call(lambda: memo.resolve(version_json, json_sha1)),
+    }
+    result["cold_speedup"] = result["baseline_us"] / result["cold_us"]
+    result["memo_speedup"] = result["baseline_us"] / result["memo_us"]
+    # 结果已去重，并且只会比改进前少（os.version 和 features 规则以前被忽略）
+    result["ok"] = (len(set(paths)) == len(paths) and set(paths) <= set(_resolve_baseline(parsed["libraries"],
+                                                                                         libraries_folder_path))
+                    and 0 < result["resolved"] < result["libraries"])
+    return result
+
+
+def _build_asset_index(count: int, seed: int) -> Dict:
+    """生成有 count 个名字的资源索引，约 1/10 的名字与其他名字共用对象（与原版的音效和语言文件相近）"""
+    rng = random.Random(seed)
+    objects = {}
+    hashes: List[str] = []
+    for i in range(count):
+        if hashes and rng.random() < 0.1:
+            hash_ = rng.choice(hashes)
+        else:
+            hash_ = rng.randbytes(20).hex()
+            hashes.append(hash_)
+        objects[f"minecraft/sounds/bench{i % 53}/sound{i}.ogg"] = {"hash": hash_, "size": rng.randint(100, 200000)}
+    return {"objects": objects}
+
+
+def _measure_memory(function) -> Tuple[int, int]:
+    """返回 (调用结果保留的 KiB, 调用期间的峰值 KiB)"""
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        kept = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current // 1024, peak // 1024
+
+
+def run_models(args) -> Dict:
+    import marshal
+
+    from asset_index import AssetIndex
+    from json_cache import CACHE_SUFFIX
+    from version_json import VersionJson
+
+    work_dir = tempfile.mkdtemp(prefix="ecl-models-")
+    index_path = os.path.join(work_dir, "indexes", "bench.json")
+    version_path = os.path.join(work_dir, "versions", "bench-modded", "bench-modded.json")
+    documents = {
+        "index": (AssetIndex, index_path, _build_asset_index(args.assets, args.seed)),
+        "version": (VersionJson, version_path, _build_library_profile(args.libraries, args.seed, "linux")),
+    }
+
+    def median_ms(function) -> float:
+        rounds = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            function()
+            rounds.append((time.perf_counter() - started) * 1000)
+        return statistics.median(rounds)
+
+    def cold_load(cls, path):
+        # 删除缓存，相当于第一次读取或 JSON 刚被更新
+        try:
+            os.remove(path + CACHE_SUFFIX)
+        except FileNotFoundError:
+            pass
+        return cls.load(path)
+
+    def read_json(path):
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+
+    result: Dict = {"assets": args.assets, "libraries": args.libraries}
+    ok = True
+    colds = {}
+    try:
+        for key, (cls, path, data) in documents.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            result[f"{key}_file_kib"] = os.path.getsize(path) // 1024
+            # 改进前：每次读取都解析 JSON 并保留整个字典
+            result[f"{key}_json_ms"] = median_ms(lambda: read_json(path))
+            result[f"{key}_cold_ms"] = median_ms(lambda: cold_load(cls, path))
+            colds[key] = cold_load(cls, path)
+            result[f"{key}_warm_ms"] = median_ms(lambda: cls.load(path))
+            # 内存以 KiB 计：读取结果保留的内存和读取期间的峰值
+            result[f"{key}_json_mem"], result[f"{key}_json_peak"] = _measure_memory(lambda: read_json(path))
+            result[f"{key}_warm_mem"], result[f"{key}_warm_peak"] = _measure_memory(lambda: cls.load(path))
+            # 从缓存读到的对象与解析 JSON 得到的相同
+            ok = ok and cls.load(path).to_data() == colds[key].to_data()
+
+        # JSON 内容变化后缓存失效，读到新内容并重写缓存
+        index_data = documents["index"][2]
+        index_data["objects"]["minecraft/bench/added.ogg"] = {"hash": "ab" * 20, "size": 1}
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(index_data, f)
+        reloaded = AssetIndex.load(index_path)
+        with open(index_path + CACHE_SUFFIX, "rb") as f:
+            _, cached_sha1, cached_data = marshal.loads(f.read())
+        result["invalidated"] = (len(reloaded) == args.assets + 1
+                                 and reloaded.names[-1] == "minecraft/bench/added.ogg"
+                                 and cached_sha1 == reloaded.json_sha1 != colds["index"].json_sha1
+                                 and cached_data == reloaded.to_data())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result["ok"] = ok and result["invalidated"]
+    return result
+
+
+NATIVE_SUFFIX = {"windows": ".dll", "osx": ".dylib"}
+
+
+def _natives_jar(rng: random.Random, members: Dict[str, int]) -> Tuple[bytes, Dict[str, str]]:
+    """生成 natives jar，返回 (jar 内容, {动态库文件名: sha1})；动态库一半随机一半全零，压缩率接近真实文件"""
+    buffer = io.BytesIO()
+    libraries = {}
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as jar:
+        jar.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\n")
+        for member, size in members.items():
+            data = rng.randbytes(size // 2) + bytes(size - size // 2)
+            jar.writestr(member, data)
+            libraries[os.path.basename(member)] = hashlib.sha1(data).hexdigest()
+            # 1.20 的 natives jar 中每个动态库旁边有一个 .sha1 文件
+            if "/" in member:
+                jar.writestr(f"{member}.sha1", libraries[os.path.basename(member)])
+    return buffer.getvalue(), libraries
+
+
+def _build_natives_profiles(server: FakeMojangServer, seed: int, os_name: str) -> Dict[str, Tuple[Dict, Dict]]:
+    """
+    在服务器上生成 1.8.9 和 1.20 两个版本的库，返回 {版本: (版本 JSON, {动态库文件名: sha1})}。
+    库的数量和 natives jar 的内容、大小参照原版，只保留当前系统的 natives。
+    """
+    rng = random.Random(seed)
+    suffix = NATIVE_SUFFIX.get(os_name, ".so")
+
+    def library(name: str, path: str, data: bytes) -> Dict:
+        return {"path": path, **server.add(f"/libraries/{path}", data)}
+
+    def plain_libraries(version: str, count: int) -> List[Dict]:
+        return [{"name": f"bench.{version}:lib{i}:1.0",
+                 "downloads": {"artifact": library(f"lib{i}", f"bench/{version}/lib{i}/1.0/lib{i}-1.0.jar",
+                                                   rng.randbytes(rng.randint(20 * 1024, 512 * 1024)))}}
+                for i in range(count)]
+
+    profiles = {}
+    # 1.8.9：lwjgl-platform 和 jinput-platform，动态库在 jar 根目录，解压时排除 META-INF/
+    libraries = plain_libraries("1.8.9", 35)
+    expected = {}
+    for artifact, members in (("lwjgl-platform", {"lwjgl": 300, "lwjgl64": 320, "openal": 200, "openal64": 230}),
+                              ("jinput-platform", {f"jinput-{os_name}": 12, f"jinput-{os_name}64": 14})):
+        data, files = _natives_jar(rng, {f"lib{m}{suffix}": kb * 1024 for m, kb in members.items()})
+        expected.update(files)
+        path = f"org/lwjgl/{artifact}/2.9.4/{artifact}-2.9.4-natives-{os_name}.jar"
+        libraries.append({
+            "name": f"org.lwjgl:{artifact}:2.9.4", "natives": {os_name: f"natives-{os_name}"},
+            "extract": {"exclude": ["META-INF/"]},
+            "downloads": {"classifiers": {f"natives-{os_name}": library(artifact, path, data)}},
+        })
+    profiles["1.8.9"] = ({"id": "1.8.9", "libraries": libraries}, expected)
+
+    # 1.20：每个 lwjgl 模块一个 natives-xxx 构件，动态库在 linux/x64/org/lwjgl/<模块>/ 之类的子目录
+    libraries = plain_libraries("1.20", 40)
+    expected = {}
+    for module, kb in (("lwjgl", 100), ("lwjgl-glfw", 120), ("lwjgl-jemalloc", 150), ("lwjgl-openal", 600),
+                       ("lwjgl-opengl", 80), ("lwjgl-stb", 200), ("lwjgl-tinyfd", 40)):
+        directory = "/".join(["org"] + module.split("-"))
+        data, files = _natives_jar(rng, {f"{os_name}/x64/{directory}/lib{module.replace('-', '_')}{suffix}": kb * 1024})
+        expected.update(files)
+        path = f"org/lwjgl/{module}/3.3.1/{module}-3.3.1-natives-{os_name}.jar"
+        libraries.append({"name": f"org.lwjgl:{module}:3.3.1:natives-{os_name}",
+                          "downloads": {"artifact": library(module, path, data)},
+                          "rules": [{"action": "allow", "os": {"name": os_name}}]})
+    profiles["1.20"] = ({"id": "1.20", "libraries": libraries}, expected)
+    return profiles
+
+
+def _check_natives(natives_path: str, expected: Dict[str, str]) -> List[str]:
+    """返回缺失或内容不符的动态库"""
+    bad = []
+    for name, sha1 in expected.items():
+        path = os.path.join(natives_path, name)
+        try:
+            with open(path, "rb") as f:
+                if hashlib.sha1(f.read()).hexdigest() != sha1:
+                    bad.append(name)
+        except OSError:
+            bad.append(name)
+    return bad
+
+
+def _natives_mtimes(natives_path: str) -> Dict[str, int]:
+    mtimes = {}
+    for dir_path, _, names in os.walk(natives_path):
+        for name in names:
+            path = os.path.join(dir_path, name)
+            mtimes[os.path.relpath(path, natives_path)] = os.stat(path).st_mtime_ns
+    return mtimes
+
+
+def _extract_serial(jars: List[Tuple[str, List[str]]], natives_path: str):
+    """对照组：改进前的做法，在一个线程里逐个 jar、逐个成员 ZipFile.extract"""
+    for jar_path, excludes in jars:
+        with zipfile.ZipFile(jar_path, "r") as jar:
+            for member in jar.namelist():
+                if not any(member.startswith(exclude) for exclude in excludes):
+                    jar.extract(member, natives_path)
+
+
+async def run_natives(args) -> Dict:
+    from library_resolver import LibraryResolver, PlatformInfo
+    from natives import NativesExtractor
+    from version_json import VersionJson
+
+    server = FakeMojangServer(ServerConfig(latency=args.latency, seed=args.seed), 0, 0, 0, 0)
+    await server.start()
+    root = tempfile.mkdtemp(prefix="ecl-natives-")
+    profiles = _build_natives_profiles(server, args.seed, PlatformInfo().name)
+    resolver = LibraryResolver()
+
+    async def install(name: str, version_json: VersionJson, minecraft_folder_path: str) -> Dict:
+        natives_path = os.path.join(minecraft_folder_path, "versions", version_json.id, f"{version_json.id}-natives")
+        installer = local_installer(server.base_url, minecraft_folder_path,
+                                     os.path.join(root, f"{name}-store"), args.concurrency)
+        server.reset_stats()
+        started = time.perf_counter()
+        async with installer:
+            await installer.download_libraries(version_json, os.path.join(minecraft_folder_path, "libraries"),
+                                               natives_path)
+        return {"wall_time": time.perf_counter() - started, "bytes_sent": server.stats["bytes_sent"]}
+
+    async def run_profile(version: str, run: int) -> Dict:
+        data, expected = profiles[version]
+        raw = json.dumps(data).encode()
+        version_json = VersionJson.from_json(data, hashlib.sha1(raw).hexdigest())
+        name = f"{version}-{run}"
+        minecraft_folder_path = os.path.join(root, name)
+        natives_path = os.path.join(minecraft_folder_path, "versions", version, f"{version}-natives")
+        artifacts = [a for a in resolver.resolve(version_json, version_json.json_sha1) if a.native]
+        jars = [(os.path.join(minecraft_folder_path, "libraries", a.path), a.extract_excludes) for a in artifacts]
+
+        cold = await install(name, version_json, minecraft_folder_path)
+        cold["bad_files"] = _check_natives(natives_path, expected)
+        # 1.8.9 的 extract.exclude 排除了 META-INF/，1.20 没有排除规则
+        cold["excluded_extracted"] = any(excludes and os.path.exists(os.path.join(natives_path, "META-INF"))
+                                         for _, excludes in jars)
+        mtimes = _natives_mtimes(natives_path)
+
+        # 再次启动：库都已校验过，natives 按 jar sha1 记录为已解压
+        relaunch = await install(name, version_json, minecraft_folder_path)
+        relaunch["reextracted"] = sorted(p for p, t in _natives_mtimes(natives_path).items()
+                                         if mtimes.get(p) != t and p != NativesExtractor.RECORD_NAME)
+
+        # 只比较解压：jar 都在本地，natives 目录清空
+        shutil.rmtree(natives_path)
+        extractor = NativesExtractor(natives_path)
+        started = time.perf_counter()
+        await asyncio.gather(*(extractor.extract(path, a.sha1, excludes)
+                               for (path, excludes), a in zip(jars, artifacts)))
+        await extractor.save()
+        parallel = time.perf_counter() - started
+        shutil.rmtree(natives_path)
+        started = time.perf_counter()
+        await asyncio.to_thread(_extract_serial, jars, natives_path)
+        serial = time.perf_counter() - started
+        return {
+            "ok": not cold["bad_files"] and not cold["excluded_extracted"] and relaunch["bytes_sent"] == 0
+                  and not relaunch["reextracted"],
+            "natives_jars": len(jars),
+            "cold": cold,
+            "relaunch": relaunch,
+            "extract_parallel": parallel,
+            "extract_serial": serial,
+        }
+
+    result: Dict = {}
+    try:
+        for version in profiles:
+            runs = [await run_profile(version, run) for run in range(args.repeat)]
+            result[version] = {
+                "ok": all(r["ok"] for r in runs),
+                "natives_jars": runs[0]["natives_jars"],
+                "cold_time": statistics.median(r["cold"]["wall_time"] for r in runs),
+                "relaunch_time": statistics.median(r["relaunch"]["wall_time"] for r in runs),
+                "extract_parallel": statistics.median(r["extract_parallel"] for r in runs),
+                "extract_serial": statistics.median(r["extract_serial"] for r in runs),
+                "bad_files": runs[0]["cold"]["bad_files"][:10],
+                "reextracted": runs[0]["relaunch"]["reextracted"][:10],
+            }
+    finally:
+        await server.stop()
+        if args.keep:
+            print(f"工作目录保留在 {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    result["ok"] = all(result[version]["ok"] for version in profiles)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="EasyCraftLauncher 下载基准测试")
+    sub = parser.add_subparsers(dest="command")
+
+    client = sub.add_parser("client", help=argparse.SUPPRESS)
+    client.add_argument("--server", required=True)
+    client.add_argument("--dir", required=True)
+    client.add_argument("--store", required=True)
+    client.add_argument("--scenario", required=True)
+    client.add_argument("--result", required=True)
+    client.add_argument("--concurrency", type=int, default=64)
+    client.add_argument("--crash-after-bytes", type=int, default=0)
+    client.add_argument("--full", action="store_true")
+
+    flood = sub.add_parser("logflood", help="游戏日志管道压力测试")
+    flood.add_argument("--lines", type=int, default=200000, help="日志事件数")
+    flood.add_argument("--capacity", type=int, default=20000, help="环形缓冲区容量")
+    flood.add_argument("--max-log-mb", type=int, default=10, help="单个日志文件大小（MiB）")
+    flood.add_argument("--keep", action="store_true", help="保留日志目录")
+    flood.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    startup = sub.add_parser("startup", help="界面冷启动耗时测试")
+    startup.add_argument("--repeat", type=int, default=5, help="启动次数，结果取中位数")
+    startup.add_argument("--platform", default="offscreen", help="Qt 平台插件")
+    startup.add_argument("--budget-ms", type=float, default=None, help="中位耗时超过该值时返回 1")
+    startup.add_argument("--timeout", type=float, default=60, help="单次启动的超时（秒）")
+    startup.add_argument("--output", default=None, help="结果 JSON 文件")
+    startup.add_argument("-v", "--verbose", action="store_true", help="显示子进程输出")
+
+    ratelimit = sub.add_parser("ratelimit", help="下载限速和后台让出测试")
+    ratelimit.add_argument("--limit", type=float, default=8, help="总限速（MiB/s）")
+    ratelimit.add_argument("--background-limit", type=float, default=4, help="后台限速（MiB/s），0 为不单独限制")
+    ratelimit.add_argument("--tolerance", type=float, default=0.1, help="实际速率与上限允许的相对误差")
+    ratelimit.add_argument("--foreground-after", type=float, default=2.0, help="后台预下载开始多少秒后开始前台安装")
+    ratelimit.add_argument("--warmup", type=float, default=0.5, help="计算速率时忽略开始和结束的秒数")
+    ratelimit.add_argument("--slack-kb", type=int, default=512,
+                           help="前台进行期间允许的后台流量（KiB，已读到的数据块）")
+    ratelimit.add_argument("--assets", type=int, default=500, help="资源文件数")
+    ratelimit.add_argument("--libraries", type=int, default=10, help="库文件数")
+    ratelimit.add_argument("--large-libraries", type=int, default=1, help="额外的 12 MiB 大库文件数")
+    ratelimit.add_argument("--client-mb", type=float, default=8, help="客户端 jar 大小（MiB）")
+    ratelimit.add_argument("--concurrency", type=int, default=64)
+    ratelimit.add_argument("--timeout", type=float, default=120, help="等待预下载完成的超时（秒）")
+    ratelimit.add_argument("--seed", type=int, default=1)
+    ratelimit.add_argument("--keep", action="store_true", help="保留工作目录")
+    ratelimit.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    modpack = sub.add_parser("modpack", help="整合包导入测试")
+    modpack.add_argument("--mods", type=int, default=300, help="模组数")
+    modpack.add_argument("--max-mod-kb", type=int, default=512, help="单个模组的最大大小（KiB）")
+    modpack.add_argument("--crash-at", type=float, default=0.5, help="在下载了多少比例时中断")
+    modpack.add_argument("--latency", type=float, default=0.0, help="每个请求的额外延迟（秒）")
+    modpack.add_argument("--assets", type=int, default=500, help="资源文件数")
+    modpack.add_argument("--libraries", type=int, default=10, help="库文件数")
+    modpack.add_argument("--large-libraries", type=int, default=1, help="额外的 12 MiB 大库文件数")
+    modpack.add_argument("--client-mb", type=float, default=8, help="客户端 jar 大小（MiB）")
+    modpack.add_argument("--concurrency", type=int, default=64)
+    modpack.add_argument("--seed", type=int, default=1)
+    modpack.add_argument("--keep", action="store_true", help="保留工作目录")
+    modpack.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    stream = sub.add_parser("stream", help="单文件下载循环测试（50 MB 与 4 KB）")
+    stream.add_argument("--large-mb", type=float, default=50, help="大文件大小（MB）")
+    stream.add_argument("--small-files", type=int, default=500, help="4 KB 小文件数")
+    stream.add_argument("--repeat", type=int, default=3, help="重复次数，结果取中位数")
+    stream.add_argument("--concurrency", type=int, default=16, help="小文件同时下载数")
+    stream.add_argument("--seed", type=int, default=1)
+    stream.add_argument("--keep", action="store_true", help="保留工作目录")
+    stream.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    resolve = sub.add_parser("resolve", help="库规则解析微基准（500 个库）")
+    resolve.add_argument("--libraries", type=int, default=500, help="版本 JSON 中的库数")
+    resolve.add_argument("--iterations", type=int, default=50, help="每轮调用次数")
+    resolve.add_argument("--repeat", type=int, default=5, help="轮数，结果取中位数")
+    resolve.add_argument("--seed", type=int, default=1)
+    resolve.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    models = sub.add_parser("models", help="资源索引和版本 JSON 的读取耗时与内存（JSON 与 .bin 缓存）")
+    models.add_argument("--assets", type=int, default=5000, help="资源索引中的名字数")
+    models.add_argument("--libraries", type=int, default=500, help="版本 JSON 中的库数")
+    models.add_argument("--repeat", type=int, default=9, help="轮数，结果取中位数")
+    models.add_argument("--seed", type=int, default=1)
+    models.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    natives = sub.add_parser("natives", help="natives 解压测试（1.8.9 与 1.20）")
+    natives.add_argument("--repeat", type=int, default=3, help="重复次数，结果取中位数")
+    natives.add_argument("--latency", type=float, default=0.0, help="每个请求的额外延迟（秒）")
+    natives.add_argument("--concurrency", type=int, default=64)
+    natives.add_argument("--seed", type=int, default=1)
+    natives.add_argument("--keep", action="store_true", help="保留工作目录")
+    natives.add_argument("--output", default=None, help="结果 JSON 文件")
+
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔：" + ",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=1, help="重复次数，结果取中位数")
+    parser.add_argument("--assets", type=int, default=2000, help="资源文件数")
+    parser.add_argument("--libraries", type=int, default=60, help="库文件数")
+    parser.add_argument("--large-libraries", type=int, default=2, help="额外的 12 MiB 大库文件数")
+    parser.add_argument("--client-mb", type=float, default=24, help="客户端 jar 大小（MiB）")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的额外延迟（秒）")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="总带宽上限（MiB/s），0 为不限")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的请求比例")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="中途断开的响应比例")
+    parser.add_argument("--crash-at", type=float, default=0.5, help="resume 场景在下载了多少比例时崩溃")
+    parser.add_argument("--full-verify", action="store_true", help="verify 场景对所有文件计算哈希")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--output", default=None, help="结果 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="与该结果 JSON 比较")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="任一场景耗时比基线慢超过该比例（如 0.1）时返回 1")
+    parser.add_argument("--keep", action="store_true", help="保留工作目录")
+    parser.add_argument("-v", "--verbose", action="store_true", help="显示子进程输出")
+    args = parser.parse_args(argv)
+
+    if args.command in ("logflood", "startup", "ratelimit", "modpack", "stream", "resolve", "models", "natives"):
+        if args.command in ("startup", "resolve", "models"):
+            result = {"startup": run_startup, "resolve": run_resolve, "models": run_models}[args.command](args)
+        else:
+            runner = {"logflood": run_log_flood, "ratelimit": run_ratelimit, "modpack": run_modpack,
+                      "stream": run_stream, "natives": run_natives}[args.command]
+            result = asyncio.run(runner(args))
+        for key, value in result.items():
+            print(f"{key:20s} {value:.2f}" if isinstance(value, float) else f"{key:20s} {value}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+        return 0 if result["ok"] else 1
+
+    if args.command == "client":
+        result = asyncio.run(_client(args))
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0 if result["ok"] else 1
+
+    result = asyncio.run(run_suite(args))
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    exit_code = 0 if all(s["median"]["ok"] for s in result["scenarios"].values()) else 1
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for name, key, old, new, change in compare(result, baseline):
+            print(f"{name:7s} {key:12s} {old:12.2f} -> {new:12.2f}  {change * 100:+.1f}%")
+            if args.max_regression is not None and key == "wall_time" and change > args.max_regression:
+                exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+EasyCraftLauncher 命令行入口，不依赖 PySide6，可在没有显示器的构建机上使用。
+
+    python cli.py install 1.20.1 1.19.4 --dir .minecraft --concurrency 32
+    python cli.py install 1.20.1 --loader fabric
+    python cli.py install --profile forge-1.12.2.json
+    python cli.py import pack.mrpack --game-dir instances/pack
+    python cli.py verify 1.20.1 --full
+    python cli.py launch 1.20.1 --username Steve
+    python cli.py list --type release
+    python cli.py gc --dry-run
+    python cli.py install 1.20.1 --limit-rate 5
+    python cli.py prefetch --background-limit 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import os.path
+import sys
+from typing import Dict, List, Optional
+
+from installer import Installer, VersionNotFoundError, VERSION_MANIFEST_V2_URL
+from loader_profile import LOADER_META_URLS, ProfileError
+from modpack import CURSEFORGE_API_URL
+
+
+def _default_dir() -> str:
+    return os.path.join(os.getcwd(), ".minecraft")
+
+
+async def _report_progress(installer: Installer, interval: float):
+    """定时打印整体进度，代替界面上的进度条"""
+    while True:
+        await asyncio.sleep(interval)
+        meter = installer.scheduler.meter
+        snapshot = installer.metrics.snapshot()
+        print(f"[{meter.progress * 100:5.1f}%] {meter.files_done}/{meter.files_total} 个文件，"
+              f"{snapshot['speed'] / 1024 / 1024:.2f} MiB/s，重试 {snapshot['retries']}，"
+              f"失败 {snapshot['files_failed']}", flush=True)
+
+
+def _make_installer(args) -> Installer:
+    installer = Installer(args.dir, max_concurrency=args.concurrency,
+                          per_host_limit=min(args.concurrency, 16), object_store_root=args.store,
+                          manifest_url=args.manifest_url, install_java=not getattr(args, "no_java", False),
+                          rate_limit=args.limit_rate * 1024 * 1024,
+                          background_rate_limit=args.background_limit * 1024 * 1024)
+    if not args.quiet:
+        installer.on_status = lambda info: print(info, flush=True)
+    return installer
+
+
+async def _install_loaders(installer: Installer, loader: str, loader_version: Optional[str],
+                           versions: List[str]) -> Dict[str, Optional[Exception]]:
+    results = await asyncio.gather(*(installer.install_loader(loader, v, loader_version) for v in versions),
+                                   return_exceptions=True)
+    await installer.save()
+    return {f"{loader} {v}": r if isinstance(r, Exception) else None for v, r in zip(versions, results)}
+
+
+async def _install_profiles(installer: Installer, paths: List[str]) -> Dict[str, Optional[Exception]]:
+    results = {}
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+            await installer.install_profile(profile)
+            results[path] = None
+        except (OSError, ValueError, KeyError, ProfileError, VersionNotFoundError) as e:
+            results[path] = e
+    await installer.save()
+    return results
+
+
+async def cmd_install(args) -> int:
+    async with _make_installer(args) as installer:
+        installer.verify_index.force = args.force_verify
+        installer.begin_tracking(args.trace)
+        reporter = None if args.quiet else asyncio.create_task(_report_progress(installer, args.interval))
+        try:
+            if args.profile:
+                results = await _install_profiles(installer, args.profile)
+            elif args.loader:
+                results = await _install_loaders(installer, args.loader, args.loader_version, args.versions)
+            else:
+                results = await installer.install_many(args.versions)
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+        failed = {v: e for v, e in results.items() if e is not None}
+        for version, error in failed.items():
+            print(f"版本 {version} 安装失败: {error}", file=sys.stderr)
+        print(f"安装完成 {len(results) - len(failed)}/{len(results)} 个版本，{installer.scheduler.meter.report()}")
+        return 1 if failed else 0
+
+
+async def cmd_import(args) -> int:
+    from modpack import CurseForgeAPI, ModpackError, ModpackInstaller
+
+    async with _make_installer(args) as installer:
+        installer.begin_tracking(args.trace)
+        curseforge = CurseForgeAPI(installer.session, args.curseforge_api, args.curseforge_key)
+        reporter = None if args.quiet else asyncio.create_task(_report_progress(installer, args.interval))
+        try:
+            result = await ModpackInstaller(installer, curseforge).install(args.pack, game_directory=args.game_dir)
+        except (ModpackError, ProfileError) as e:
+            print(f"导入失败: {e}", file=sys.stderr)
+            return 1
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+        print(f"已导入整合包 {result.pack.name} {result.pack.version}，启动版本 {result.version_id}，"
+              f"游戏目录 {result.game_directory}。{installer.scheduler.meter.report()}")
+        if result.missing_loader:
+            print(f"请用官方安装程序安装 {result.missing_loader}", file=sys.stderr)
+            return 1
+        return 0
+
+
+async def cmd_verify(args) -> int:
+    async with _make_installer(args) as installer:
+        installer.begin_tracking(args.trace)
+        exit_code = 0
+        for version in args.versions:
+            try:
+                report, repaired = await installer.verify(version, full=args.full, repair=not args.no_repair)
+            except FileNotFoundError:
+                print(f"版本 {version} 尚未安装", file=sys.stderr)
+                exit_code = 1
+                continue
+            print(f"版本 {version}: {report.summary()}")
+            if not report.ok:
+                if args.no_repair:
+                    exit_code = 1
+                else:
+                    print(f"版本 {version} 修复完成，重新下载了 {repaired} 个文件")
+        return exit_code
+
+
+async def cmd_prefetch(args) -> int:
+    from prefetch import Prefetcher
+
+    async with _make_installer(args) as installer:
+        installer.begin_tracking(args.trace)
+        prefetcher = Prefetcher(installer, recent=args.recent, include_snapshot=not args.no_snapshot)
+        results = await prefetcher.run()
+        failed = {v: e for v, e in results.items() if e is not None}
+        print(f"预下载完成 {len(results) - len(failed)}/{len(results)} 个版本: {', '.join(results)}")
+        return 1 if failed else 0
+
+
+async def cmd_list(args) -> int:
+    if args.installed:
+        from launcher import list_installed_versions
+        for version in list_installed_versions(args.dir):
+            print(version)
+        return 0
+    async with _make_installer(args) as installer:
+        versions = await installer.get_versions(force_refresh=args.refresh)
+        for info in versions:
+            if args.type is None or info["type"] == args.type:
+                print(f"{info['id']}\t{info['type']}\t{info['releaseTime']}")
+    return 0
+
+
+async def cmd_launch(args) -> int:
+    from integrity import IntegrityChecker
+    from launcher import Launcher, LaunchOptions
+    from verify_index import VerifyIndex
+
+    launcher = Launcher(args.dir)
+    checker = IntegrityChecker(args.dir, launcher.resolver,
+                               VerifyIndex(os.path.join(args.dir, "verify_index.json")))
+    try:
+        report = await checker.check(args.version)
+    except FileNotFoundError:
+        print(f"版本 {args.version} 尚未安装", file=sys.stderr)
+        return 1
+    if not report.ok:
+        print(f"版本 {args.version} 文件不完整，请先运行 verify 修复。{report.summary()}", file=sys.stderr)
+        return 1
+    options = LaunchOptions(args.username, args.java, max_memory_mb=args.memory, game_directory=args.game_dir)
+    if args.dry_run:
+        template = await launcher.load_template(args.version, options)
+        print(" ".join(launcher.build_command(args.version, template, options)))
+        return 0
+    from game_log import GameLogPipeline
+
+    process = await launcher.launch(args.version, options, stdout=asyncio.subprocess.PIPE,
+                                    stderr=asyncio.subprocess.PIPE)
+    print(f"已启动版本 {args.version}，进程 {process.pid}")
+    from prefetch import record_recent_version
+
+    await asyncio.to_thread(record_recent_version, args.dir, args.version)
+    pipeline = GameLogPipeline(os.path.join(args.dir, "logs", "launcher", f"{args.version}.log"), max_batch=2000)
+    pipeline.set_min_level(args.log_level)
+
+    def print_logs(records, skipped: int):
+        if skipped:
+            print(f"…… 省略 {skipped} 条日志，完整内容见日志文件 ……")
+        print("\n".join(r.format() for r in records), flush=True)
+
+    pipeline.on_batch = print_logs
+    exit_code = await pipeline.run(process)
+    print(f"游戏已退出（退出码 {exit_code}），日志保存在 {pipeline.log_file.path}")
+    return exit_code
+
+
+def cmd_gc(args) -> int:
+    from object_store import ObjectStore
+    store = ObjectStore(args.store)
+    count, size = store.gc(dry_run=args.dry_run)
+    print(f"{'可' if args.dry_run else '已'}删除 {count} 个对象，释放 {size / 1024 / 1024:.1f} MiB")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dir", default=_default_dir(), help="游戏目录（默认 ./.minecraft）")
+    common.add_argument("--store", default=None, help="共享对象库目录")
+    common.add_argument("--manifest-url", default=VERSION_MANIFEST_V2_URL, help="版本清单地址")
+    common.add_argument("--concurrency", type=int, default=64, help="最大并发下载数")
+    common.add_argument("--limit-rate", type=float, default=0.0, help="下载限速（MiB/s，默认不限）")
+    common.add_argument("--background-limit", type=float, default=0.0, help="后台预下载限速（MiB/s，默认不限）")
+    common.add_argument("--trace", default=os.environ.get("ECL_DOWNLOAD_TRACE"),
+                        help="把下载事件以 JSON Lines 格式写入该文件")
+    common.add_argument("-q", "--quiet", action="store_true", help="不输出进度")
+
+    parser = argparse.ArgumentParser(prog="cli.py", description="EasyCraftLauncher 命令行")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("install", parents=[common], help="安装一个或多个版本，共享的文件只下载一次")
+    p.add_argument("versions", nargs="*")
+    p.add_argument("--loader", choices=sorted(LOADER_META_URLS), default=None,
+                   help="为这些游戏版本安装模组加载器")
+    p.add_argument("--loader-version", default=None, help="加载器版本（默认最新稳定版）")
+    p.add_argument("--profile", action="append", default=[],
+                   help="安装本地的加载器版本 JSON（带 inheritsFrom），可重复")
+    p.add_argument("--force-verify", action="store_true", help="忽略校验索引，重新计算已有文件的哈希")
+    p.add_argument("--no-java", action="store_true", help="不安装版本需要的 Java 运行时")
+    p.add_argument("--interval", type=float, default=2.0, help="进度输出间隔（秒）")
+
+    p = sub.add_parser("import", parents=[common], help="导入 Modrinth（.mrpack）或 CurseForge 整合包")
+    p.add_argument("pack", help="整合包文件")
+    p.add_argument("--game-dir", default=None, help="模组和配置所在的游戏目录（默认与 --dir 相同）")
+    p.add_argument("--curseforge-api", default=CURSEFORGE_API_URL, help="CurseForge API 地址")
+    p.add_argument("--curseforge-key", default=None, help="CurseForge API key（默认读取 CURSEFORGE_API_KEY）")
+    p.add_argument("--interval", type=float, default=2.0, help="进度输出间隔（秒）")
+
+    p = sub.add_parser("verify", parents=[common], help="校验已安装的版本并修复")
+    p.add_argument("versions", nargs="+")
+    p.add_argument("--full", action="store_true", help="对所有文件计算哈希")
+    p.add_argument("--no-repair", action="store_true", help="只检查，不修复；有问题时返回 1")
+
+    p = sub.add_parser("prefetch", parents=[common],
+                       help="按后台流量预下载最新正式版、最新快照和最近启动过的版本")
+    p.add_argument("--recent", type=int, default=3, help="包括最近启动过的几个版本")
+    p.add_argument("--no-snapshot", action="store_true", help="不预下载最新快照")
+
+    p = sub.add_parser("list", parents=[common], help="列出可用或已安装的版本")
+    p.add_argument("--type", default=None, help="只列出该类型（release、snapshot 等）")
+    p.add_argument("--installed", action="store_true", help="列出已安装的版本")
+    p.add_argument("--refresh", action="store_true", help="忽略缓存，重新获取版本清单")
+
+    p = sub.add_parser("launch", parents=[common], help="检查完整性后启动游戏")
+    p.add_argument("version")
+    p.add_argument("--username", default="Player")
+    p.add_argument("--java", default=None, help="java 可执行文件（默认使用已安装的 Java 运行时）")
+    p.add_argument("--memory", type=int, default=2048, help="最大内存（MB）")
+    p.add_argument("--game-dir", default=None, help="游戏运行目录（默认与 --dir 相同）")
+    p.add_argument("--dry-run", action="store_true", help="只打印启动命令")
+    p.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARN", "ERROR"],
+                   help="输出到终端的最低日志级别，日志文件总是完整记录")
+
+    p = sub.add_parser("gc", parents=[common], help="清理对象库中不再被引用的文件")
+    p.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "install" and not args.versions and not args.profile:
+        parser.error("install 需要至少一个版本或 --profile")
+    if args.command == "gc":
+        return cmd_gc(args)
+    command = {"install": cmd_install, "verify": cmd_verify, "list": cmd_list, "launch": cmd_launch,
+               "prefetch": cmd_prefetch, "import": cmd_import}[args.command]
+    try:
+        return asyncio.run(command(args))
+    except VersionNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import os.path
+from typing import List, Optional
+
+from file_util import atomic_write_json
+
+
+class DownloadJournal:
+    """
+    断点续传的进度日志，保存在 <目标文件>.part.json。
+    记录已确认写入临时文件的字节数、这部分数据的 SHA1，以及服务器返回的 ETag/Last-Modified，
+    进程崩溃或重启后据此发起 Range 请求继续下载。
+    分段下载时改为记录每一段已写入到的位置（segments），这时没有 prefix_sha1，下载完成后整体校验。
+    """
+
+    def __init__(self, part_path: str, url: str, expected_sha1: Optional[str] = None):
+        self.part_path = part_path
+        self.path = f"{part_path}.json"
+        self.url = url
+        self.expected_sha1 = expected_sha1
+        # 实际请求的地址（可能是镜像），ETag/Last-Modified 只对同一个来源有效
+        self.source_url: Optional[str] = None
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.size = 0
+        self.prefix_sha1: Optional[str] = None
+        # 分段下载时每段的 [起点, 终点, 已写入到的位置]，单连接下载时为 None
+        self.segments: Optional[List[List[int]]] = None
+
+    @classmethod
+    def load(cls, part_path: str, url: str, expected_sha1: Optional[str] = None) -> Optional["DownloadJournal"]:
+        """读取已有日志，如果与本次下载的 URL/SHA1 不一致或已损坏则返回 None"""
+        try:
+            with open(f"{part_path}.json", "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("url") != url or data.get("expected_sha1") != expected_sha1:
+            return None
+        journal = cls(part_path, url, expected_sha1)
+        journal.source_url = data.get("source_url")
+        journal.etag = data.get("etag")
+        journal.last_modified = data.get("last_modified")
+        journal.size = int(data.get("size", 0))
+        journal.prefix_sha1 = data.get("prefix_sha1")
+        journal.segments = data.get("segments")
+        return journal
+
+    def save(self):
+        if self.segments is not None:
+            self.size = sum(pos - start for start, _, pos in self.segments)
+        atomic_write_json(self.path, {
+            "url": self.url,
+            "expected_sha1": self.expected_sha1,
+            "source_url": self.source_url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "size": self.size,
+            "prefix_sha1": self.prefix_sha1,
+            "segments": self.segments,
+        })
+
+    def segments_match(self, size: int) -> bool:
+        """分段日志和预分配的临时文件都对应 size 字节的文件时返回 True"""
+        if not self.segments:
+            return False
+        try:
+            if os.path.getsize(self.part_path) != size:
+                return False
+        except OSError:
+            return False
+        next_start = 0
+        for start, end, pos in self.segments:
+            if start != next_start or not start <= pos <= end + 1:
+                return False
+            next_start = end + 1
+        return next_start == size
+
+    def remove(self):
+        for path in (self.path, self.part_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def restore_hash(self):
+        """
+        重新读取已确认的部分以恢复 SHA1 的增量状态（hashlib 的内部状态无法序列化），
+        同时与日志中记录的摘要比对，确认临时文件没有被破坏。
+        成功返回 hashlib 对象，否则返回 None。阻塞调用，应放在线程中执行。
+        """
+        try:
+            if os.path.getsize(self.part_path) < self.size:
+                return None
+            sha1 = hashlib.sha1()
+            remaining = self.size
+            with open(self.part_path, "r+b") as f:
+                while remaining > 0:
+                    chunk = f.read(min(1024 * 1024, remaining))
+                    if not chunk:
+                        return None
+                    sha1.update(chunk)
+                    remaining -= len(chunk)
+                # 丢弃日志之后才写入、未被确认的数据
+                f.truncate(self.size)
+        except OSError:
+            return None
+        if sha1.hexdigest() != self.prefix_sha1:
+            return None
+        return sha1
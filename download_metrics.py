@@ -0,0 +1,152 @@
+import json
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收集所有更慢的请求
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "total", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def percentile(self, p: float) -> float:
+        """按桶上界估算的百分位数（毫秒）"""
+        if not self.total:
+            return 0.0
+        target = self.total * p
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {"count": self.total, "mean_ms": self.mean * 1000, "buckets": dict(zip(labels, self.counts))}
+
+
+class DownloadMetrics:
+    """
+    下载器的统计数据：字节数、完成/失败/重试的文件数、各主机的首字节延迟直方图、校验耗时。
+    所有方法都只做计数，开销很小，可以在每个数据块上调用；
+    界面通过定时读取 snapshot() 来刷新，而不是每个事件都推送一次。
+    指定 trace_path 时，每个事件还会以 JSON Lines 格式追加写入该文件，便于离线分析：
+    事件先在内存中攒够 TRACE_BATCH 行，再交给单独的写入线程按顺序写入，事件循环上不做文件操作。
+    """
+
+    TRACE_BATCH = 256
+
+    def __init__(self, trace_path: Optional[str] = None):
+        self.started_at = time.monotonic()
+        self.bytes_received = 0
+        self.files_completed = 0
+        self.files_cached = 0
+        self.files_failed = 0
+        self.retries = 0
+        self.verify_seconds = 0.0
+        self.verify_count = 0
+        self.ttfb: Dict[str, LatencyHistogram] = {}
+        self._rate_samples: List[tuple] = [(self.started_at, 0)]
+        self.trace_path = trace_path
+        self._trace_lines: List[str] = []
+        # 只有一个线程，写入顺序与事件顺序一致
+        self._writer: Optional[ThreadPoolExecutor] = \
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="download-trace") if trace_path else None
+
+    def _write_trace(self, text: str):
+        with open(self.trace_path, "a", encoding="utf-8") as f:
+            f.write(text)
+
+    def _flush_trace(self):
+        if self._trace_lines:
+            self._writer.submit(self._write_trace, "".join(self._trace_lines))
+            self._trace_lines = []
+
+    def _emit(self, event: str, **fields):
+        if self._writer is not None:
+            fields["t"] = round(time.time(), 6)
+            fields["event"] = event
+            self._trace_lines.append(json.dumps(fields, ensure_ascii=False) + "\n")
+            if len(self._trace_lines) >= self.TRACE_BATCH:
+                self._flush_trace()
+
+    def on_response(self, url: str, ttfb: float, status: int):
+        host = urlsplit(url).netloc
+        histogram = self.ttfb.get(host)
+        if histogram is None:
+            histogram = self.ttfb[host] = LatencyHistogram()
+        histogram.add(ttfb)
+        self._emit("response", url=url, host=host, status=status, ttfb=ttfb)
+
+    def on_bytes(self, count: int):
+        self.bytes_received += count
+
+    def on_complete(self, url: str, size: int, elapsed: float):
+        self.files_completed += 1
+        self._emit("complete", url=url, bytes=size, elapsed=elapsed)
+
+    def on_cached(self, path: str):
+        """文件已存在且校验通过（或从对象库链接），没有产生下载"""
+        self.files_cached += 1
+        self._emit("cached", path=path)
+
+    def on_retry(self, url: str, error: str):
+        self.retries += 1
+        self._emit("retry", url=url, error=error)
+
+    def on_failure(self, url: str, error: str):
+        self.files_failed += 1
+        self._emit("failure", url=url, error=error)
+
+    def on_verify(self, path: str, seconds: float):
+        self.verify_seconds += seconds
+        self.verify_count += 1
+        self._emit("verify", path=path, seconds=seconds)
+
+    def current_speed(self, window: float = 3.0) -> float:
+        """最近 window 秒内的下载速度（字节/秒），由 snapshot 定期采样计算"""
+        now = time.monotonic()
+        self._rate_samples.append((now, self.bytes_received))
+        while len(self._rate_samples) > 2 and now - self._rate_samples[0][0] > window:
+            self._rate_samples.pop(0)
+        start_time, start_bytes = self._rate_samples[0]
+        return (self.bytes_received - start_bytes) / (now - start_time) if now > start_time else 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            "elapsed": time.monotonic() - self.started_at,
+            "bytes_received": self.bytes_received,
+            "speed": self.current_speed(),
+            "files_completed": self.files_completed,
+            "files_cached": self.files_cached,
+            "files_failed": self.files_failed,
+            "retries": self.retries,
+            "verify_seconds": self.verify_seconds,
+            "ttfb": {host: h.to_dict() for host, h in self.ttfb.items()},
+        }
+
+    def close(self, wait: bool = False):
+        """写出剩余事件和汇总；wait=False 时不等待写入线程完成（进程退出前仍会写完）"""
+        if self._writer is not None:
+            self._emit("summary", **self.snapshot())
+            self._flush_trace()
+            self._writer.shutdown(wait=wait)
+            self._writer = None
@@ -0,0 +1,379 @@
+import asyncio
+import itertools
+import os.path
+import time
+from enum import IntEnum
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import bandwidth
+
+
+class DownloadPriority(IntEnum):
+    """数值越小越先下载"""
+    META = 0
+    CLIENT = 10
+    LIBRARY = 20
+    MOD = 25
+    ASSET = 30
+
+
+class DownloadJob:
+    __slots__ = ("url", "target_path", "expected_sha1", "size", "priority", "future", "lzma_sha1", "background",
+                 "started", "yielded", "waiters")
+
+    def __init__(self, url: str, target_path: str, expected_sha1: Optional[str], size: Optional[int],
+                 priority: int, future: asyncio.Future, lzma_sha1: Optional[str] = None, background: bool = False):
+        self.url = url
+        self.target_path = target_path
+        self.expected_sha1 = expected_sha1
+        self.size = size
+        self.priority = priority
+        self.future = future
+        self.lzma_sha1 = lzma_sha1
+        self.background = background
+        # 正在由某个 worker 执行
+        self.started = False
+        # 后台任务为前台让出时被取消，不影响 future
+        self.yielded = False
+        # 还在等待结果的调用方数
+        self.waiters = 0
+
+
+class ThroughputMeter:
+    """统计已完成文件数和字节数，计算平均速度和最近一段时间的速度"""
+
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self.started_at: Optional[float] = None
+        self.files_done = 0
+        self.files_failed = 0
+        self.bytes_done = 0
+        # 已提交的任务总数和总大小（大小未知的任务只计入文件数）
+        self.files_total = 0
+        self.bytes_total = 0
+        self._samples: List[tuple] = []
+
+    def record(self, size: int, ok: bool = True):
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now
+        if ok:
+            self.files_done += 1
+            self.bytes_done += size
+        else:
+            self.files_failed += 1
+        self._samples.append((now, size))
+        # 只保留滑动窗口内的样本
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.pop(0)
+
+    def reset(self):
+        self.__init__(self.window)
+
+    def add_expected(self, size: Optional[int]):
+        self.files_total += 1
+        self.bytes_total += size or 0
+
+    @property
+    def progress(self) -> float:
+        """0~1 之间的整体进度，大小已知时按字节计算，否则按文件数计算"""
+        if self.bytes_total > 0:
+            return min(1.0, self.bytes_done / self.bytes_total)
+        if self.files_total > 0:
+            return min(1.0, (self.files_done + self.files_failed) / self.files_total)
+        return 0.0
+
+    def mark_started(self):
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return time.monotonic() - self.started_at
+
+    @property
+    def average_speed(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def current_speed(self) -> float:
+        if len(self._samples) < 2:
+            return self.average_speed
+        span = self._samples[-1][0] - self._samples[0][0]
+        if span <= 0:
+            return self.average_speed
+        return sum(size for _, size in self._samples[1:]) / span
+
+    def report(self) -> str:
+        return (f"{self.files_done} 个文件 / {self.bytes_done / 1024 / 1024:.1f} MiB，"
+                f"平均 {self.average_speed / 1024 / 1024:.2f} MiB/s，"
+                f"{self.files_done / self.elapsed if self.elapsed > 0 else 0:.0f} 文件/s")
+
+
+class DownloadScheduler:
+    """
+    有界并发的下载调度器。
+    所有下载任务进入一个优先队列，由固定数量的 worker 取出执行，
+    同时每个主机另有并发上限，避免一次性打开成千上万个连接。
+    同一目标路径在下载完成前重复提交时共用同一个任务（例如多个版本共享的库和资源文件）。
+
+    在 bandwidth.background() 范围内提交的是后台任务（空闲时预下载）：进入单独的队列，
+    由 background_concurrency 个后台 worker 执行，不计入进度。只要有前台任务，后台 worker 就不开始新的下载，
+    并且在第一个前台任务提交时立即取消进行中的后台下载（已收到的数据写入续传日志）并把它们放回队列，
+    前台任务全部结束后再继续。前台需要的文件正好是后台任务时，该任务改为前台任务。
+    """
+
+    def __init__(self, downloader, max_concurrency: int = 64, per_host_limit: int = 16,
+                 background_concurrency: int = 4):
+        self.downloader = downloader
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.background_concurrency = background_concurrency
+        self.meter = ThroughputMeter()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._background_queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._background_workers: List[asyncio.Task] = []
+        self._background_running: Dict[DownloadJob, asyncio.Task] = {}
+        # 正在让出的后台下载
+        self._yielding: Set[asyncio.Task] = set()
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, DownloadJob] = {}
+        # 未完成的前台任务数，为 0 时后台 worker 才开始下载
+        self._foreground = 0
+        self._foreground_idle: Optional[asyncio.Event] = None
+        self._foreground_busy: Optional[asyncio.Event] = None
+        # 同优先级按提交顺序执行
+        self._counter = itertools.count()
+
+    def _ensure_queues(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._background_queue = asyncio.PriorityQueue()
+            self._foreground_idle = asyncio.Event()
+            self._foreground_idle.set()
+            self._foreground_busy = asyncio.Event()
+
+    def _ensure_workers(self):
+        self._ensure_queues()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def _ensure_background_workers(self):
+        self._ensure_queues()
+        self._background_workers = [w for w in self._background_workers if not w.done()]
+        while len(self._background_workers) < self.background_concurrency:
+            self._background_workers.append(asyncio.create_task(self._background_worker()))
+
+    @property
+    def foreground_active(self) -> bool:
+        return self._foreground > 0
+
+    async def wait_foreground_idle(self):
+        # 被唤醒时前台可能已经又有了新任务（例如安装在两个阶段之间短暂空闲），所以醒来后再检查一次
+        while self._foreground:
+            await self._foreground_idle.wait()
+
+    async def wait_foreground_busy(self):
+        """等到有前台任务为止"""
+        self._ensure_queues()
+        await self._foreground_busy.wait()
+
+    def _count_foreground(self, job: DownloadJob):
+        """job 成为前台任务：计数，并在前台从空闲变为忙碌时让后台下载让出"""
+        self.meter.mark_started()
+        self.meter.add_expected(job.size)
+        self._foreground += 1
+        job.future.add_done_callback(lambda _: self._foreground_done())
+        if self._foreground == 1:
+            self._foreground_idle.clear()
+            self._foreground_busy.set()
+            for background_job, task in list(self._background_running.items()):
+                background_job.yielded = True
+                yielding = asyncio.create_task(self._cancel_until_done(task))
+                self._yielding.add(yielding)
+                yielding.add_done_callback(self._yielding.discard)
+
+    @staticmethod
+    async def _cancel_until_done(task: asyncio.Task):
+        # 与 close 中相同，Python 3.11 的 wait_for 可能吞掉取消，重复取消直到下载真正停止
+        while not task.done():
+            task.cancel()
+            await asyncio.wait({task}, timeout=0.05)
+
+    def _foreground_done(self):
+        self._foreground -= 1
+        if self._foreground == 0:
+            self._foreground_busy.clear()
+            self._foreground_idle.set()
+
+    def _enqueue(self, job: DownloadJob):
+        if job.background:
+            self._ensure_background_workers()
+            self._background_queue.put_nowait((job.priority, next(self._counter), job))
+        else:
+            self._ensure_workers()
+            self._queue.put_nowait((job.priority, next(self._counter), job))
+
+    @staticmethod
+    def _waiter(job: DownloadJob) -> asyncio.Future:
+        """
+        每个调用方一个 future：某个调用方被取消只影响它自己（例如放弃预下载时，前台也在等的文件照常下载），
+        所有调用方都取消后才取消任务本身。
+        """
+        waiter = job.future.get_loop().create_future()
+        job.waiters += 1
+
+        def on_job_done(future: asyncio.Future):
+            if waiter.done():
+                return
+            if future.cancelled():
+                waiter.cancel()
+            elif future.exception() is not None:
+                waiter.set_exception(future.exception())
+            else:
+                waiter.set_result(future.result())
+
+        def on_waiter_done(_):
+            if waiter.cancelled():
+                job.waiters -= 1
+                if job.waiters == 0 and not job.future.done():
+                    job.future.cancel()
+
+        job.future.add_done_callback(on_job_done)
+        waiter.add_done_callback(on_waiter_done)
+        return waiter
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        # 按实际发出请求的主机限流：配置了镜像时 URL 会被改写到镜像，与下载器第一次尝试时的选择一致
+        if self.downloader.mirrors is not None:
+            url = self.downloader.mirrors.rewrite(url)
+        host = urlsplit(url).netloc
+        sem = self._host_semaphores.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = sem
+        return sem
+
+    def submit(self, url: str, target_path: str, expected_sha1: Optional[str] = None,
+               priority: int = DownloadPriority.ASSET, size: Optional[int] = None,
+               lzma_sha1: Optional[str] = None) -> asyncio.Future:
+        """
+        提交一个下载任务，返回在下载完成（或失败）时结束的 Future。
+        lzma_sha1 不为空时 url 是 LZMA 压缩版本，size 为压缩后的大小。
+        """
+        background = bandwidth.is_background()
+        key = os.path.normcase(os.path.abspath(target_path))
+        pending = self._pending.get(key)
+        if pending is not None and not pending.future.done():
+            if pending.background and not background:
+                # 正在进行的后台任务会在 _count_foreground 中让出，重新排队时进入前台队列
+                pending.background = False
+                pending.priority = min(pending.priority, priority)
+                self._count_foreground(pending)
+                if not pending.started:
+                    self._enqueue(pending)
+            return self._waiter(pending)
+        self._ensure_queues()
+        future = asyncio.get_running_loop().create_future()
+        job = DownloadJob(url, target_path, expected_sha1, size, priority, future, lzma_sha1, background)
+        self._pending[key] = job
+        future.add_done_callback(lambda f: self._pending.pop(key, None) if self._pending.get(key) is job else None)
+        if not background:
+            self._count_foreground(job)
+        self._enqueue(job)
+        return self._waiter(job)
+
+    async def download(self, url: str, target_path: str, expected_sha1: Optional[str] = None,
+                       priority: int = DownloadPriority.ASSET, size: Optional[int] = None,
+                       lzma_sha1: Optional[str] = None) -> bool:
+        return await self.submit(url, target_path, expected_sha1, priority, size, lzma_sha1)
+
+    async def _run(self, job: DownloadJob):
+        try:
+            async with self._host_semaphore(job.url):
+                result = await self.downloader.download(
+                    job.url, job.target_path, expected_sha1=job.expected_sha1,
+                    expected_size=None if job.lzma_sha1 else job.size, lzma_sha1=job.lzma_sha1
+                )
+            if job.size is not None:
+                size = job.size
+            else:
+                size = os.path.getsize(job.target_path) if os.path.exists(job.target_path) else 0
+            if not job.background:
+                self.meter.record(size)
+            if not job.future.done():
+                job.future.set_result(result)
+        except asyncio.CancelledError:
+            if not job.yielded and not job.future.done():
+                job.future.cancel()
+            raise
+        except Exception as e:
+            if not job.background:
+                self.meter.record(0, ok=False)
+            if not job.future.done():
+                job.future.set_exception(e)
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                # 由后台提升的任务可能在两个队列中各有一项
+                if job.future.done() or job.started:
+                    continue
+                job.started = True
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _background_worker(self):
+        with bandwidth.background():
+            while True:
+                _, _, job = await self._background_queue.get()
+                try:
+                    await self.wait_foreground_idle()
+                    if job.future.done() or job.started or not job.background:
+                        continue
+                    job.started = True
+                    job.yielded = False
+                    task = asyncio.create_task(self._run(job))
+                    self._background_running[job] = task
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        if not job.yielded or not task.cancelled():
+                            raise
+                        # 为前台让出：放回队列，之后从续传日志继续；期间被提升的任务进入前台队列
+                        job.started = False
+                        self._enqueue(job)
+                    finally:
+                        self._background_running.pop(job, None)
+                finally:
+                    self._background_queue.task_done()
+
+    async def join(self):
+        """等待队列中所有任务完成"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """取消排队中的任务并停止所有 worker，进行中的下载被取消时会记录续传进度"""
+        for queue in (self._queue, self._background_queue):
+            while queue is not None and not queue.empty():
+                _, _, job = queue.get_nowait()
+                job.future.cancel()
+                queue.task_done()
+        workers = self._workers + self._background_workers
+        self._workers, self._background_workers = [], []
+        # Python 3.11 的 asyncio.wait_for 在等待的读取恰好同时完成时会吞掉取消，
+        # worker 可能回到 queue.get 继续等待，因此重复取消直到全部结束
+        while workers:
+            for worker in workers:
+                worker.cancel()
+            _, pending = await asyncio.wait(workers, timeout=0.5)
+            workers = list(pending)
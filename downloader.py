@@ -0,0 +1,515 @@
+import asyncio
+import hashlib
+import lzma
+import os.path
+import time
+from asyncio import to_thread
+from typing import Callable, Dict, List, Literal, Optional
+
+import aiofiles
+import aiohttp
+from aiohttp import ClientError, ClientPayloadError
+
+from bandwidth import BandwidthLimiter
+from download_journal import DownloadJournal
+from download_metrics import DownloadMetrics
+from mirrors import Mirror, MirrorSelector
+from object_store import ObjectStore
+from verify_index import VerifyIndex
+
+
+class SegmentedDownloadUnsupported(Exception):
+    """服务器不支持分段（Range）下载时抛出，调用方应退回单连接下载"""
+    pass
+
+
+class SmartDownloader:
+    WRITE_BUFFER_SIZE = 1024 * 1024
+    # 小于 RESUME_MIN_SIZE 的下载不记录续传日志，直接重新下载
+    RESUME_MIN_SIZE = 1024 * 1024
+    JOURNAL_INTERVAL = 8 * 1024 * 1024
+
+    def __init__(self, session: aiohttp.ClientSession, verify_index: Optional[VerifyIndex] = None,
+                 segment_threshold: int = 16 * 1024 * 1024, segment_count: int = 4,
+                 mirrors: Optional[MirrorSelector] = None, object_store: Optional[ObjectStore] = None,
+                 metrics: Optional[DownloadMetrics] = None, limiter: Optional[BandwidthLimiter] = None):
+        self.session = session
+        self.metrics = metrics if metrics is not None else DownloadMetrics()
+        self.verify_index = verify_index
+        self.mirrors = mirrors
+        self.object_store = object_store
+        # 大于 segment_threshold 的文件拆成 segment_count 段并行下载，segment_count <= 1 时关闭分段
+        self.segment_threshold = segment_threshold
+        self.segment_count = segment_count
+        # 为空时不限速
+        self.limiter = limiter
+
+    @staticmethod
+    async def calculate_sha1(file_path: str) -> str:
+        sha1 = hashlib.sha1()
+        async with aiofiles.open(file_path, 'rb') as f:
+            while True:
+                chunk = await f.read(64 * 1024)
+                if not chunk:
+                    break
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    @staticmethod
+    def _read_chunk(resp: aiohttp.ClientResponse, limiter: Optional[BandwidthLimiter]):
+        size = limiter.read_size() if limiter is not None else 0
+        return resp.content.read(size) if size else resp.content.readany()
+
+    @staticmethod
+    async def _stream_to_file(resp: aiohttp.ClientResponse, part_path: str, sha1,
+                              timeout_per_chunk: float, mode: Literal["ab", "wb"] = "wb",
+                              journal: Optional[DownloadJournal] = None,
+                              on_bytes: Optional[Callable[[int], None]] = None,
+                              limiter: Optional[BandwidthLimiter] = None) -> int:
+        """
+        按网络实际到达的大小读取数据块，边读边更新 SHA1，
+        写入先在内存中攒够 WRITE_BUFFER_SIZE 再交给线程池，避免每个小块都切换一次线程。
+        提供 journal 时，每写入 JOURNAL_INTERVAL 字节（以及中途出错时）记录一次已确认的进度。
+        提供 limiter 时按限速读取，限速等待的时间不计入过慢检测。
+        返回本次写入的字节数。
+        """
+        offset = journal.size if journal is not None and mode == "ab" else 0
+        total_downloaded = 0
+        flushed = 0
+        last_journal = 0
+        last_check = time.monotonic()
+        last_bytes = 0
+        throttled = 0.0
+        check_interval = 5.0
+        buffer = bytearray()
+
+        def checkpoint():
+            # 此时 buffer 已全部写入，sha1 恰好对应文件中已确认的数据
+            journal.size = offset + flushed
+            journal.prefix_sha1 = sha1.hexdigest()
+            journal.save()
+
+        async with aiofiles.open(part_path, mode=mode) as f:
+            try:
+                while True:
+                    # 超时控制
+                    chunk = await asyncio.wait_for(SmartDownloader._read_chunk(resp, limiter),
+                                                   timeout=timeout_per_chunk)
+                    if not chunk:
+                        break
+                    sha1.update(chunk)
+                    buffer += chunk
+                    total_downloaded += len(chunk)
+                    if on_bytes is not None:
+                        on_bytes(len(chunk))
+                    if limiter is not None:
+                        throttled += await limiter.acquire(len(chunk))
+                    if len(buffer) >= SmartDownloader.WRITE_BUFFER_SIZE:
+                        await f.write(bytes(buffer))
+                        flushed += len(buffer)
+                        buffer.clear()
+                        if journal is not None and flushed - last_journal >= SmartDownloader.JOURNAL_INTERVAL:
+                            await f.flush()
+                            checkpoint()
+                            last_journal = flushed
+                    # 滑动窗口测速
+                    now = time.monotonic()
+                    if now - last_check - throttled >= check_interval:
+                        speed = (total_downloaded - last_bytes) / (now - last_check - throttled)
+                        if speed < 1024:  # <1KB/s
+                            raise Exception("下载速度过慢，强制中断重试")
+                        last_check, last_bytes, throttled = now, total_downloaded, 0.0
+            except BaseException:
+                # 连接中断时已收到的数据仍然有效，落盘并记录进度以便续传
+                if journal is not None and offset + total_downloaded >= SmartDownloader.RESUME_MIN_SIZE:
+                    if buffer:
+                        await f.write(bytes(buffer))
+                        flushed += len(buffer)
+                        buffer.clear()
+                    await f.flush()
+                    checkpoint()
+                raise
+            if buffer:
+                await f.write(bytes(buffer))
+        return total_downloaded
+
+    async def _prepare_resume(self, url: str, request_url: str, part_path: str,
+                              expected_sha1: Optional[str]) -> tuple:
+        """
+        根据续传日志恢复已下载的部分。
+        返回 (journal, sha1, 请求头)，无可续传数据时 journal.size 为 0。
+        """
+        journal = DownloadJournal.load(part_path, url, expected_sha1) if os.path.exists(part_path) else None
+        # 分段下载的日志不是从头连续的数据，不能按前缀续传
+        if journal is not None and journal.segments is None and journal.size > 0:
+            sha1 = await to_thread(journal.restore_hash)
+            if sha1 is not None:
+                headers = {"Range": f"bytes={journal.size}-"}
+                # 文件在服务器上变化时 If-Range 会让服务器返回完整的 200 响应；
+                # 换了镜像时旧的校验值没有意义，由最终的 SHA1 校验兜底
+                validator = journal.etag or journal.last_modified
+                if validator and journal.source_url == request_url:
+                    headers["If-Range"] = validator
+                return journal, sha1, headers
+            print(f"续传数据校验失败，将重新下载 {url}")
+        journal = DownloadJournal(part_path, url, expected_sha1)
+        return journal, hashlib.sha1(), {}
+
+    @staticmethod
+    def _is_valid_partial(resp: aiohttp.ClientResponse, offset: int) -> bool:
+        """206 响应的 Content-Range 必须从我们请求的位置开始"""
+        content_range = resp.headers.get("Content-Range", "")
+        if not content_range.startswith("bytes "):
+            return False
+        try:
+            start = int(content_range[6:].split("-", 1)[0])
+        except ValueError:
+            return False
+        return start == offset
+
+    @staticmethod
+    def _write_at(path: str, offset: int, data: bytes):
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+
+    @staticmethod
+    def _preallocate(path: str, size: int):
+        with open(path, "wb") as f:
+            f.truncate(size)
+
+    async def _fetch_segment(self, url: str, part_path: str, segment: List[int], headers: Dict[str, str],
+                             journal: DownloadJournal, timeout_per_chunk: float, retry: int):
+        """
+        下载 segment = [起点, 终点, 已写入到的位置] 剩余的字节并写入临时文件对应位置，
+        写入后更新 segment[2]，失败时只重试这一段的剩余部分。
+        """
+        start, end, pos = segment
+        while True:
+            buffer = bytearray()
+            try:
+                requested_at = time.monotonic()
+                try:
+                    async with self.session.get(url, headers={**headers, "Range": f"bytes={pos}-{end}"},
+                                                allow_redirects=True) as resp:
+                        self.metrics.on_response(url, time.monotonic() - requested_at, resp.status)
+                        resp.raise_for_status()
+                        if resp.status != 206 or not self._is_valid_partial(resp, pos):
+                            # 带 If-Range 续传时返回 200 说明文件已经变化
+                            raise SegmentedDownloadUnsupported(f"服务器不支持分段下载或文件已变化: {url}")
+                        journal.etag = resp.headers.get("ETag")
+                        journal.last_modified = resp.headers.get("Last-Modified")
+                        while True:
+                            chunk = await asyncio.wait_for(self._read_chunk(resp, self.limiter),
+                                                           timeout=timeout_per_chunk)
+                            if not chunk:
+                                break
+                            buffer += chunk
+                            self.metrics.on_bytes(len(chunk))
+                            if self.limiter is not None:
+                                await self.limiter.acquire(len(chunk))
+                            if len(buffer) >= self.WRITE_BUFFER_SIZE:
+                                await to_thread(self._write_at, part_path, pos, bytes(buffer))
+                                pos += len(buffer)
+                                segment[2] = pos
+                                buffer.clear()
+                                self._checkpoint_segments(journal)
+                finally:
+                    # 中途出错或被取消时已收到的数据仍然有效，写入后记入日志
+                    if buffer:
+                        await to_thread(self._write_at, part_path, pos, bytes(buffer))
+                        pos += len(buffer)
+                        segment[2] = pos
+                if pos != end + 1:
+                    raise ClientPayloadError(f"分段数据不完整 ({pos - start}/{end + 1 - start})")
+                return
+            except SegmentedDownloadUnsupported:
+                raise
+            except (ClientError, asyncio.TimeoutError) as e:
+                if retry <= 0:
+                    raise
+                retry -= 1
+                self.metrics.on_retry(url, str(e))
+                print(f"分段 {start}-{end} 出错: {e}，从 {pos} 继续（剩余 {retry} 次）")
+                await asyncio.sleep(1)
+
+    def _checkpoint_segments(self, journal: DownloadJournal):
+        """各段每共写入 JOURNAL_INTERVAL 字节保存一次日志"""
+        size = sum(pos - start for start, _, pos in journal.segments)
+        if size - journal.size >= self.JOURNAL_INTERVAL:
+            journal.save()
+
+    async def _download_segmented(self, url: str, request_url: str, target_path: str, size: int,
+                                  expected_sha1: Optional[str], timeout_per_chunk: float, retry: int):
+        """
+        把文件按字节区间拆成多段，通过同一个 session 并行下载到预分配的临时文件中。
+        每段写入到的位置记录在续传日志中（出错、被取消时也会记录），重新开始时只下载各段剩余的部分。
+        各段乱序到达，无法边下载边计算哈希，因此在全部完成后统一校验一次。
+        """
+        part_path = f"{target_path}.part"
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        journal = DownloadJournal.load(part_path, url, expected_sha1)
+        headers = {}
+        if journal is not None and await to_thread(journal.segments_match, size):
+            # 文件在服务器上变化时 If-Range 会让服务器返回 200，换用单连接从头下载
+            validator = journal.etag or journal.last_modified
+            if validator and journal.source_url == request_url:
+                headers["If-Range"] = validator
+            print(f"从续传日志继续分段下载 {url}（已完成 {journal.size}/{size}）")
+        else:
+            journal = DownloadJournal(part_path, url, expected_sha1)
+            segment_size = -(-size // self.segment_count)
+            journal.segments = [[start, min(start + segment_size, size) - 1, start]
+                                for start in range(0, size, segment_size)]
+            await to_thread(self._preallocate, part_path, size)
+        journal.source_url = request_url
+        journal.save()
+        tasks = [
+            asyncio.create_task(self._fetch_segment(
+                request_url, part_path, segment, headers, journal, timeout_per_chunk, retry
+            ))
+            for segment in journal.segments if segment[2] <= segment[1]
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            try:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                # 等待时可能再次被取消，日志中的位置只会落后于实际写入的数据，仍然可以续传
+                if isinstance(e, SegmentedDownloadUnsupported):
+                    journal.remove()
+                else:
+                    # 保留临时文件，下次从各段写入到的位置继续
+                    journal.save()
+            raise
+        if expected_sha1:
+            verify_started_at = time.monotonic()
+            actual = await self.calculate_sha1(part_path)
+            self.metrics.on_verify(target_path, time.monotonic() - verify_started_at)
+            if actual != expected_sha1:
+                journal.remove()
+                raise Exception(f"SHA1 校验失败 (期望 {expected_sha1}，实际 {actual})")
+        os.replace(part_path, target_path)
+        os.remove(journal.path)
+        if expected_sha1 and self.verify_index is not None:
+            self.verify_index.record(target_path, expected_sha1)
+
+    async def _download_lzma(self, url: str, target_path: str, expected_sha1: Optional[str], lzma_sha1: str,
+                             timeout_per_chunk: float, retry: int) -> bool:
+        """
+        下载 LZMA 压缩的文件，边接收边在线程中解压写入临时文件。
+        压缩数据和解压后的数据分别计算 SHA1，expected_sha1 对应解压后的内容。
+        压缩流无法从中间续传，出错时整个文件重新下载。
+        """
+        part_path = f"{target_path}.part"
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        while True:
+            mirror, request_url = self.mirrors.pick(url) if self.mirrors is not None else (None, url)
+            started_at = time.monotonic()
+            decompressor = lzma.LZMADecompressor()
+            compressed_sha1 = hashlib.sha1()
+            sha1 = hashlib.sha1()
+            received = 0
+            try:
+                with open(part_path, "wb") as f:
+                    def sink(data: bytes):
+                        # lzma 解压时会释放 GIL，放在线程中不阻塞事件循环
+                        compressed_sha1.update(data)
+                        out = decompressor.decompress(data)
+                        sha1.update(out)
+                        f.write(out)
+
+                    requested_at = time.monotonic()
+                    async with self.session.get(request_url, allow_redirects=True) as resp:
+                        self.metrics.on_response(request_url, time.monotonic() - requested_at, resp.status)
+                        resp.raise_for_status()
+                        buffer = bytearray()
+                        while True:
+                            chunk = await asyncio.wait_for(self._read_chunk(resp, self.limiter),
+                                                       timeout=timeout_per_chunk)
+                            if not chunk:
+                                break
+                            buffer += chunk
+                            received += len(chunk)
+                            self.metrics.on_bytes(len(chunk))
+                            if self.limiter is not None:
+                                await self.limiter.acquire(len(chunk))
+                            if len(buffer) >= self.WRITE_BUFFER_SIZE:
+                                await to_thread(sink, bytes(buffer))
+                                buffer.clear()
+                        if buffer:
+                            await to_thread(sink, bytes(buffer))
+                if not decompressor.eof:
+                    raise ClientPayloadError("LZMA 数据不完整")
+                if compressed_sha1.hexdigest() != lzma_sha1:
+                    raise ValueError(f"SHA1 校验失败 (期望 {lzma_sha1}，实际 {compressed_sha1.hexdigest()})")
+                if expected_sha1 and sha1.hexdigest() != expected_sha1:
+                    raise ValueError(f"解压后 SHA1 校验失败 (期望 {expected_sha1}，实际 {sha1.hexdigest()})")
+                os.replace(part_path, target_path)
+                if expected_sha1 and self.verify_index is not None:
+                    self.verify_index.record(target_path, expected_sha1)
+                await self._ingest(target_path, expected_sha1)
+                self._report_success(mirror, received, started_at)
+                self.metrics.on_complete(url, received, time.monotonic() - started_at)
+                return True
+            except (ClientError, asyncio.TimeoutError, lzma.LZMAError, ValueError, OSError) as e:
+                self._report_failure(mirror)
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                if retry <= 0:
+                    self.metrics.on_failure(url, str(e))
+                    raise Exception(f"下载失败: {e}")
+                retry -= 1
+                self.metrics.on_retry(url, str(e))
+                print(f"下载出错: {e}，准备重试（剩余 {retry} 次）")
+                await asyncio.sleep(1)
+
+    async def _ingest(self, target_path: str, sha1: Optional[str]):
+        if sha1 and self.object_store is not None:
+            await self.object_store.ingest(target_path, sha1)
+
+    def _report_success(self, mirror: Optional[Mirror], size: int, started_at: float):
+        if self.mirrors is not None:
+            self.mirrors.report_success(mirror, size, time.monotonic() - started_at)
+
+    def _report_failure(self, mirror: Optional[Mirror]):
+        if self.mirrors is not None:
+            self.mirrors.report_failure(mirror)
+
+    async def download(
+        self,
+        url: str,
+        target_path: str,
+        retry: int = 3,
+        timeout_per_chunk: float = 10.0,
+        expected_sha1: Optional[str] = None,
+        expected_size: Optional[int] = None,
+        lzma_sha1: Optional[str] = None
+    ) -> bool:
+        """
+        返回 True 表示下载成功（且 SHA1 校验通过，如果提供 expected_sha1）。
+        否则会在重试耗尽后抛出异常。
+        已知 expected_size 且超过 segment_threshold 的文件会分段并行下载。
+        提供 lzma_sha1 时 url 指向 LZMA 压缩的版本，下载时解压，expected_sha1 仍是解压后内容的哈希。
+        """
+        use_store = True
+        # 如果文件已存在且 SHA1 匹配，直接返回
+        if expected_sha1 and os.path.exists(target_path):
+            # 校验索引中 stat 信息未变化的文件无需重新计算哈希
+            # 上次校验通过时已放入对象库
+            if self.verify_index is not None and self.verify_index.is_verified(target_path, expected_sha1):
+                self.metrics.on_cached(target_path)
+                return True
+            verify_started_at = time.monotonic()
+            actual = await self.calculate_sha1(target_path)
+            self.metrics.on_verify(target_path, time.monotonic() - verify_started_at)
+            if actual == expected_sha1:
+                if self.verify_index is not None:
+                    self.verify_index.record(target_path, actual)
+                await self._ingest(target_path, expected_sha1)
+                self.metrics.on_cached(target_path)
+                return True
+            else:
+                print(f"文件存在但 SHA1 不匹配 ({actual} != {expected_sha1})，将重新下载")
+                if self.object_store is not None:
+                    await self.object_store.evict_if_linked(target_path, expected_sha1)
+                os.remove(target_path)
+                if self.verify_index is not None:
+                    self.verify_index.discard(target_path)
+                # 本地文件刚刚校验失败，这次一定从网络下载，不再从对象库生成
+                use_store = False
+        # 共享对象库中有完好的对象时直接链接过来，不走网络
+        if expected_sha1 and self.object_store is not None and use_store \
+                and await self.object_store.materialize(expected_sha1, target_path, expected_size) is not None:
+            if self.verify_index is not None:
+                self.verify_index.record(target_path, expected_sha1)
+            self.metrics.on_cached(target_path)
+            return True
+        if lzma_sha1:
+            return await self._download_lzma(url, target_path, expected_sha1, lzma_sha1, timeout_per_chunk, retry)
+        # 先写入临时文件，校验通过后再原子替换到目标路径，目标路径上永远不会出现半截文件
+        part_path = f"{target_path}.part"
+        segmented = bool(expected_size and self.segment_count > 1 and expected_size >= self.segment_threshold)
+        error: Optional[Exception] = None
+        for attempt in range(retry + 1):
+            if attempt:
+                self.metrics.on_retry(url, str(error))
+                print(f"下载出错: {error}，准备重试（剩余 {retry - attempt} 次）")
+                await asyncio.sleep(1)
+            # 每次尝试都按当前排名选择镜像，上一次出错或过慢的镜像会被排到后面
+            mirror, request_url = self.mirrors.pick(url) if self.mirrors is not None else (None, url)
+            started_at = time.monotonic()
+            # 已有单连接续传日志时优先续传，不再分段
+            journal = DownloadJournal.load(part_path, url, expected_sha1) \
+                if os.path.exists(f"{part_path}.json") else None
+            if segmented and (journal is None or journal.segments is not None):
+                try:
+                    await self._download_segmented(url, request_url, target_path, expected_size, expected_sha1,
+                                                   timeout_per_chunk, retry - attempt)
+                    await self._ingest(target_path, expected_sha1)
+                    self._report_success(mirror, expected_size, started_at)
+                    self.metrics.on_complete(url, expected_size, time.monotonic() - started_at)
+                    return True
+                except SegmentedDownloadUnsupported as e:
+                    print(f"{e}，改用单连接下载")
+                    segmented = False
+                except Exception as e:
+                    # 各段写入到的位置已记入日志，重试时（可能换一个镜像）只下载剩余部分
+                    self._report_failure(mirror)
+                    error = e
+                    continue
+            try:
+                os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+                journal, sha1, headers = await self._prepare_resume(url, request_url, part_path, expected_sha1)
+                requested_at = time.monotonic()
+                async with self.session.get(request_url, headers=headers, allow_redirects=True) as resp:
+                    self.metrics.on_response(request_url, time.monotonic() - requested_at, resp.status)
+                    resp.raise_for_status()  # 捕获 4xx/5xx 错误
+
+                    mode: Literal["ab", "wb"] = "wb"
+                    if headers and resp.status == 206 and self._is_valid_partial(resp, journal.size):
+                        mode = "ab"
+                    elif headers:
+                        # 服务器忽略了 Range 或文件已变化，从头开始
+                        print(f"服务器不支持续传或文件已变化，从头下载 {url}")
+                        sha1 = hashlib.sha1()
+                        journal.size = 0
+                    journal.source_url = request_url
+                    journal.etag = resp.headers.get("ETag")
+                    journal.last_modified = resp.headers.get("Last-Modified")
+                    received = await self._stream_to_file(resp, part_path, sha1, timeout_per_chunk, mode, journal,
+                                                          self.metrics.on_bytes, self.limiter)
+                # 大小不符时数据一定有误，已记录的续传进度也不可信
+                size = os.path.getsize(part_path)
+                if expected_size is not None and size != expected_size:
+                    journal.remove()
+                    raise ClientPayloadError(f"文件大小不符 (期望 {expected_size}，实际 {size})")
+                # 边下载边计算 SHA1，无需再从磁盘读一遍
+                if expected_sha1 and sha1.hexdigest() != expected_sha1:
+                    journal.remove()
+                    self._report_failure(mirror)
+                    error = ValueError(f"SHA1 校验失败 (期望 {expected_sha1}，实际 {sha1.hexdigest()})")
+                    continue
+                os.replace(part_path, target_path)
+                if os.path.exists(journal.path):
+                    os.remove(journal.path)
+                if expected_sha1 and self.verify_index is not None:
+                    self.verify_index.record(target_path, expected_sha1)
+                await self._ingest(target_path, expected_sha1)
+                self._report_success(mirror, received, started_at)
+                self.metrics.on_complete(url, received, time.monotonic() - started_at)
+                return True
+            except Exception as e:
+                self._report_failure(mirror)
+                # 有续传日志的临时文件保留下来，重试时从断点继续；否则清理可能损坏的临时文件
+                if os.path.exists(part_path) and not os.path.exists(f"{part_path}.json"):
+                    try:
+                        os.remove(part_path)
+                    except OSError:
+                        pass
+                error = e
+        self.metrics.on_failure(url, str(error))
+        raise Exception(f"下载失败: {error}")
@@ -0,0 +1,51 @@
+import json
+import os
+import os.path
+import threading
+from contextlib import contextmanager
+from typing import Any, Optional
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w"):
+    """
+    先写入临时文件，正常结束后原子替换到 path，读取方不会看到写了一半的文件；出错时删除临时文件。
+    临时文件名带进程号和线程号，同时写同一个 path 的多个线程或进程互不干扰，最后完成的一个生效。
+    mode 为 "w"（UTF-8 文本）或 "wb"。阻塞调用。
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, **kwargs):
+    """json.dump 到 path，kwargs 原样传给 json.dump。阻塞调用"""
+    with atomic_write(path) as f:
+        json.dump(data, f, **kwargs)
+
+
+def contained_path(root: str, relative: str) -> Optional[str]:
+    """
+    把来自网络或压缩包的相对路径拼到 root 下，返回绝对路径。
+    结果不在 root 之内（../、绝对路径、其他盘）或就是 root 本身时返回 None。
+    """
+    relative = relative.replace("\\", "/")
+    if os.path.isabs(relative) or os.path.splitdrive(relative)[0]:
+        return None
+    root = os.path.abspath(root)
+    path = os.path.abspath(os.path.join(root, relative))
+    try:
+        inside = os.path.commonpath([root, path]) == root
+    except ValueError:
+        # Windows 上位于不同的盘
+        inside = False
+    return path if inside and path != root else None
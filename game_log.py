@@ -0,0 +1,287 @@
+import asyncio
+import os
+import os.path
+import re
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional
+from xml.sax.saxutils import unescape
+
+LEVELS = {"TRACE": 0, "DEBUG": 1, "INFO": 2, "WARN": 3, "ERROR": 4, "FATAL": 5}
+
+_EVENT_START = "<log4j:Event"
+_EVENT_END = "</log4j:Event>"
+_ATTRIBUTE = re.compile(r'(\w+)="([^"]*)"')
+_MESSAGE = re.compile(r"<log4j:Message>(?:<!\[CDATA\[(.*?)\]\]>|(.*?))</log4j:Message>", re.S)
+_THROWABLE = re.compile(r"<log4j:Throwable>(?:<!\[CDATA\[(.*?)\]\]>|(.*?))</log4j:Throwable>", re.S)
+# 没有使用 XML 配置时的默认格式：[12:34:56] [Render thread/INFO]: 消息
+_PLAIN = re.compile(r"^\[[^\]]*\] \[([^\]]*)/(TRACE|DEBUG|INFO|WARN|ERROR|FATAL)\]: ?(.*)$")
+
+
+class LogRecord:
+    __slots__ = ("time", "level", "logger", "thread", "message", "throwable")
+
+    def __init__(self, time_: float, level: str, logger: str, thread: str, message: str,
+                 throwable: Optional[str] = None):
+        # 秒级时间戳
+        self.time = time_
+        self.level = level
+        self.logger = logger
+        self.thread = thread
+        self.message = message
+        self.throwable = throwable
+
+    @property
+    def level_no(self) -> int:
+        return LEVELS.get(self.level, LEVELS["INFO"])
+
+    def format(self) -> str:
+        line = f"[{time.strftime('%H:%M:%S', time.localtime(self.time))}] [{self.thread}/{self.level}]"
+        if self.logger:
+            line += f" ({self.logger})"
+        line += f": {self.message}"
+        if self.throwable:
+            line += f"\n{self.throwable.rstrip()}"
+        return line
+
+
+class Log4jParser:
+    """
+    逐行解析游戏输出。版本 JSON 的 logging.client 配置让 log4j 以 XMLLayout 输出，
+    每条日志是一个跨多行的 <log4j:Event>；其余行（log4j 初始化之前的输出、JVM 崩溃信息等）
+    按普通文本处理。每个流各用一个解析器，事件不会被另一个流的输出打断。
+    """
+
+    # 单个事件的最大行数，超过时认为输出不完整，按普通文本交出
+    MAX_EVENT_LINES = 10000
+
+    def __init__(self, default_level: str = "INFO", thread: str = "stdout"):
+        self.default_level = default_level
+        self.thread = thread
+        self._event: Optional[List[str]] = None
+
+    def _plain(self, line: str) -> LogRecord:
+        match = _PLAIN.match(line)
+        if match:
+            return LogRecord(time.time(), match.group(2), "", match.group(1), match.group(3))
+        return LogRecord(time.time(), self.default_level, "", self.thread, line)
+
+    def _parse_event(self, text: str) -> LogRecord:
+        header = text[:text.find(">") + 1]
+        attributes = {key: unescape(value, {"&quot;": '"'}) for key, value in _ATTRIBUTE.findall(header)}
+        message = _MESSAGE.search(text)
+        throwable = _THROWABLE.search(text)
+        try:
+            timestamp = int(attributes.get("timestamp", "")) / 1000
+        except ValueError:
+            timestamp = time.time()
+        return LogRecord(
+            timestamp, attributes.get("level", self.default_level), attributes.get("logger", ""),
+            attributes.get("thread", self.thread),
+            (message.group(1) if message.group(1) is not None else unescape(message.group(2))) if message else "",
+            (throwable.group(1) if throwable.group(1) is not None else unescape(throwable.group(2)))
+            if throwable else None
+        )
+
+    def feed(self, line: str) -> List[LogRecord]:
+        """输入一行（不含换行符），返回解析完成的记录"""
+        if self._event is None:
+            stripped = line.lstrip()
+            if not stripped.startswith(_EVENT_START):
+                return [self._plain(line)] if line else []
+            self._event = []
+        self._event.append(line)
+        if _EVENT_END in line:
+            lines, self._event = self._event, None
+            return [self._parse_event("\n".join(lines))]
+        if len(self._event) >= self.MAX_EVENT_LINES:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[LogRecord]:
+        """流结束时交出未完成的事件"""
+        lines, self._event = self._event, None
+        return [self._plain(line) for line in lines or []]
+
+
+class LogBuffer:
+    """固定容量的环形缓冲区，保存最近的日志，界面切换过滤级别时从这里重新取"""
+
+    def __init__(self, capacity: int = 20000):
+        self._records: Deque[LogRecord] = deque(maxlen=capacity)
+        self.total = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def dropped(self) -> int:
+        return self.total - len(self._records)
+
+    def extend(self, records: List[LogRecord]):
+        self._records.extend(records)
+        self.total += len(records)
+
+    def snapshot(self, min_level: int = 0, limit: Optional[int] = None) -> List[LogRecord]:
+        records = [r for r in self._records if r.level_no >= min_level]
+        return records[-limit:] if limit else records
+
+
+class RotatingLogFile:
+    """
+    按大小轮转的日志文件：latest.log 写满 max_bytes 后依次改名为 latest.1.log、latest.2.log……，
+    最多保留 backups 个。只在线程中调用，不阻塞事件循环。
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+        self._size = 0
+
+    def _backup_path(self, i: int) -> str:
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{i}{ext}"
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8", errors="replace")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(self._backup_path(i)):
+                os.replace(self._backup_path(i), self._backup_path(i + 1))
+        if self.backups > 0:
+            os.replace(self.path, self._backup_path(1))
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, lines: List[str]):
+        if self._file is None:
+            self._open()
+        for line in lines:
+            data = line + "\n"
+            if self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            # 按字符数估算，避免逐行编码
+            self._size += len(data)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class GameLogPipeline:
+    """
+    游戏日志管道：异步分块读取子进程的 stdout/stderr，解析 log4j 事件，
+    放入环形缓冲区并完整写入轮转的日志文件；界面通过 on_batch 每 flush_interval 秒
+    收到一批不低于 min_level 的记录，每批最多 max_batch 条（超出的只保留最新的，可从 buffer 取回）。
+    日志暴增时界面每秒最多更新 1/flush_interval 次、每次最多 max_batch 条，内存由缓冲区容量限定。
+    """
+
+    READ_SIZE = 8 * 1024
+    # 等待写入磁盘的行数上限，超过时暂停读取，由管道把压力传回游戏进程
+    MAX_PENDING = 50000
+
+    def __init__(self, log_path: Optional[str] = None, capacity: int = 20000, flush_interval: float = 0.1,
+                 max_batch: int = 500, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.buffer = LogBuffer(capacity)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.min_level = LEVELS["INFO"]
+        self.log_file = RotatingLogFile(log_path, max_bytes, backups) if log_path else None
+        # 回调参数：本批记录、因超出 max_batch 未显示的条数
+        self.on_batch: Optional[Callable[[List[LogRecord], int], None]] = None
+        self._pending: List[LogRecord] = []
+        self._unwritten: List[LogRecord] = []
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._finished = False
+        self.lines = 0
+
+    def set_min_level(self, level: str):
+        self.min_level = LEVELS.get(level, LEVELS["INFO"])
+
+    def _accept(self, records: List[LogRecord]):
+        if not records:
+            return
+        self.lines += len(records)
+        self.buffer.extend(records)
+        self._pending.extend(records)
+        if self.log_file is not None:
+            self._unwritten.extend(records)
+            if len(self._unwritten) >= self.MAX_PENDING:
+                self._drained.clear()
+
+    async def _read(self, stream: asyncio.StreamReader, parser: Log4jParser):
+        remainder = b""
+        while True:
+            chunk = await stream.read(self.READ_SIZE)
+            if not chunk:
+                break
+            lines = (remainder + chunk).split(b"\n")
+            remainder = lines.pop()
+            records = []
+            for line in lines:
+                records += parser.feed(line.rstrip(b"\r").decode("utf-8", errors="replace"))
+            self._accept(records)
+            await self._drained.wait()
+        if remainder:
+            self._accept(parser.feed(remainder.decode("utf-8", errors="replace")))
+        self._accept(parser.flush())
+
+    def _deliver(self):
+        pending, self._pending = self._pending, []
+        if self.on_batch is None:
+            return
+        visible = [r for r in pending if r.level_no >= self.min_level]
+        if not visible:
+            return
+        skipped = max(0, len(visible) - self.max_batch)
+        self.on_batch(visible[-self.max_batch:], skipped)
+
+    def _write_sync(self, records: List[LogRecord]):
+        self.log_file.write([r.format() for r in records])
+
+    async def _write(self):
+        if self.log_file is None or not self._unwritten:
+            return
+        records, self._unwritten = self._unwritten, []
+        await asyncio.to_thread(self._write_sync, records)
+        if len(self._unwritten) < self.MAX_PENDING:
+            self._drained.set()
+
+    async def _flush_loop(self):
+        # 不取消这个任务：写文件的线程不能在中途被放弃
+        while not self._finished:
+            await asyncio.sleep(self.flush_interval)
+            self._deliver()
+            await self._write()
+
+    async def run(self, process: asyncio.subprocess.Process) -> int:
+        """读取到进程退出为止，返回退出码；进程需以 stdout/stderr=PIPE 启动"""
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            readers = []
+            if process.stdout is not None:
+                readers.append(self._read(process.stdout, Log4jParser("INFO", "stdout")))
+            if process.stderr is not None:
+                readers.append(self._read(process.stderr, Log4jParser("ERROR", "stderr")))
+            await asyncio.gather(*readers)
+            return await process.wait()
+        finally:
+            self._finished = True
+            self._drained.set()
+            await flusher
+            self._deliver()
+            self._drained.set()
+            await self._write()
+            if self.log_file is not None:
+                await asyncio.to_thread(self.log_file.close)
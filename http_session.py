@@ -0,0 +1,124 @@
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import aiohttp
+
+
+class ConnectionStats:
+    """通过 aiohttp 的 TraceConfig 统计请求数、新建连接（握手）次数、连接复用次数和 DNS 缓存命中"""
+
+    def __init__(self):
+        self.requests = 0
+        # 新建的连接数，每个都经过一次 TCP（https 时还有 TLS）握手
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.connect_time = 0.0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def reset(self):
+        self.__init__()
+
+    @property
+    def reuse_rate(self) -> float:
+        """从连接池取得的连接中复用已有连接的比例"""
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+    def snapshot(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_rate": self.reuse_rate,
+            "connect_time": self.connect_time,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx: SimpleNamespace, params):
+            self.requests += 1
+
+        async def on_connection_create_start(session, ctx: SimpleNamespace, params):
+            ctx.connect_started = time.monotonic()
+
+        async def on_connection_create_end(session, ctx: SimpleNamespace, params):
+            self.connections_created += 1
+            self.connect_time += time.monotonic() - getattr(ctx, "connect_started", time.monotonic())
+
+        async def on_connection_reuseconn(session, ctx: SimpleNamespace, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, ctx: SimpleNamespace, params):
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, ctx: SimpleNamespace, params):
+            self.dns_cache_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+
+class SessionManager:
+    """
+    应用持有的 HTTP 会话，所有下载共用一个连接池。
+    - 连接池：总连接数 limit，每个主机最多 limit_per_host 个（与调度器的每主机并发一致），
+      空闲连接保持 keepalive_timeout 秒，几千个发往同一主机的资源请求复用这些连接，不必每次重新握手；
+    - DNS 解析结果缓存 dns_cache_ttl 秒；
+    - 超时：total 为单个请求（含读取响应体）的总时长上限，connect 只限制建立 TCP/TLS 连接，
+      read 为两次收到数据之间的最长间隔。在连接池中排队等待的时间不计入 connect。
+    会话在第一次调用 open 时才创建，close 之后可以再次 open。
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 16, keepalive_timeout: float = 30.0,
+                 dns_cache_ttl: int = 300, total_timeout: Optional[float] = 30 * 60, connect_timeout: float = 15.0,
+                 read_timeout: float = 30.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self.stats = ConnectionStats()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> Optional[aiohttp.ClientSession]:
+        return self._session
+
+    def open(self) -> aiohttp.ClientSession:
+        """返回共用的会话，还没有时创建；需要在事件循环中调用"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host, keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True, ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                  trace_configs=[self.stats.trace_config()])
+        return self._session
+
+    async def close(self):
+        """
+        关闭会话和连接池。使用会话的下载应先停止（Installer.close 会取消进行中的下载并记录续传进度），
+        否则它们会因连接关闭而出错。
+        """
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        await session.close()
+
+    async def __aenter__(self) -> "SessionManager":
+        self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,426 @@
+import asyncio
+import hashlib
+import json
+import os
+import os.path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+import bandwidth
+import typed_dict
+from asset_index import AssetIndex
+from asset_layout import AssetLayout
+from asset_planner import AssetPlan, AssetPlanner
+from download_metrics import DownloadMetrics
+from download_scheduler import DownloadScheduler, DownloadPriority
+from downloader import SmartDownloader
+from file_util import atomic_write_json
+from http_session import SessionManager
+from integrity import IntegrityChecker, IntegrityReport
+from java_runtime import JavaRuntimeInstaller, RuntimeNotAvailableError
+from library_resolver import LibraryResolver
+from loader_profile import LoaderProfiles, load_version
+from manifest_cache import ManifestCache
+from mirrors import MirrorSelector
+from natives import NativesExtractor
+from object_store import ObjectStore
+from verify_index import VerifyIndex
+from version_json import VersionJson
+
+VERSION_MANIFEST_V2_URL = "https://launchermeta.mojang.com/mc/game/version_manifest_v2.json"
+
+
+class VersionNotFoundError(Exception):
+    """当用户请求的 Minecraft 版本不存在时抛出"""
+    pass
+
+
+class Installer:
+    """
+    不依赖界面的安装接口：版本清单、下载、校验修复都在这里完成，界面和命令行只负责展示。
+    所有版本共用同一个 session、调度器和校验索引，一次安装多个版本时共享的库和资源只下载一次。
+    session 来自 sessions（应用持有的 SessionManager）；不提供时自己创建一个，并在 close 时一起关闭。
+    rate_limit / background_rate_limit 为下载限速（字节/秒，0 为不限），运行中可通过 limiter.set_rates 修改；
+    在 bandwidth.background() 中调用的安装和修复按后台流量进行，见 DownloadScheduler。
+
+        async with Installer(".minecraft") as installer:
+            await installer.install_many(["1.20.1", "1.19.4"])
+    """
+
+    def __init__(self, minecraft_folder_path: str, max_concurrency: int = 64, per_host_limit: int = 16,
+                 object_store_root: Optional[str] = None, manifest_url: str = VERSION_MANIFEST_V2_URL,
+                 install_java: bool = True, mirrors: Optional[MirrorSelector] = None,
+                 sessions: Optional[SessionManager] = None, rate_limit: float = 0.0,
+                 background_rate_limit: float = 0.0):
+        self.minecraft_folder_path = minecraft_folder_path
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.object_store_root = object_store_root
+        self.manifest_url = manifest_url
+        # 安装版本时一并安装它需要的 Java 运行时
+        self.install_java = install_java
+        self.library_resolver = LibraryResolver()
+        # 进度文字回调，界面用它更新标签，命令行直接打印
+        self.on_status: Optional[Callable[[str], None]] = None
+        self.limiter = bandwidth.BandwidthLimiter(rate_limit, background_rate_limit)
+        self.sessions = sessions
+        self._owns_sessions = sessions is None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.verify_index: Optional[VerifyIndex] = None
+        self.mirrors: Optional[MirrorSelector] = mirrors
+        self.object_store: Optional[ObjectStore] = None
+        self.downloader: Optional[SmartDownloader] = None
+        self.scheduler: Optional[DownloadScheduler] = None
+        self.manifest: Optional[ManifestCache] = None
+        self.loader_profiles: Optional[LoaderProfiles] = None
+        self._asset_planners: Dict[str, AssetPlanner] = {}
+        self._java_runtimes: Dict[str, JavaRuntimeInstaller] = {}
+        self._probe_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.session is not None:
+            return
+        if self.sessions is None:
+            self.sessions = SessionManager(limit=max(100, self.max_concurrency), limit_per_host=self.per_host_limit)
+        self.session = self.sessions.open()
+        self.verify_index = VerifyIndex(os.path.join(self.minecraft_folder_path, "verify_index.json"))
+        if self.mirrors is None:
+            self.mirrors = MirrorSelector(probe_url=self.manifest_url)
+        self.object_store = ObjectStore(self.object_store_root)
+        self.downloader = SmartDownloader(self.session, self.verify_index, mirrors=self.mirrors,
+                                          object_store=self.object_store, limiter=self.limiter)
+        self.scheduler = DownloadScheduler(self.downloader, self.max_concurrency, self.per_host_limit)
+        self.manifest = ManifestCache(
+            self.session, self.manifest_url,
+            os.path.join(self.minecraft_folder_path, "cache", "version_manifest_v2.json"),
+            rewrite=self.mirrors.rewrite
+        )
+        self.loader_profiles = LoaderProfiles(self.session, rewrite=self.mirrors.rewrite)
+        # 后台测速，结果出来之前按默认顺序使用镜像
+        self._probe_task = asyncio.create_task(self.mirrors.probe(self.session))
+
+    async def close(self):
+        """
+        停止所有下载并保存索引。进行中的下载被取消，已收到的数据写入续传日志，下次从断点继续。
+        会话由外部的 SessionManager 提供时不关闭它。
+        """
+        if self.session is None:
+            return
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+        await self.scheduler.close()
+        self.downloader.metrics.close()
+        await self.save()
+        if self._owns_sessions:
+            await self.sessions.close()
+        self.session = None
+
+    async def __aenter__(self) -> "Installer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def metrics(self) -> DownloadMetrics:
+        return self.downloader.metrics
+
+    def _status(self, info: str):
+        # 后台预下载不打扰界面
+        if self.on_status is not None and not bandwidth.is_background():
+            self.on_status(info)
+
+    def begin_tracking(self, trace_path: Optional[str] = None):
+        """为一次下载/修复重置进度和统计；trace_path 不为空时把下载事件导出为 JSON Lines"""
+        self.scheduler.meter.reset()
+        self.downloader.metrics.close()
+        self.downloader.metrics = DownloadMetrics(trace_path)
+
+    def end_tracking(self):
+        self.downloader.metrics.close()
+
+    async def save(self):
+        if self.verify_index is not None:
+            await self.verify_index.save()
+        if self.object_store is not None:
+            await self.object_store.save()
+
+    async def get_versions(self, force_refresh: bool = False) -> List[typed_dict.VersionInfo]:
+        await self.start()
+        return await self.manifest.get(force_refresh)
+
+    def asset_planner(self, objects_folder_path: str) -> AssetPlanner:
+        """每个 objects 目录一个 planner，目录列表在整个会话中共用"""
+        planner = self._asset_planners.get(objects_folder_path)
+        if planner is None:
+            planner = self._asset_planners[objects_folder_path] = AssetPlanner(objects_folder_path)
+        return planner
+
+    async def download_assets(self, plan: AssetPlan, planner: AssetPlanner,
+                              on_ready: Optional[Callable[[str], Awaitable[None]]] = None):
+        """只提交计划中缺失的对象；on_ready 在每个对象下载完成后立即调用"""
+        async def then(future: asyncio.Future, hash_: str):
+            await future
+            await on_ready(hash_)
+
+        futures = []
+        for hash_, size in plan.missing.items():
+            future = self.scheduler.submit(planner.object_url(hash_), planner.object_path(hash_),
+                                           expected_sha1=hash_, priority=DownloadPriority.ASSET, size=size)
+            future.add_done_callback(
+                lambda f, h=hash_: planner.mark_present(h) if not f.cancelled() and f.exception() is None else None
+            )
+            futures.append(future if on_ready is None else then(future, hash_))
+        await asyncio.gather(*futures)
+
+    async def download_assets_index(self, index_url: str, sha1: str,
+                                    assets_folder_path: str, assets_index_path: str,
+                                    game_directory: Optional[str] = None):
+        await self.scheduler.download(index_url, assets_index_path, expected_sha1=sha1,
+                                      priority=DownloadPriority.META)
+        index = await asyncio.to_thread(AssetIndex.load, assets_index_path)
+        planner = self.asset_planner(assets_folder_path)
+        force = self.verify_index.force
+        plan = await planner.plan([index], trust_disk=not force)
+        self._status(plan.summary())
+
+        # legacy / pre-1.6 索引还需要按名字展开，和下载同时进行
+        assets_root = os.path.dirname(assets_folder_path)
+        index_id = os.path.splitext(os.path.basename(assets_index_path))[0]
+        layout = AssetLayout.for_index(index, index_id, assets_root,
+                                       game_directory or os.path.dirname(assets_root))
+        if layout is None:
+            await self.download_assets(plan, planner)
+            return
+        pending = await asyncio.to_thread(layout.diff, index, force)
+
+        async def link_when_ready(hash_: str):
+            names = pending.get(hash_)
+            if names:
+                await layout.link(hash_, names)
+
+        try:
+            # 已在磁盘上的对象立即展开，缺失的对象各自下载完成后立即展开
+            await asyncio.gather(
+                layout.link_many({h: names for h, names in pending.items() if h not in plan.missing}),
+                self.download_assets(plan, planner, link_when_ready)
+            )
+        finally:
+            await layout.save()
+
+    def java_runtime(self, minecraft_folder_path: Optional[str] = None) -> JavaRuntimeInstaller:
+        runtime_folder_path = os.path.join(minecraft_folder_path or self.minecraft_folder_path, "runtime")
+        runtime = self._java_runtimes.get(runtime_folder_path)
+        if runtime is None:
+            runtime = self._java_runtimes[runtime_folder_path] = JavaRuntimeInstaller(
+                self.session, self.scheduler, runtime_folder_path, self.library_resolver.platform,
+                rewrite=self.mirrors.rewrite
+            )
+        return runtime
+
+    async def install_java_runtime(self, version_json: VersionJson,
+                                   minecraft_folder_path: Optional[str] = None) -> Optional[str]:
+        """返回 java 路径；当前平台没有对应的运行时时返回 None，由用户自行指定 Java"""
+        try:
+            java = await self.java_runtime(minecraft_folder_path).ensure(version_json)
+        except RuntimeNotAvailableError as e:
+            self._status(f"{e}，请手动指定 Java")
+            return None
+        self._status(f"Java 运行时已就绪: {java}")
+        return java
+
+    async def download_logging_config(self, version_json: VersionJson, assets_folder_path: str):
+        logging_file = version_json.logging_file
+        if logging_file is None:
+            return
+        await self.scheduler.download(logging_file.url,
+                                      os.path.join(assets_folder_path, "log_configs", logging_file.id),
+                                      expected_sha1=logging_file.sha1, priority=DownloadPriority.META,
+                                      size=logging_file.size)
+
+    async def download_and_extract_natives(self, url: str, jar_path: str, sha1: str, size: Optional[int],
+                                           extractor: NativesExtractor,
+                                           extract_cfg: Optional[typed_dict.LibraryExtract]):
+        """natives jar 校验通过后立即解压，不必等其他库全部下载完"""
+        await self.scheduler.download(url, jar_path, expected_sha1=sha1, priority=DownloadPriority.LIBRARY,
+                                      size=size)
+        excludes = extract_cfg.get("exclude", []) if extract_cfg else []
+        await extractor.extract(jar_path, sha1, excludes)
+
+    async def download_libraries(self, version_json: VersionJson,
+                                 libraries_folder_path: str, selected_version_natives_folder_path: str,
+                                 natives_only: bool = False):
+        # 规则编译、平台判断和去重都由 LibraryResolver 完成，同一版本 JSON 只解析一次
+        artifacts = self.library_resolver.resolve(version_json, version_json.json_sha1)
+        extractor = NativesExtractor(selected_version_natives_folder_path)
+        tasks = []
+
+        for artifact in artifacts:
+            if not artifact.url or (natives_only and not artifact.native):
+                # 没有下载地址的是加载器安装程序放在本地的文件
+                continue
+            path = os.path.join(libraries_folder_path, artifact.path)
+            if artifact.native:
+                tasks.append(self.download_and_extract_natives(artifact.url, path, artifact.sha1, artifact.size,
+                                                               extractor, {"exclude": artifact.extract_excludes}))
+            else:
+                tasks.append(self.scheduler.submit(artifact.url, path, expected_sha1=artifact.sha1,
+                                                   priority=DownloadPriority.LIBRARY, size=artifact.size))
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await extractor.save()
+
+    async def install(self, version: str, minecraft_folder_path: Optional[str] = None):
+        """安装一个版本：版本 JSON、客户端、库、natives、日志配置和资源文件"""
+        await self.start()
+        self._status(f"开始下载版本 {version}...")
+        # 优先使用缓存的清单，只有在没有缓存时才会等待网络
+        await self.manifest.get()
+        selected_version_info = self.manifest.get_version(version)
+        if selected_version_info is None:
+            raise VersionNotFoundError(f"找不到版本：{version}")
+
+        minecraft_folder_path = minecraft_folder_path or self.minecraft_folder_path
+        versions_folder_path = os.path.join(minecraft_folder_path, "versions")
+        selected_version_folder_path = os.path.join(versions_folder_path, version)
+        selected_version_json_path = os.path.join(selected_version_folder_path, f"{version}.json")
+        selected_version_jar_path = os.path.join(selected_version_folder_path, f"{version}.jar")
+        assets_folder_path = os.path.join(minecraft_folder_path, "assets")
+        assets_objects_folder_path = os.path.join(assets_folder_path, "objects")
+        assets_indexes_folder_path = os.path.join(assets_folder_path, "indexes")
+        libraries_folder_path = os.path.join(minecraft_folder_path, "libraries")
+        selected_version_natives_folder_path = os.path.join(selected_version_folder_path, f"{version}-natives")
+        selected_version_json_url = selected_version_info["url"]
+        selected_version_json_sha1 = selected_version_info["sha1"]
+        self._status(f"已找到版本 {version}，准备从 {selected_version_json_url} 下载...")
+
+        await self.scheduler.download(selected_version_json_url, selected_version_json_path,
+                                      expected_sha1=selected_version_json_sha1, priority=DownloadPriority.META)
+
+        selected_version = await asyncio.to_thread(VersionJson.load, selected_version_json_path)
+        await asyncio.gather(
+            self.scheduler.download(
+                selected_version.client.url,
+                selected_version_jar_path,
+                expected_sha1=selected_version.client.sha1,
+                priority=DownloadPriority.CLIENT,
+                size=selected_version.client.size
+            ),
+            self.download_libraries(
+                selected_version,
+                libraries_folder_path,
+                selected_version_natives_folder_path
+            ),
+            self.download_logging_config(selected_version, assets_folder_path),
+            self.download_assets_index(
+                selected_version.asset_index.url,
+                selected_version.asset_index.sha1,
+                assets_objects_folder_path,
+                os.path.join(assets_indexes_folder_path, f"{selected_version.asset_index.id}.json")
+            ),
+            *([self.install_java_runtime(selected_version, minecraft_folder_path)] if self.install_java else [])
+        )
+        self._status(f"版本 {version} 下载完成！{self.scheduler.meter.report()}")
+
+    def _write_profile_sync(self, json_path: str, profile: typed_dict.VersionJsonInfo):
+        atomic_write_json(json_path, profile, ensure_ascii=False, indent=2)
+
+    async def install_profile(self, profile: typed_dict.VersionJsonInfo,
+                              minecraft_folder_path: Optional[str] = None) -> str:
+        """
+        安装一个带 inheritsFrom 的加载器配置（Fabric、Quilt，或 Forge 等安装程序生成的版本 JSON），返回版本 id。
+        父版本和加载器自己的库同时下载；配置写入 versions/<id>/<id>.json 时只有 Maven 坐标的库已补全 sha1，
+        最后按合并后的版本补齐库和 natives。
+        """
+        await self.start()
+        minecraft_folder_path = minecraft_folder_path or self.minecraft_folder_path
+        versions_folder_path = os.path.join(minecraft_folder_path, "versions")
+        libraries_folder_path = os.path.join(minecraft_folder_path, "libraries")
+        version_id = profile["id"]
+        parent_id = profile.get("inheritsFrom")
+        self._status(f"正在安装 {version_id}...")
+
+        async def install_parent():
+            if not parent_id:
+                return
+            await self.manifest.get()
+            # 父版本不在清单中时（例如另一个加载器配置）必须已经安装
+            if (self.manifest.get_version(parent_id) is None
+                    and os.path.exists(os.path.join(versions_folder_path, parent_id, f"{parent_id}.json"))):
+                return
+            await self.install(parent_id, minecraft_folder_path)
+
+        async def download_own_libraries():
+            resolved = await self.loader_profiles.resolve_libraries(profile)
+            resolved_sha1 = hashlib.sha1(json.dumps(resolved, sort_keys=True).encode()).hexdigest()
+            artifacts = self.library_resolver.resolve(VersionJson.from_json(resolved, resolved_sha1), resolved_sha1)
+            await asyncio.gather(*(
+                self.scheduler.submit(a.url, os.path.join(libraries_folder_path, a.path), expected_sha1=a.sha1,
+                                      priority=DownloadPriority.LIBRARY, size=a.size)
+                for a in artifacts if a.url and not a.native
+            ))
+            return resolved
+
+        _, resolved = await asyncio.gather(install_parent(), download_own_libraries())
+        json_path = os.path.join(versions_folder_path, version_id, f"{version_id}.json")
+        await asyncio.to_thread(self._write_profile_sync, json_path, resolved)
+        version = await asyncio.to_thread(load_version, versions_folder_path, version_id)
+        # 其他库已由父版本和加载器分别下载，这里只把 natives 解压到加载器版本自己的目录
+        await self.download_libraries(version, libraries_folder_path,
+                                      os.path.join(versions_folder_path, version_id, f"{version_id}-natives"),
+                                      natives_only=True)
+        self._status(f"{version_id} 安装完成！{self.scheduler.meter.report()}")
+        return version_id
+
+    async def install_loader(self, loader: str, game_version: str, loader_version: Optional[str] = None,
+                             minecraft_folder_path: Optional[str] = None) -> str:
+        """从 meta 服务获取 Fabric / Quilt 配置并安装，返回加载器版本的 id"""
+        await self.start()
+        profile = await self.loader_profiles.fetch_profile(loader, game_version, loader_version)
+        return await self.install_profile(profile, minecraft_folder_path)
+
+    async def install_many(self, versions: Iterable[str],
+                           minecraft_folder_path: Optional[str] = None) -> Dict[str, Optional[Exception]]:
+        """
+        在同一轮中并发安装多个版本，共享的文件由调度器合并为一次下载。
+        返回 {版本: None 或失败原因}，单个版本失败不影响其他版本。
+        """
+        versions = list(dict.fromkeys(versions))
+        await self.start()
+        await self.manifest.get()
+        results = await asyncio.gather(*(self.install(v, minecraft_folder_path) for v in versions),
+                                       return_exceptions=True)
+        await self.save()
+        return {v: r if isinstance(r, Exception) else None for v, r in zip(versions, results)}
+
+    async def verify(self, version: str, full: bool = False, repair: bool = True,
+                     minecraft_folder_path: Optional[str] = None) -> Tuple[IntegrityReport, int]:
+        """
+        检查已安装的版本，repair=True 时只重新下载缺失或损坏的文件。
+        返回 (第一次检查的报告, 重新下载的文件数)；版本未安装时抛出 FileNotFoundError。
+        """
+        await self.start()
+        # 修复会删除损坏的对象，之后重新读取目录列表
+        for planner in self._asset_planners.values():
+            planner.invalidate()
+        checker = IntegrityChecker(minecraft_folder_path or self.minecraft_folder_path,
+                                   self.library_resolver, self.verify_index)
+        self._status(f"正在校验版本 {version}...")
+        report = await checker.check(version, full=full)
+        if report.ok or not repair:
+            return report, 0
+        self._status(f"{report.summary()}，正在修复...")
+        repaired = len(report.repair_plan)
+        await checker.repair(report, self.scheduler)
+        # 资源索引本身被修复时，第一次检查无法列出其中的资源文件，再检查一次
+        second = await checker.check(version)
+        if not second.ok:
+            repaired += len(second.repair_plan)
+            await checker.repair(second, self.scheduler)
+        await self.save()
+        return report, repaired
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import os
+import os.path
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from asset_index import AssetIndex
+from asset_planner import ASSETS_BASE_URL
+from download_scheduler import DownloadPriority
+from library_resolver import LibraryResolver
+from loader_profile import load_version
+from verify_index import VerifyIndex
+
+
+def _stat_batch(paths: List[str]) -> list:
+    result = []
+    for path in paths:
+        try:
+            result.append(os.stat(path))
+        except OSError:
+            result.append(None)
+    return result
+
+
+def _hash_batch(paths: List[str]) -> List[Optional[str]]:
+    """在子进程中执行：依次计算一批文件的 SHA1"""
+    result = []
+    for path in paths:
+        sha1 = hashlib.sha1()
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    sha1.update(chunk)
+            result.append(sha1.hexdigest())
+        except OSError:
+            result.append(None)
+    return result
+
+
+class FileEntry:
+    __slots__ = ("path", "url", "sha1", "size", "priority")
+
+    def __init__(self, path: str, url: str, sha1: Optional[str], size: Optional[int], priority: int):
+        self.path = path
+        self.url = url
+        self.sha1 = sha1
+        self.size = size
+        self.priority = priority
+
+
+class IntegrityReport:
+    def __init__(self):
+        self.checked = 0
+        self.bytes_checked = 0
+        self.hashed = 0
+        self.bytes_hashed = 0
+        self.missing: List[FileEntry] = []
+        self.corrupt: List[FileEntry] = []
+        self.elapsed = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.corrupt
+
+    @property
+    def repair_plan(self) -> List[FileEntry]:
+        """需要重新下载的文件，按下载优先级排序"""
+        return sorted(self.missing + self.corrupt, key=lambda e: e.priority)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.checked / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_checked / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"检查 {self.checked} 个文件（计算哈希 {self.hashed} 个），"
+                f"缺失 {len(self.missing)}，损坏 {len(self.corrupt)}，"
+                f"用时 {self.elapsed:.2f}s，{self.files_per_second:.0f} 文件/s，"
+                f"{self.bytes_per_second / 1024 / 1024:.0f} MiB/s")
+
+
+class IntegrityChecker:
+    """
+    启动前的完整性检查。
+    1. 在线程池中并行 stat 所有文件，和版本 JSON / 资源索引中记录的大小比对；
+    2. 大小一致且校验索引认为未修改的文件直接通过；
+    3. 只有剩下的“可疑”文件才放进进程池计算 SHA1，充分利用多核。
+    结果中的 repair_plan 可以直接交给下载调度器，只重新下载缺失或损坏的文件。
+    """
+
+    STAT_BATCH = 512
+    # 每个进程任务的大致字节数，小文件合并成一批以减少进程间通信
+    HASH_BATCH_BYTES = 32 * 1024 * 1024
+    HASH_BATCH_FILES = 256
+    # 可疑数据量不大时直接用线程计算，省去启动进程池的开销
+    PROCESS_POOL_THRESHOLD = 64 * 1024 * 1024
+
+    def __init__(self, minecraft_folder_path: str, resolver: Optional[LibraryResolver] = None,
+                 verify_index: Optional[VerifyIndex] = None, max_workers: Optional[int] = None):
+        self.minecraft_folder_path = minecraft_folder_path
+        self.resolver = resolver or LibraryResolver()
+        self.verify_index = verify_index
+        self.max_workers = max_workers or os.cpu_count() or 4
+
+    def _collect_sync(self, version: str) -> List[FileEntry]:
+        root = self.minecraft_folder_path
+        versions_folder_path = os.path.join(root, "versions")
+        version_json = load_version(versions_folder_path, version)
+        entries: List[FileEntry] = []
+
+        client = version_json.client
+        # 加载器版本使用原版的客户端 jar
+        entries.append(FileEntry(os.path.join(versions_folder_path, version_json.jar, f"{version_json.jar}.jar"),
+                                 client.url, client.sha1, client.size, DownloadPriority.CLIENT))
+
+        artifacts = self.resolver.resolve(version_json, version_json.json_sha1)
+        for artifact in artifacts:
+            if not artifact.url:
+                # 加载器安装程序放在本地的文件没有下载地址，无法修复
+                continue
+            entries.append(FileEntry(os.path.join(root, "libraries", artifact.path), artifact.url,
+                                     artifact.sha1, artifact.size, DownloadPriority.LIBRARY))
+
+        logging_file = version_json.logging_file
+        if logging_file is not None:
+            entries.append(FileEntry(os.path.join(root, "assets", "log_configs", logging_file.id),
+                                     logging_file.url, logging_file.sha1, logging_file.size,
+                                     DownloadPriority.META))
+
+        asset_index = version_json.asset_index
+        index_path = os.path.join(root, "assets", "indexes", f"{asset_index.id}.json")
+        entries.append(FileEntry(index_path, asset_index.url, asset_index.sha1, asset_index.size,
+                                 DownloadPriority.META))
+        try:
+            objects = list(AssetIndex.load(index_path).objects())
+        except (OSError, ValueError):
+            # 索引本身缺失或损坏时会出现在修复计划里，修复后再检查一次即可
+            objects = []
+        objects_path = os.path.join(root, "assets", "objects")
+        for hash_, size in objects:
+            entries.append(FileEntry(os.path.join(objects_path, hash_[:2], hash_),
+                                     f"{ASSETS_BASE_URL}/{hash_[:2]}/{hash_}", hash_, size,
+                                     DownloadPriority.ASSET))
+        return entries
+
+    async def collect(self, version: str) -> List[FileEntry]:
+        return await asyncio.to_thread(self._collect_sync, version)
+
+    async def check(self, version: str, full: bool = False) -> IntegrityReport:
+        """检查一个已安装版本；full=True 时忽略校验索引，对所有文件计算哈希"""
+        report = IntegrityReport()
+        started_at = time.monotonic()
+        entries = await self.collect(version)
+        loop = asyncio.get_running_loop()
+
+        # 第一步：并行 stat
+        batches = [entries[i:i + self.STAT_BATCH] for i in range(0, len(entries), self.STAT_BATCH)]
+        with ThreadPoolExecutor(max_workers=min(32, self.max_workers * 4)) as pool:
+            stats = await asyncio.gather(*(
+                loop.run_in_executor(pool, _stat_batch, [e.path for e in batch]) for batch in batches
+            ))
+
+        suspects: List[FileEntry] = []
+        for batch, batch_stats in zip(batches, stats):
+            for entry, st in zip(batch, batch_stats):
+                report.checked += 1
+                if st is None:
+                    report.missing.append(entry)
+                    continue
+                report.bytes_checked += st.st_size
+                if entry.size is not None and st.st_size != entry.size:
+                    report.corrupt.append(entry)
+                    continue
+                if not entry.sha1:
+                    continue
+                if (not full and self.verify_index is not None
+                        and self.verify_index.is_verified(entry.path, entry.sha1, st)):
+                    continue
+                suspects.append(entry)
+
+        # 第二步：只对可疑文件计算哈希
+        if suspects:
+            await self._hash_suspects(suspects, report)
+        report.elapsed = time.monotonic() - started_at
+        if self.verify_index is not None:
+            await self.verify_index.save()
+        return report
+
+    async def _hash_suspects(self, suspects: List[FileEntry], report: IntegrityReport):
+        batches: List[List[FileEntry]] = []
+        current: List[FileEntry] = []
+        current_bytes = 0
+        for entry in suspects:
+            current.append(entry)
+            current_bytes += entry.size or 0
+            if current_bytes >= self.HASH_BATCH_BYTES or len(current) >= self.HASH_BATCH_FILES:
+                batches.append(current)
+                current, current_bytes = [], 0
+        if current:
+            batches.append(current)
+
+        total_bytes = sum(e.size or 0 for e in suspects)
+        loop = asyncio.get_running_loop()
+        executor_cls = ProcessPoolExecutor if total_bytes >= self.PROCESS_POOL_THRESHOLD else ThreadPoolExecutor
+        with executor_cls(max_workers=self.max_workers) as pool:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _hash_batch, [e.path for e in batch]) for batch in batches
+            ))
+        for batch, hashes in zip(batches, results):
+            for entry, actual in zip(batch, hashes):
+                report.hashed += 1
+                report.bytes_hashed += entry.size or 0
+                if actual is None:
+                    report.missing.append(entry)
+                elif actual != entry.sha1:
+                    report.corrupt.append(entry)
+                elif self.verify_index is not None:
+                    self.verify_index.record(entry.path, actual)
+
+    async def repair(self, report: IntegrityReport, scheduler) -> None:
+        """把修复计划交给下载调度器，只重新下载缺失或损坏的文件"""
+        for entry in report.corrupt:
+            # 先删除损坏的文件，下载器就不必再对它计算一次哈希
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            if self.verify_index is not None:
+                self.verify_index.discard(entry.path)
+        await asyncio.gather(*(
+            scheduler.submit(e.url, e.path, expected_sha1=e.sha1, priority=e.priority, size=e.size)
+            for e in report.repair_plan
+        ))
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import os.path
+import shutil
+import stat
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from download_scheduler import DownloadPriority
+from file_util import atomic_write, atomic_write_json, contained_path
+from library_resolver import PlatformInfo
+from version_json import VersionJson
+
+JAVA_RUNTIME_MANIFEST_URL = ("https://launchermeta.mojang.com/v1/products/java-runtime/"
+                             "2ec0cc96c44e5a76b9c8b7c39df7210883d12871/all.json")
+# 没有 javaVersion 的旧版本使用 Java 8
+DEFAULT_COMPONENT = "jre-legacy"
+
+
+class RuntimeNotAvailableError(Exception):
+    """当前平台没有所需的 Java 运行时组件时抛出"""
+    pass
+
+
+def runtime_platform(platform_info: PlatformInfo) -> str:
+    """java-runtime 清单中的平台名"""
+    if platform_info.name == "osx":
+        return "mac-os-arm64" if platform_info.arch == "arm64" else "mac-os"
+    if platform_info.name == "windows":
+        return {"x86": "windows-x86", "arm64": "windows-arm64"}.get(platform_info.arch, "windows-x64")
+    return "linux-i386" if platform_info.arch == "x86" else "linux"
+
+
+def java_component(version_json: VersionJson) -> str:
+    return version_json.java_component or DEFAULT_COMPONENT
+
+
+def java_executable(runtime_path: str, platform: str) -> str:
+    if platform.startswith("mac-os"):
+        return os.path.join(runtime_path, "jre.bundle", "Contents", "Home", "bin", "java")
+    if platform.startswith("windows"):
+        return os.path.join(runtime_path, "bin", "javaw.exe")
+    return os.path.join(runtime_path, "bin", "java")
+
+
+def installed_java(runtime_folder_path: str, component: str, platform: str) -> Optional[str]:
+    """已完整安装时返回 java 可执行文件路径，否则返回 None"""
+    runtime_path = os.path.join(runtime_folder_path, component, platform)
+    java = java_executable(runtime_path, platform)
+    if os.path.exists(os.path.join(runtime_path, JavaRuntimeInstaller.RECORD_NAME)) and os.path.exists(java):
+        return java
+    return None
+
+
+class JavaRuntimeInstaller:
+    """
+    按 Mojang 的 java-runtime 清单安装版本 JSON 中 javaVersion.component 指定的 Java。
+    运行时放在 runtime/<组件>/<平台>，使用同一组件的版本共用一份。
+    清单中的数百个文件交给下载调度器并行下载并逐个校验 sha1，
+    有 LZMA 压缩版本时下载压缩版并边接收边解压。
+    安装完成后写入 .installed.json（组件清单的 sha1 和文件列表），清单未变化时直接跳过，
+    清单更新时删除新清单中已不存在的文件。
+    """
+
+    RECORD_NAME = ".installed.json"
+    # 运行时总清单的缓存有效期
+    INDEX_TTL = 24 * 3600
+
+    def __init__(self, session: aiohttp.ClientSession, scheduler, runtime_folder_path: str,
+                 platform_info: Optional[PlatformInfo] = None, manifest_url: str = JAVA_RUNTIME_MANIFEST_URL,
+                 rewrite: Optional[Callable[[str], str]] = None):
+        self.session = session
+        self.scheduler = scheduler
+        self.runtime_folder_path = runtime_folder_path
+        self.platform = runtime_platform(platform_info or PlatformInfo())
+        self.manifest_url = manifest_url
+        self.rewrite = rewrite
+        self.index_path = os.path.join(runtime_folder_path, "all.json")
+        self._index: Optional[Dict] = None
+        self._index_lock = asyncio.Lock()
+        # 同一组件同时被多个版本请求时只安装一次
+        self._installing: Dict[str, asyncio.Task] = {}
+
+    def runtime_path(self, component: str) -> str:
+        return os.path.join(self.runtime_folder_path, component, self.platform)
+
+    def java_executable(self, component: str) -> str:
+        return java_executable(self.runtime_path(component), self.platform)
+
+    def _read_index_sync(self, max_age: Optional[float]) -> Optional[Dict]:
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(self.index_path) > max_age:
+                return None
+            with open(self.index_path, "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_index_sync(self, raw: bytes):
+        with atomic_write(self.index_path, "wb") as f:
+            f.write(raw)
+
+    async def _load_index(self) -> Dict:
+        """运行时总清单：优先使用未过期的缓存，网络失败时退回过期的缓存"""
+        async with self._index_lock:
+            if self._index is not None:
+                return self._index
+            index = await asyncio.to_thread(self._read_index_sync, self.INDEX_TTL)
+            if index is None:
+                url = self.rewrite(self.manifest_url) if self.rewrite else self.manifest_url
+                try:
+                    async with self.session.get(url, allow_redirects=True) as resp:
+                        resp.raise_for_status()
+                        raw = await resp.read()
+                    index = json.loads(raw)
+                    await asyncio.to_thread(self._write_index_sync, raw)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    index = await asyncio.to_thread(self._read_index_sync, None)
+                    if index is None:
+                        raise
+                    print(f"获取 Java 运行时清单失败: {e}，使用缓存")
+            self._index = index
+            return index
+
+    def _read_record_sync(self, component: str) -> Dict:
+        try:
+            with open(os.path.join(self.runtime_path(component), self.RECORD_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _make_executable(target: str):
+        st = os.stat(target)
+        if st.st_mode & stat.S_IXUSR:
+            return
+        if st.st_nlink > 1:
+            # 与对象库或其他实例共用同一个 inode 时先换成独立的副本，不改动共用文件的权限
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            shutil.copyfile(target, tmp_path)
+            os.replace(tmp_path, target)
+            st = os.stat(target)
+        os.chmod(target, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    def _prepare_sync(self, manifest_path: str, root: str) -> Dict[str, Dict]:
+        """读取组件清单并创建其中的目录，返回清单中的文件列表"""
+        with open(manifest_path, "rb") as f:
+            files: Dict[str, Dict] = json.loads(f.read())["files"]
+        for rel_path, entry in files.items():
+            if entry["type"] == "directory":
+                target = contained_path(root, rel_path)
+                if target is not None:
+                    os.makedirs(target, exist_ok=True)
+        return files
+
+    def _finish_sync(self, component: str, files: Dict[str, Dict], manifest_sha1: str, old_files: List[str]):
+        """下载完成后：设置可执行位、创建链接、删除旧文件、写入安装记录"""
+        root = os.path.abspath(self.runtime_path(component))
+        for rel_path, entry in files.items():
+            target = contained_path(root, rel_path)
+            if target is None:
+                continue
+            if entry["type"] == "file" and entry.get("executable") and sys.platform != "win32":
+                self._make_executable(target)
+            elif entry["type"] == "link":
+                link_target = entry["target"]
+                if os.path.islink(target) and os.readlink(target) == link_target:
+                    continue
+                if os.path.lexists(target):
+                    os.remove(target)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    os.symlink(link_target, target)
+                except OSError as e:
+                    print(f"无法创建链接 {rel_path} -> {link_target}: {e}")
+        for rel_path in old_files:
+            if rel_path in files:
+                continue
+            target = contained_path(root, rel_path)
+            if target is not None and (os.path.isfile(target) or os.path.islink(target)):
+                os.remove(target)
+        atomic_write_json(os.path.join(root, self.RECORD_NAME),
+                          {"manifest_sha1": manifest_sha1, "files": list(files)})
+
+    async def _install(self, component: str) -> str:
+        index = await self._load_index()
+        entries = index.get(self.platform, {}).get(component) or []
+        if not entries:
+            raise RuntimeNotAvailableError(f"平台 {self.platform} 没有 Java 运行时 {component}")
+        manifest_info = entries[0]["manifest"]
+        java = self.java_executable(component)
+        record = await asyncio.to_thread(self._read_record_sync, component)
+        if record.get("manifest_sha1") == manifest_info["sha1"] and os.path.exists(java):
+            return java
+
+        root = self.runtime_path(component)
+        manifest_path = os.path.join(self.runtime_folder_path, component, f"{self.platform}.json")
+        await self.scheduler.download(manifest_info["url"], manifest_path, expected_sha1=manifest_info["sha1"],
+                                      priority=DownloadPriority.META)
+        abs_root = os.path.abspath(root)
+        # 清单有几千个条目，读取和创建目录都放在线程中
+        files = await asyncio.to_thread(self._prepare_sync, manifest_path, abs_root)
+        tasks = []
+        for rel_path, entry in files.items():
+            target = contained_path(abs_root, rel_path)
+            if target is None:
+                continue
+            if entry["type"] == "file":
+                raw = entry["downloads"]["raw"]
+                compressed = entry["downloads"].get("lzma")
+                if compressed:
+                    tasks.append(self.scheduler.submit(compressed["url"], target, expected_sha1=raw["sha1"],
+                                                       priority=DownloadPriority.CLIENT, size=compressed["size"],
+                                                       lzma_sha1=compressed["sha1"]))
+                else:
+                    tasks.append(self.scheduler.submit(raw["url"], target, expected_sha1=raw["sha1"],
+                                                       priority=DownloadPriority.CLIENT, size=raw["size"]))
+        await asyncio.gather(*tasks)
+        await asyncio.to_thread(self._finish_sync, component, files, manifest_info["sha1"],
+                                record.get("files", []))
+        return java
+
+    async def install(self, component: str) -> str:
+        """安装（或更新）一个运行时组件，返回 java 可执行文件路径"""
+        task = self._installing.get(component)
+        if task is None:
+            task = self._installing[component] = asyncio.create_task(self._install(component))
+            task.add_done_callback(lambda t: self._installing.pop(component, None))
+        return await asyncio.shield(task)
+
+    async def ensure(self, version_json: VersionJson) -> str:
+        """安装版本需要的 Java 运行时"""
+        return await self.install(java_component(version_json))
@@ -0,0 +1,51 @@
+import hashlib
+import json
+import marshal
+from typing import Optional
+
+from file_util import atomic_write
+
+# 二进制缓存文件名为 <JSON 文件名>.bin，与 JSON 放在同一目录
+CACHE_SUFFIX = ".bin"
+
+
+def file_sha1(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(256 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def load_json_model(cls, json_path: str, raw: Optional[bytes] = None):
+    """
+    读取 JSON 文件并转换为 cls 的紧凑对象。
+    cls 需要提供 CACHE_VERSION、from_json(data, json_sha1)、to_data() 和 from_data(data, json_sha1)；
+    to_data() 的结果只能由 marshal 支持的基本类型组成。
+    转换结果以 JSON 的 sha1 为键写入旁边的 .bin 缓存，JSON 未变化时下次直接读取缓存，不再解析 JSON。
+    已读取文件内容时可以通过 raw 传入，避免重复读取。
+    """
+    if raw is None:
+        # 缓存命中时不需要整个 JSON，分块计算哈希即可
+        json_sha1 = file_sha1(json_path)
+    else:
+        json_sha1 = hashlib.sha1(raw).hexdigest()
+    cache_path = json_path + CACHE_SUFFIX
+    try:
+        with open(cache_path, "rb") as f:
+            version, cached_sha1, data = marshal.loads(f.read())
+        if version == cls.CACHE_VERSION and cached_sha1 == json_sha1:
+            return cls.from_data(data, json_sha1)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    if raw is None:
+        with open(json_path, "rb") as f:
+            raw = f.read()
+        json_sha1 = hashlib.sha1(raw).hexdigest()
+    model = cls.from_json(json.loads(raw), json_sha1)
+    try:
+        with atomic_write(cache_path, "wb") as f:
+            f.write(marshal.dumps((cls.CACHE_VERSION, json_sha1, model.to_data())))
+    except OSError as e:
+        print(f"写入缓存 {cache_path} 失败: {e}")
+    return model
@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import json
+import os
+import os.path
+import re
+import shlex
+from typing import Dict, List, Optional, Union
+
+import typed_dict
+from asset_layout import game_assets_path
+from file_util import atomic_write_json
+from java_runtime import installed_java, java_component, runtime_platform
+from library_resolver import LibraryResolver, RuleEvaluator
+from loader_profile import load_version
+from version_json import VersionJson
+
+LAUNCHER_NAME = "EasyCraftLauncher"
+LAUNCHER_VERSION = "1.0"
+
+_PLACEHOLDER = re.compile(r"\$\{(\w+)\}")
+
+# 旧版本（只有 minecraftArguments）没有 arguments.jvm，使用与官方启动器相同的默认 JVM 参数
+LEGACY_JVM_ARGUMENTS = [
+    "-Djava.library.path=${natives_directory}",
+    "-Dminecraft.launcher.brand=${launcher_name}",
+    "-Dminecraft.launcher.version=${launcher_version}",
+    "-cp",
+    "${classpath}",
+]
+
+
+def offline_uuid(username: str) -> str:
+    """与 Java 的 UUID.nameUUIDFromBytes("OfflinePlayer:" + name) 相同的离线 UUID"""
+    digest = bytearray(hashlib.md5(f"OfflinePlayer:{username}".encode("utf-8")).digest())
+    digest[6] = (digest[6] & 0x0F) | 0x30
+    digest[8] = (digest[8] & 0x3F) | 0x80
+    return digest.hex()
+
+
+def list_installed_versions(minecraft_folder_path: str) -> List[str]:
+    """versions 目录下同时有 <id>/<id>.json 的版本"""
+    versions_folder_path = os.path.join(minecraft_folder_path, "versions")
+    try:
+        entries = sorted(os.scandir(versions_folder_path), key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return []
+    return [e.name for e in entries
+            if e.is_dir() and os.path.isfile(os.path.join(e.path, f"{e.name}.json"))]
+
+
+class LaunchOptions:
+    def __init__(self, username: str, java_path: Optional[str] = None, max_memory_mb: Optional[int] = 2048,
+                 access_token: str = "0", uuid: Optional[str] = None, user_type: str = "legacy",
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 extra_jvm_args: Optional[List[str]] = None, game_directory: Optional[str] = None):
+        self.username = username
+        # 为空时自动选择：已安装的 Java 运行时 > $JAVA_HOME > PATH 中的 java
+        self.java_path = java_path
+        self.max_memory_mb = max_memory_mb
+        self.access_token = access_token
+        self.uuid = uuid or offline_uuid(username)
+        self.user_type = user_type
+        self.width = width
+        self.height = height
+        self.extra_jvm_args = extra_jvm_args or []
+        self.game_directory = game_directory
+
+    @property
+    def features(self) -> Dict[str, bool]:
+        return {"has_custom_resolution": self.width is not None and self.height is not None}
+
+
+class LaunchTemplate:
+    """
+    某个版本已解析好的启动信息：主类、classpath 以及尚未替换占位符的 JVM/游戏参数。
+    以版本 JSON 的 sha1 为键缓存在 versions/<id>/launch.cache.json，
+    再次启动同一版本时无需解析 JSON，也无需计算规则。
+    """
+
+    CACHE_VERSION = 2
+
+    def __init__(self, json_sha1: str, key: str, main_class: str, classpath: List[str],
+                 jvm_args: List[str], game_args: List[str], logging_arg: Optional[str],
+                 logging_file: Optional[str], assets_index_name: str, version_type: str, java_component: str):
+        self.json_sha1 = json_sha1
+        self.key = key
+        self.main_class = main_class
+        # 相对于 .minecraft 的路径
+        self.classpath = classpath
+        self.jvm_args = jvm_args
+        self.game_args = game_args
+        self.logging_arg = logging_arg
+        self.logging_file = logging_file
+        self.assets_index_name = assets_index_name
+        self.version_type = version_type
+        self.java_component = java_component
+
+    def to_dict(self) -> Dict:
+        return {"version": self.CACHE_VERSION, **self.__dict__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> Optional["LaunchTemplate"]:
+        if data.get("version") != cls.CACHE_VERSION:
+            return None
+        data = dict(data)
+        data.pop("version")
+        return cls(**data)
+
+
+class Launcher:
+    def __init__(self, minecraft_folder_path: str, resolver: Optional[LibraryResolver] = None):
+        self.minecraft_folder_path = minecraft_folder_path
+        self.resolver = resolver or LibraryResolver()
+
+    def version_paths(self, version: str) -> Dict[str, str]:
+        version_folder_path = os.path.join(self.minecraft_folder_path, "versions", version)
+        return {
+            "folder": version_folder_path,
+            "json": os.path.join(version_folder_path, f"{version}.json"),
+            "jar": os.path.join(version_folder_path, f"{version}.jar"),
+            "natives": os.path.join(version_folder_path, f"{version}-natives"),
+            "cache": os.path.join(version_folder_path, "launch.cache.json"),
+        }
+
+    def _template_key(self, options: LaunchOptions) -> str:
+        return f"{self.resolver.platform.key}/{json.dumps(options.features, sort_keys=True)}"
+
+    def _flatten_arguments(self, arguments: List[Union[str, typed_dict.ArgumentValue]],
+                           rules: RuleEvaluator) -> List[str]:
+        result: List[str] = []
+        for arg in arguments:
+            if isinstance(arg, str):
+                result.append(arg)
+                continue
+            if not rules.allows(arg.get("rules")):
+                continue
+            value = arg.get("value")
+            if isinstance(value, str):
+                result.append(value)
+            elif value:
+                result.extend(value)
+        return result
+
+    def build_template(self, version_json: VersionJson, json_sha1: str, options: LaunchOptions) -> LaunchTemplate:
+        artifacts = self.resolver.resolve(version_json, json_sha1)
+        classpath = [os.path.join("libraries", a.path) for a in artifacts if not a.native]
+        # 加载器版本使用原版的客户端 jar
+        classpath.append(os.path.join("versions", version_json.jar, f"{version_json.jar}.jar"))
+
+        arguments = version_json.arguments or {}
+        # 参数规则依赖启动选项（features），单独用一个规则表
+        rules = RuleEvaluator(self.resolver.platform, options.features)
+        jvm_args = self._flatten_arguments(arguments.get("jvm", []), rules)
+        game_args = self._flatten_arguments(arguments.get("game", []), rules)
+        if not arguments or version_json.minecraft_arguments is not None:
+            # 旧格式；加载器在旧版本上额外给出的 arguments 放在默认参数之后
+            jvm_args = LEGACY_JVM_ARGUMENTS + jvm_args
+            game_args = shlex.split(version_json.minecraft_arguments or "") + game_args
+            if options.features.get("has_custom_resolution"):
+                game_args += ["--width", "${resolution_width}", "--height", "${resolution_height}"]
+
+        logging_arg = None
+        logging_file = None
+        if version_json.logging_argument and version_json.logging_file:
+            logging_arg = version_json.logging_argument
+            logging_file = os.path.join("assets", "log_configs", version_json.logging_file.id)
+
+        return LaunchTemplate(
+            json_sha1, self._template_key(options), version_json.main_class, classpath, jvm_args, game_args,
+            logging_arg, logging_file, version_json.assets, version_json.type, java_component(version_json)
+        )
+
+    def _load_template_sync(self, version: str, options: LaunchOptions) -> LaunchTemplate:
+        paths = self.version_paths(version)
+        # 加载器版本的 json_sha1 包含整个继承链，任何一层变化都会重新生成模板
+        version_json = load_version(os.path.join(self.minecraft_folder_path, "versions"), version)
+        json_sha1 = version_json.json_sha1
+        key = self._template_key(options)
+        try:
+            with open(paths["cache"], "r", encoding="utf-8") as f:
+                template = LaunchTemplate.from_dict(json.load(f))
+            if template is not None and template.json_sha1 == json_sha1 and template.key == key:
+                return template
+        except (OSError, ValueError, TypeError):
+            pass
+        # 缓存失效，重新生成
+        template = self.build_template(version_json, json_sha1, options)
+        atomic_write_json(paths["cache"], template.to_dict())
+        return template
+
+    async def load_template(self, version: str, options: LaunchOptions) -> LaunchTemplate:
+        return await asyncio.to_thread(self._load_template_sync, version, options)
+
+    def find_java(self, template: LaunchTemplate) -> str:
+        java = installed_java(os.path.join(self.minecraft_folder_path, "runtime"), template.java_component,
+                              runtime_platform(self.resolver.platform))
+        if java is not None:
+            return java
+        # 与安装的运行时一致，Windows 上使用不带控制台窗口的 javaw.exe
+        executable = "javaw.exe" if os.name == "nt" else "java"
+        if os.environ.get("JAVA_HOME"):
+            return os.path.join(os.environ["JAVA_HOME"], "bin", executable)
+        return executable
+
+    def build_command(self, version: str, template: LaunchTemplate, options: LaunchOptions) -> List[str]:
+        paths = self.version_paths(version)
+        root = self.minecraft_folder_path
+        game_directory = options.game_directory or root
+        values = {
+            "auth_player_name": options.username,
+            "version_name": version,
+            "game_directory": game_directory,
+            "assets_root": os.path.join(root, "assets"),
+            "game_assets": game_assets_path(root, template.assets_index_name, game_directory),
+            "assets_index_name": template.assets_index_name,
+            "auth_uuid": options.uuid,
+            "auth_access_token": options.access_token,
+            "auth_session": options.access_token,
+            "auth_xuid": "0",
+            "clientid": "0",
+            "user_type": options.user_type,
+            "user_properties": "{}",
+            "version_type": template.version_type,
+            "natives_directory": paths["natives"],
+            "launcher_name": LAUNCHER_NAME,
+            "launcher_version": LAUNCHER_VERSION,
+            "classpath": os.pathsep.join(os.path.join(root, p) for p in template.classpath),
+            "classpath_separator": os.pathsep,
+            "library_directory": os.path.join(root, "libraries"),
+            "resolution_width": str(options.width or ""),
+            "resolution_height": str(options.height or ""),
+        }
+
+        def substitute(arg: str) -> str:
+            return _PLACEHOLDER.sub(lambda m: values.get(m.group(1), m.group(0)), arg)
+
+        command = [options.java_path or self.find_java(template)]
+        if options.max_memory_mb:
+            command.append(f"-Xmx{options.max_memory_mb}m")
+        command += options.extra_jvm_args
+        command += [substitute(a) for a in template.jvm_args]
+        if template.logging_arg and template.logging_file:
+            logging_path = os.path.join(root, template.logging_file)
+            if os.path.exists(logging_path):
+                command.append(template.logging_arg.replace("${path}", logging_path))
+        command.append(template.main_class)
+        command += [substitute(a) for a in template.game_args]
+        return command
+
+    async def launch(self, version: str, options: LaunchOptions,
+                     stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.STDOUT
+                     ) -> asyncio.subprocess.Process:
+        """组装参数并启动游戏进程"""
+        template = await self.load_template(version, options)
+        command = self.build_command(version, template, options)
+        game_directory = options.game_directory or self.minecraft_folder_path
+        os.makedirs(game_directory, exist_ok=True)
+        return await asyncio.create_subprocess_exec(
+            *command, cwd=game_directory, stdout=stdout, stderr=stderr
+        )
@@ -0,0 +1,144 @@
+import platform
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import typed_dict
+from version_json import LibraryEntry, VersionJson
+
+
+class PlatformInfo:
+    """当前系统，字段取值与版本 JSON 中 rules.os 的写法一致"""
+
+    __slots__ = ("name", "version", "arch", "bits")
+
+    def __init__(self, name: Optional[str] = None, version: Optional[str] = None,
+                 arch: Optional[str] = None, bits: Optional[str] = None):
+        system = platform.system().lower()
+        self.name = name or {"darwin": "osx"}.get(system, system)
+        if version is None:
+            version = platform.mac_ver()[0] if self.name == "osx" else (
+                platform.version() if self.name == "windows" else platform.release())
+        self.version = version
+        machine = platform.machine().lower()
+        self.arch = arch or {"amd64": "x86_64", "i386": "x86", "i686": "x86",
+                             "aarch64": "arm64"}.get(machine, machine)
+        self.bits = bits or ("64" if sys.maxsize > 2 ** 32 else "32")
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}/{self.version}/{self.arch}"
+
+
+@lru_cache(maxsize=None)
+def _version_pattern(pattern: str):
+    return re.compile(pattern)
+
+
+class RuleEvaluator:
+    """
+    针对某个平台判断 rules 列表是否允许。
+    平台信息只取一次，os.version 的正则只编译一次；规则本身很短，直接计算比序列化成键查表更快。
+    """
+
+    def __init__(self, platform_info: Optional[PlatformInfo] = None, features: Optional[Dict[str, bool]] = None):
+        self.platform = platform_info or PlatformInfo()
+        self.features = features or {}
+
+    def _os_matches(self, os_rule: typed_dict.LibraryRuleOS) -> bool:
+        if "name" in os_rule and os_rule["name"] != self.platform.name:
+            return False
+        if "arch" in os_rule and os_rule["arch"] != self.platform.arch:
+            return False
+        if "version" in os_rule and not _version_pattern(os_rule["version"]).search(self.platform.version):
+            return False
+        return True
+
+    def _features_match(self, features: Dict[str, bool]) -> bool:
+        return all(self.features.get(name, False) == value for name, value in features.items())
+
+    def _evaluate(self, rules: List[typed_dict.LibraryRule]) -> bool:
+        result = None
+        for rule in rules:
+            os_rule = rule.get("os")
+            if os_rule and not self._os_matches(os_rule):
+                continue
+            features = rule.get("features")
+            if features and not self._features_match(features):
+                continue
+            # 匹配到规则，就根据 action 修改结果
+            result = rule["action"] == "allow"
+        return result if result is not None else False
+
+    def allows(self, rules: Optional[List[typed_dict.LibraryRule]]) -> bool:
+        if not rules:
+            return True  # 没有规则时默认允许
+        return self._evaluate(rules)
+
+
+class ResolvedArtifact:
+    __slots__ = ("name", "path", "url", "sha1", "size", "native", "extract_excludes")
+
+    def __init__(self, name: str, path: str, url: str, sha1: Optional[str], size: Optional[int],
+                 native: bool = False, extract_excludes: Optional[List[str]] = None):
+        self.name = name
+        # 相对于 libraries 目录的路径
+        self.path = path
+        self.url = url
+        self.sha1 = sha1
+        self.size = size
+        self.native = native
+        self.extract_excludes = extract_excludes or []
+
+
+class LibraryResolver:
+    """
+    把版本 JSON 中的 libraries 解析成当前平台实际需要的文件列表（已去重）。
+    平台和 features 在创建时确定，结果按版本 JSON 的 sha1 缓存在内存中，同一进程内再次安装、校验或启动时直接返回。
+    500 个库的解析不到 1 ms，比读写磁盘缓存还快（见 benchmark.py resolve），所以不写磁盘；
+    跨进程的热启动由 launcher 的启动模板缓存跳过。
+    """
+
+    def __init__(self, platform_info: Optional[PlatformInfo] = None, features: Optional[Dict[str, bool]] = None):
+        self.rules = RuleEvaluator(platform_info, features)
+        self._memo: Dict[str, List[ResolvedArtifact]] = {}
+
+    @property
+    def platform(self) -> PlatformInfo:
+        return self.rules.platform
+
+    def _resolve(self, libraries: List[LibraryEntry]) -> List[ResolvedArtifact]:
+        resolved: Dict[str, ResolvedArtifact] = {}
+        for lib in libraries:
+            if not self.rules.allows(lib.rules):
+                continue
+            name = lib.name
+            excludes = lib.extract_excludes
+
+            # 普通库或 natives（新格式：name 包含 natives-xxx）
+            artifact = lib.artifact
+            if artifact:
+                resolved[artifact.path] = ResolvedArtifact(
+                    name, artifact.path, artifact.url, artifact.sha1, artifact.size,
+                    native=":natives-" in name, extract_excludes=excludes
+                )
+
+            # 老格式 natives（classifiers + natives）
+            if lib.classifiers and lib.natives:
+                key = lib.natives.get(self.platform.name)
+                if key:
+                    key = key.replace("${arch}", self.platform.bits)
+                if key and key in lib.classifiers:
+                    classifier = lib.classifiers[key]
+                    resolved[classifier.path] = ResolvedArtifact(
+                        f"{name}:{key}", classifier.path, classifier.url, classifier.sha1,
+                        classifier.size, native=True, extract_excludes=excludes
+                    )
+        return list(resolved.values())
+
+    def resolve(self, version_json: VersionJson, json_sha1: str) -> List[ResolvedArtifact]:
+        artifacts = self._memo.get(json_sha1)
+        if artifacts is None:
+            artifacts = self._memo[json_sha1] = self._resolve(version_json.libraries)
+        return artifacts
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import marshal
+import os
+import os.path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+import typed_dict
+from file_util import atomic_write
+from json_cache import file_sha1
+from version_json import VersionJson, maven_path, LIBRARIES_BASE_URL
+
+LOADER_META_URLS = {
+    "fabric": "https://meta.fabricmc.net/v2",
+    "quilt": "https://meta.quiltmc.org/v3",
+}
+
+MERGED_CACHE_VERSION = 1
+
+
+class ProfileError(Exception):
+    """加载器配置无效：继承链循环、无法获取配置等"""
+    pass
+
+
+def _library_key(name: str) -> str:
+    """同一个库的不同版本视为同一项：group:artifact[:classifier]"""
+    parts = name.partition("@")[0].split(":")
+    return ":".join(parts[:2] + parts[3:])
+
+
+def merge_profiles(child: typed_dict.VersionJsonInfo, parent: typed_dict.VersionJsonInfo) -> Dict:
+    """
+    按官方启动器的规则合并一层 inheritsFrom：
+    子配置的字段覆盖父配置；libraries 子配置在前，同一个库只保留子配置的版本；
+    arguments 的 game/jvm 父配置在前、子配置在后拼接；没有 jar 时使用父版本的客户端 jar。
+    """
+    merged = dict(parent)
+    for key, value in child.items():
+        if key not in ("libraries", "arguments", "inheritsFrom"):
+            merged[key] = value
+    merged.pop("inheritsFrom", None)
+    if parent.get("inheritsFrom"):
+        merged["inheritsFrom"] = parent["inheritsFrom"]
+    merged["jar"] = child.get("jar") or parent.get("jar") or parent.get("id", "")
+
+    libraries = []
+    seen = set()
+    for lib in child.get("libraries", []) + parent.get("libraries", []):
+        key = _library_key(lib.get("name", ""))
+        if key in seen:
+            continue
+        seen.add(key)
+        libraries.append(lib)
+    merged["libraries"] = libraries
+
+    if child.get("arguments") or parent.get("arguments"):
+        child_arguments = child.get("arguments") or {}
+        parent_arguments = parent.get("arguments") or {}
+        merged["arguments"] = {
+            "game": parent_arguments.get("game", []) + child_arguments.get("game", []),
+            "jvm": parent_arguments.get("jvm", []) + child_arguments.get("jvm", []),
+        }
+    return merged
+
+
+def _read_json(path: str) -> Tuple[Dict, str]:
+    with open(path, "rb") as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha1(raw).hexdigest()
+
+
+def load_version(versions_folder_path: str, version_id: str) -> VersionJson:
+    """
+    读取一个已安装的版本；带 inheritsFrom 的加载器版本会沿继承链合并成完整的版本。
+    合并结果连同继承链上每个 JSON 的 sha1 缓存在 versions/<id>/<id>.merged.bin，
+    任何一层都没有变化时直接使用缓存，启动时不会重复合并。
+    合并后版本的 json_sha1 由继承链上所有 sha1 计算得到，库解析缓存和启动模板缓存都以它为键。
+    版本或其父版本没有安装时抛出 FileNotFoundError。
+    """
+    json_path = os.path.join(versions_folder_path, version_id, f"{version_id}.json")
+    version = VersionJson.load(json_path)
+    if not version.inherits_from:
+        return version
+
+    cache_path = os.path.join(versions_folder_path, version_id, f"{version_id}.merged.bin")
+    try:
+        with open(cache_path, "rb") as f:
+            cache_version, chain, data = marshal.loads(f.read())
+        if (cache_version == MERGED_CACHE_VERSION and chain[0] == [version_id, version.json_sha1]
+                and all(file_sha1(os.path.join(versions_folder_path, i, f"{i}.json")) == sha1
+                        for i, sha1 in chain[1:])):
+            return VersionJson.from_data(data, _chain_sha1(chain))
+    except (OSError, EOFError, ValueError, TypeError, IndexError):
+        pass
+
+    merged, sha1 = _read_json(json_path)
+    chain = [[version_id, sha1]]
+    while merged.get("inheritsFrom"):
+        parent_id = merged["inheritsFrom"]
+        if any(parent_id == i for i, _ in chain):
+            raise ProfileError(f"版本 {version_id} 的 inheritsFrom 出现循环: {parent_id}")
+        parent, sha1 = _read_json(os.path.join(versions_folder_path, parent_id, f"{parent_id}.json"))
+        chain.append([parent_id, sha1])
+        merged = merge_profiles(merged, parent)
+    merged["id"] = version_id
+    version = VersionJson.from_json(merged, _chain_sha1(chain))
+    try:
+        with atomic_write(cache_path, "wb") as f:
+            f.write(marshal.dumps((MERGED_CACHE_VERSION, chain, version.to_data())))
+    except OSError as e:
+        print(f"写入合并缓存 {cache_path} 失败: {e}")
+    return version
+
+
+def _chain_sha1(chain: List[list]) -> str:
+    return hashlib.sha1(",".join(sha1 for _, sha1 in chain).encode()).hexdigest()
+
+
+class LoaderProfiles:
+    """
+    从 Fabric / Quilt 的 meta 服务获取加载器配置，并把只有 Maven 坐标的库补全为带 sha1 的 downloads。
+    配置中没有给出 sha1 的库并行读取仓库中的 .sha1 文件，下载时照常校验。
+    """
+
+    SIDECAR_CONCURRENCY = 16
+
+    def __init__(self, session: aiohttp.ClientSession, rewrite: Optional[Callable[[str], str]] = None,
+                 meta_urls: Optional[Dict[str, str]] = None):
+        self.session = session
+        # 用于把 URL 改写到镜像
+        self.rewrite = rewrite
+        self.meta_urls = dict(LOADER_META_URLS, **(meta_urls or {}))
+
+    def _url(self, url: str) -> str:
+        return self.rewrite(url) if self.rewrite else url
+
+    def _meta_url(self, loader: str) -> str:
+        meta_url = self.meta_urls.get(loader)
+        if meta_url is None:
+            raise ProfileError(f"不支持的加载器: {loader}，可选 {', '.join(self.meta_urls)}")
+        return meta_url
+
+    async def _get_json(self, url: str):
+        try:
+            async with self.session.get(self._url(url), allow_redirects=True) as resp:
+                if resp.status == 404:
+                    raise ProfileError(f"找不到 {url}")
+                resp.raise_for_status()
+                return json.loads(await resp.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise ProfileError(f"获取 {url} 失败: {e}") from e
+
+    async def loader_versions(self, loader: str, game_version: str) -> List[Dict]:
+        """支持该游戏版本的加载器版本，按发布时间从新到旧"""
+        items = await self._get_json(f"{self._meta_url(loader)}/versions/loader/{game_version}")
+        return [item["loader"] for item in items]
+
+    async def fetch_profile(self, loader: str, game_version: str,
+                            loader_version: Optional[str] = None) -> typed_dict.VersionJsonInfo:
+        """loader_version 为空时使用最新的稳定版"""
+        if loader_version is None:
+            versions = await self.loader_versions(loader, game_version)
+            if not versions:
+                raise ProfileError(f"{loader} 不支持游戏版本 {game_version}")
+            # Quilt 的 meta 没有 stable 字段，版本号不带 -beta 之类后缀的即为稳定版
+            stable = [v for v in versions if v.get("stable", "-" not in v["version"])]
+            loader_version = (stable or versions)[0]["version"]
+        return await self._get_json(
+            f"{self._meta_url(loader)}/versions/loader/{game_version}/{loader_version}/profile/json")
+
+    async def _sidecar_sha1(self, url: str, semaphore: asyncio.Semaphore) -> Optional[str]:
+        async with semaphore:
+            try:
+                async with self.session.get(self._url(f"{url}.sha1"), allow_redirects=True) as resp:
+                    if resp.status != 200:
+                        return None
+                    text = (await resp.text()).strip()
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError):
+                return None
+        sha1 = text.split()[0].lower() if text else ""
+        return sha1 if len(sha1) == 40 and all(c in "0123456789abcdef" for c in sha1) else None
+
+    async def resolve_libraries(self, profile: typed_dict.VersionJsonInfo) -> typed_dict.VersionJsonInfo:
+        """返回补全了 downloads.artifact 的配置副本；无法获取 sha1 的库不带 sha1，下载时不校验"""
+        semaphore = asyncio.Semaphore(self.SIDECAR_CONCURRENCY)
+        libraries = []
+        lookups = []
+        for lib in profile.get("libraries", []):
+            lib = dict(lib)
+            libraries.append(lib)
+            if (lib.get("downloads") or {}).get("artifact") or lib.get("natives"):
+                continue
+            path = maven_path(lib.get("name", ""))
+            base_url = lib.get("url", LIBRARIES_BASE_URL)
+            if path is None or not base_url:
+                continue
+            artifact = {"path": path, "url": f"{base_url.rstrip('/')}/{path}"}
+            if lib.get("sha1"):
+                artifact["sha1"] = lib["sha1"]
+            else:
+                lookups.append((artifact, self._sidecar_sha1(artifact["url"], semaphore)))
+            if lib.get("size") is not None:
+                artifact["size"] = lib["size"]
+            lib["downloads"] = dict(lib.get("downloads") or {}, artifact=artifact)
+
+        results = await asyncio.gather(*(lookup for _, lookup in lookups))
+        for (artifact, _), sha1 in zip(lookups, results):
+            if sha1 is None:
+                print(f"无法获取 {artifact['url']} 的 sha1，下载后不校验")
+            else:
+                artifact["sha1"] = sha1
+        return dict(profile, libraries=libraries)
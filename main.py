@@ -1,29 +1,26 @@
+# 最先导入，从这里开始计算启动耗时
+from startup_profiler import StartupProfiler
+
 import asyncio
-import hashlib
-import json
 import os.path
-import platform
 import sys
-import time
-import zipfile
-from asyncio import to_thread
-from typing import List, Dict, Literal, Optional
-
-import aiofiles
-import aiohttp
-import qasync
+from typing import TYPE_CHECKING, Callable, List, Optional
+
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFont
 from PySide6.QtWidgets import (QApplication, QWidget, QPushButton, QLabel, QVBoxLayout, QHBoxLayout, QStackedWidget,
-                               QProgressBar, QTextEdit, QComboBox, QLineEdit, QFormLayout)
-from aiohttp import ClientError, ClientPayloadError
+                               QProgressBar, QTextEdit, QComboBox, QLineEdit, QFormLayout, QCheckBox,
+                               QPlainTextEdit, QDoubleSpinBox, QFileDialog)
 
 import typed_dict
 
-
-class VersionNotFoundError(Exception):
-    """当用户请求的 Minecraft 版本不存在时抛出"""
-    pass
+# 下载、启动相关的模块（以及它们依赖的 aiohttp、aiofiles）在第一次打开对应页面时才导入，
+# qasync 在窗口首次绘制之后才导入，都不计入首屏时间
+if TYPE_CHECKING:
+    from game_log import GameLogPipeline, LogRecord
+    from http_session import SessionManager
+    from integrity import IntegrityChecker
+    from prefetch import Prefetcher
 
 
 class HomePage(QWidget):
@@ -42,350 +39,302 @@ class HomePage(QWidget):
         layout.addStretch()
 
 
-class SmartDownloader:
-    def __init__(self, session: aiohttp.ClientSession):
-        self.session = session
-
-    @staticmethod
-    async def calculate_sha1(file_path: str) -> str:
-        sha1 = hashlib.sha1()
-        async with aiofiles.open(file_path, 'rb') as f:
-            while True:
-                chunk = await f.read(64 * 1024)
-                if not chunk:
-                    break
-                sha1.update(chunk)
-        return sha1.hexdigest()
-
-    async def download(
-        self,
-        url: str,
-        target_path: str,
-        retry: int = 3,
-        timeout_per_chunk: float = 10.0,
-        expected_sha1: Optional[str] = None
-    ) -> bool:
-        """
-        返回 True 表示下载成功（且 SHA1 校验通过，如果提供 expected_sha1）。
-        否则会在重试耗尽后抛出异常。
-        """
-        # 如果文件已存在且 SHA1 匹配，直接返回
-        if expected_sha1 and os.path.exists(target_path):
-            actual = await self.calculate_sha1(target_path)
-            if actual == expected_sha1:
-                return True
-            else:
-                print(f"文件存在但 SHA1 不匹配 ({actual} != {expected_sha1})，将重新下载")
-                os.remove(target_path)
-        # 每次 retry 都重新获取已下载的大小和 Range 头
-        existing_size = os.path.getsize(target_path) if os.path.exists(target_path) else 0
-        headers = {}
-        if existing_size > 0:
-            headers["Range"] = f"bytes={existing_size}-"
-        try:
-            async with self.session.get(url, headers=headers, allow_redirects=True) as resp:
-                resp.raise_for_status()  # 捕获 4xx/5xx 错误
-
-                os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
-                mode: Literal["ab", "wb"] = "ab" if existing_size > 0 else "wb"
-
-                async with aiofiles.open(target_path, mode=mode) as f:
-                    total_downloaded = 0
-                    last_check = time.time()
-                    last_bytes = 0
-                    check_interval = 5.0
-                    while True:
-                        # 超时控制
-                        chunk = await asyncio.wait_for(
-                            resp.content.read(1024),
-                            timeout=timeout_per_chunk
-                        )
-                        if not chunk:
-                            break
-                        await f.write(chunk)
-                        total_downloaded += len(chunk)
-                        # 滑动窗口测速
-                        now = time.time()
-                        if now - last_check >= check_interval:
-                            speed = (total_downloaded - last_bytes) / (now - last_check)
-                            if speed < 1024:  # <1KB/s
-                                raise Exception("下载速度过慢，强制中断重试")
-                            last_check, last_bytes = now, total_downloaded
-            # 下载完成后做 SHA1 校验
-            if expected_sha1:
-                actual = await self.calculate_sha1(target_path)
-                if actual != expected_sha1:
-                    print(f"SHA1 校验失败 (期望 {expected_sha1}，实际 {actual})，将重试")
-                    os.remove(target_path)
-                    if retry > 0:
-                        return await self.download(
-                            url, target_path,
-                            retry - 1, timeout_per_chunk,
-                            expected_sha1
-                        )
-                    else:
-                        raise Exception("SHA1 校验失败且重试次数耗尽")
-            return True
-        except (ClientPayloadError, ClientError, asyncio.TimeoutError, Exception) as e:
-            # 打印完整堆栈，便于调试
-            import traceback; traceback.print_exc()
-
-            # 清理可能损坏的文件
-            if os.path.exists(target_path):
-                try: os.remove(target_path)
-                except: pass
-            if retry > 0:
-                print(f"下载出错: {e}，准备重试（剩余 {retry} 次）")
-                await asyncio.sleep(1)
-                # 递归调用并且 **return**，确保调用链返回新的协程结果
-                return await self.download(
-                    url, target_path,
-                    retry - 1, timeout_per_chunk,
-                    expected_sha1
-                )
-            else:
-                raise Exception(f"下载失败: {e}")
-
-
 class DownloadPage(QWidget):
-    def __init__(self):
+    def __init__(self, sessions: "SessionManager", minecraft_folder_path: str,
+                 on_folder_changed: Optional[Callable[[str], None]] = None):
         super().__init__()
-        self.session = None
+        from installer import Installer
+
         self.versions = None
-        self.version_manifest_v2_url = "https://launchermeta.mojang.com/mc/game/version_manifest_v2.json"
+        self.minecraft_folder_path = minecraft_folder_path
+        self.installer = Installer(self.minecraft_folder_path, sessions=sessions)
+        self.installer.on_status = lambda info: self.label.setText(info)
         layout = QVBoxLayout(self)
 
         form_layout = QFormLayout()
         self.version_combo = QComboBox()
         form_layout.addRow("选择版本:", self.version_combo)
+        self.loader_combo = QComboBox()
+        self.loader_combo.addItem("无（原版）", None)
+        self.loader_combo.addItem("Fabric", "fabric")
+        self.loader_combo.addItem("Quilt", "quilt")
+        form_layout.addRow("模组加载器:", self.loader_combo)
+        self.dir_edit = QLineEdit(self.minecraft_folder_path)
+        if on_folder_changed is not None:
+            # 启动页使用同一个游戏目录
+            self.dir_edit.textChanged.connect(
+                lambda text: on_folder_changed(text.strip() or self.minecraft_folder_path))
+        form_layout.addRow("游戏目录:", self.dir_edit)
+        self.force_verify_check = QCheckBox("强制重新校验所有文件")
+        form_layout.addRow("", self.force_verify_check)
+        # 限速单位 MiB/s，0 为不限
+        self.rate_limit_spin = self.create_rate_spin()
+        form_layout.addRow("下载限速 (MiB/s):", self.rate_limit_spin)
+        self.background_limit_spin = self.create_rate_spin()
+        form_layout.addRow("后台预下载限速 (MiB/s):", self.background_limit_spin)
+        self.prefetch_check = QCheckBox("空闲时预下载最新版本和最近启动的版本")
+        self.prefetch_check.toggled.connect(self.toggle_prefetch)
+        form_layout.addRow("", self.prefetch_check)
 
         self.progress = QProgressBar()
         self.label = QLabel("点击“开始下载”开始下载选中的版本")
+        self.stats_label = QLabel()
+        # 定时从统计数据刷新进度，成千上万个小文件也不会给界面线程带来大量更新
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(250)
+        self.progress_timer.timeout.connect(self.update_progress)
 
         self.download_btn = QPushButton("开始下载")
         self.download_btn.clicked.connect(self.start_download)
 
+        self.verify_btn = QPushButton("校验并修复")
+        self.verify_btn.clicked.connect(self.start_verify)
+
+        self.import_btn = QPushButton("导入整合包")
+        self.import_btn.clicked.connect(self.start_import)
+
         self.get_tasks_remaining_bun = QPushButton("获取剩余任务")
         self.get_tasks_remaining_bun.clicked.connect(self.get_tasks_remaining)
 
         layout.addLayout(form_layout)
         layout.addWidget(self.progress)
         layout.addWidget(self.label)
+        layout.addWidget(self.stats_label)
         layout.addWidget(self.download_btn)
+        layout.addWidget(self.verify_btn)
+        layout.addWidget(self.import_btn)
         layout.addWidget(self.get_tasks_remaining_bun)
 
         self._task = None
-        self.downloader = None
-
-        # 用 QTimer 单次触发启动异步任务，利用 qasync 事件循环
-        QTimer.singleShot(0, lambda: asyncio.create_task(self.get_versions()))
+        self._versions_task: Optional[asyncio.Task] = None
+        self.prefetcher: Optional["Prefetcher"] = None
+
+        # 页面在第一次打开时才创建，此时才建立会话并获取版本列表
+        QTimer.singleShot(0, self.start_get_versions)
+
+    def create_rate_spin(self) -> QDoubleSpinBox:
+        spin = QDoubleSpinBox()
+        spin.setRange(0, 1024)
+        spin.setDecimals(1)
+        spin.setSpecialValueText("不限")
+        spin.valueChanged.connect(self.update_rate_limits)
+        return spin
+
+    def update_rate_limits(self):
+        self.installer.limiter.set_rates(self.rate_limit_spin.value() * 1024 * 1024,
+                                         self.background_limit_spin.value() * 1024 * 1024)
+
+    def toggle_prefetch(self, enabled: bool):
+        if enabled:
+            # 版本列表获取完成后才开始，见 get_versions
+            if self.versions is not None:
+                self.start_prefetch()
+        elif self.prefetcher is not None:
+            asyncio.create_task(self.prefetcher.stop())
+
+    def start_prefetch(self):
+        from prefetch import Prefetcher
+
+        minecraft_folder_path = self.dir_edit.text().strip() or self.minecraft_folder_path
+        if self.prefetcher is None or self.prefetcher.minecraft_folder_path != minecraft_folder_path:
+            if self.prefetcher is not None:
+                asyncio.create_task(self.prefetcher.stop())
+            self.prefetcher = Prefetcher(self.installer, minecraft_folder_path)
+        self.prefetcher.start()
+
+    def start_get_versions(self):
+        self._versions_task = asyncio.create_task(self.get_versions())
 
     async def initialize_session(self):
-        self.session = aiohttp.ClientSession()
-        self.downloader = SmartDownloader(self.session)
+        await self.installer.start()
+        self.installer.manifest.on_update = self.populate_versions
 
-    async def get_versions(self) -> list[TypedDict.VersionInfo] | None:
-        if self.session is None:
+    async def get_versions(self) -> list[typed_dict.VersionInfo] | None:
+        if self.installer.session is None:
             await self.initialize_session()
         try:
-            async with self.session.get(self.version_manifest_v2_url) as resp:
-                version_manifest: Dict = await resp.json()
-                self.versions: List[TypedDict.VersionInfo] = version_manifest.get("versions")
-                versions_list: List[str] = []
-                for version in self.versions:
-                    i_version_info: TypedDict.VersionInfo = version
-                    versions_list.append(i_version_info["id"])
-                self.version_combo.addItems(versions_list)
-                return self.versions
+            self.versions: List[typed_dict.VersionInfo] = await self.installer.get_versions()
+            self.populate_versions(self.versions)
+            if self.prefetch_check.isChecked():
+                self.start_prefetch()
+            return self.versions
         except Exception as e:
             self.label.setText(f"获取版本列表失败: {e}")
 
+    def populate_versions(self, versions: List[typed_dict.VersionInfo]):
+        current = self.version_combo.currentText()
+        self.versions = versions
+        self.version_combo.clear()
+        self.version_combo.addItems([v["id"] for v in versions])
+        if current:
+            self.version_combo.setCurrentText(current)
+
     def start_download(self):
         if self._task is None or self._task.done():
             self.download_btn.setEnabled(False)
             self.progress.setValue(0)
             self._task = asyncio.create_task(self.download())
-    @staticmethod
-    def get_tasks_remaining():
-        current_tasks = asyncio.all_tasks()
-        print(f"当前未完成任务数: {len(current_tasks)}")
 
-    async def download_assets_index(self, index_url: str, sha1: str,
-                                    assets_folder_path: str, assets_index_path: str):
-        await self.downloader.download(index_url, assets_index_path, expected_sha1=sha1)
+    def update_progress(self):
+        if self.installer.scheduler is None:
+            return
+        meter = self.installer.scheduler.meter
+        snapshot = self.installer.metrics.snapshot()
+        self.progress.setValue(int(meter.progress * 100))
+        self.stats_label.setText(
+            f"{meter.files_done}/{meter.files_total} 个文件，"
+            f"{snapshot['speed'] / 1024 / 1024:.2f} MiB/s，"
+            f"已下载 {snapshot['bytes_received'] / 1024 / 1024:.1f} MiB，"
+            f"重试 {snapshot['retries']}，失败 {snapshot['files_failed']}"
+        )
+
+    def begin_tracking(self):
+        """为一次下载/修复重置进度和统计，并开始定时刷新界面"""
+        # 设置 ECL_DOWNLOAD_TRACE 环境变量时把下载事件导出为 JSON Lines
+        self.installer.begin_tracking(os.environ.get("ECL_DOWNLOAD_TRACE"))
+        self.progress_timer.start()
+
+    def end_tracking(self):
+        self.progress_timer.stop()
+        if self.installer.scheduler is not None:
+            self.update_progress()
+            self.installer.end_tracking()
+
+    def start_verify(self):
+        if self._task is None or self._task.done():
+            self.download_btn.setEnabled(False)
+            self.verify_btn.setEnabled(False)
+            self._task = asyncio.create_task(self.verify())
 
-        async with aiofiles.open(assets_index_path, "r", encoding="utf-8") as f:
-            data = json.loads(await f.read())
+    async def verify(self):
+        """检查已安装的版本，只重新下载缺失或损坏的文件"""
+        version: str = self.version_combo.currentText()
+        try:
+            if self.installer.session is None:
+                await self.initialize_session()
+            minecraft_folder_path = self.dir_edit.text().strip() or self.minecraft_folder_path
+            self.installer.verify_index.force = self.force_verify_check.isChecked()
+            self.begin_tracking()
+            report, repaired = await self.installer.verify(version, full=self.installer.verify_index.force,
+                                                           minecraft_folder_path=minecraft_folder_path)
+            if report.ok:
+                self.label.setText(f"版本 {version} 完整。{report.summary()}")
+            else:
+                self.label.setText(f"版本 {version} 修复完成，重新下载了 {repaired} 个文件")
+        except FileNotFoundError:
+            self.label.setText(f"版本 {version} 尚未安装")
+        except Exception as e:
+            self.label.setText(f"校验失败: {e}")
+            print(f"[Verify Error] {e}")
+        finally:
+            self.end_tracking()
+            await self.installer.save()
+            self.download_btn.setEnabled(True)
+            self.verify_btn.setEnabled(True)
 
-        tasks = []
-        for name, meta in data['objects'].items():
-            hash_ = meta['hash']
-            subdir = hash_[:2]
-            path = os.path.join(assets_folder_path, subdir, hash_)
-            url = f"https://resources.download.minecraft.net/{subdir}/{hash_}"
-            tasks.append(self.downloader.download(url, path, expected_sha1=hash_))
+    def start_import(self):
+        if self._task is not None and not self._task.done():
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "选择整合包", "", "整合包 (*.mrpack *.zip)")
+        if path:
+            self.download_btn.setEnabled(False)
+            self.import_btn.setEnabled(False)
+            self.progress.setValue(0)
+            self._task = asyncio.create_task(self.import_modpack(path))
 
-        await asyncio.gather(*tasks)
+    async def import_modpack(self, path: str):
+        """导入 Modrinth / CurseForge 整合包；中断后再次导入同一个文件会从上次的进度继续"""
+        from modpack import ModpackInstaller
 
-    @staticmethod
-    def is_allowed(lib: TypedDict.Library, os_name: str, arch: str) -> bool:
-        rules = lib.get("rules")
-        if not rules:
-            return True  # 没有规则时默认允许
-
-        result = None
-        for rule in rules:
-            os_rule = rule.get("os", {})
-            # 判断是否匹配当前系统
-            if os_rule:
-                if "name" in os_rule and os_rule["name"] != os_name:
-                    continue
-                if "arch" in os_rule and os_rule["arch"] != arch:
-                    continue
-
-            # 匹配到规则，就根据 action 修改结果
-            result = rule["action"] == "allow"
-
-        return result if result is not None else False
+        try:
+            if self.installer.session is None:
+                await self.initialize_session()
+            minecraft_folder_path = self.dir_edit.text().strip() or self.minecraft_folder_path
+            self.begin_tracking()
+            result = await ModpackInstaller(self.installer).install(path, minecraft_folder_path)
+            if result.missing_loader:
+                self.label.setText(f"整合包 {result.pack.name} 的文件已导入，请用官方安装程序安装 {result.missing_loader}")
+            else:
+                self.label.setText(f"整合包 {result.pack.name} 导入完成，请在启动页选择版本 {result.version_id}")
+        except Exception as e:
+            self.label.setText(f"导入失败: {e}")
+            print(f"[Modpack Error] {e}")
+        finally:
+            self.end_tracking()
+            await self.installer.save()
+            self.download_btn.setEnabled(True)
+            self.import_btn.setEnabled(True)
+
+    async def shutdown(self):
+        """关闭窗口时调用：取消进行中的下载（已收到的数据记录到续传日志，下次继续），保存索引"""
+        tasks = [t for t in (self._task, self._versions_task) if t is not None and not t.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.prefetcher is not None:
+            await self.prefetcher.stop()
+        await self.installer.close()
 
     @staticmethod
-    async def extract_natives_if_needed(jar_path: str, dest_path: str,
-                                        extract_cfg: Optional[TypedDict.LibraryExtract]):
-        def _extract():
-            excludes = extract_cfg.get("exclude", []) if extract_cfg else []
-            with zipfile.ZipFile(jar_path, 'r') as zip_ref:
-                for member in zip_ref.namelist():
-                    if any(member.startswith(exclude) for exclude in excludes):
-                        continue
-                    zip_ref.extract(member, dest_path)
-
-        await to_thread(_extract)
-
-    async def download_libraries(self, libraries: List[TypedDict.Library],
-                                 libraries_folder_path: str, selected_version_natives_folder_path: str):
-        os_name = platform.system().lower()
-        arch = platform.machine().lower()
-        tasks = []
-
-        for lib in libraries:
-            if not self.is_allowed(lib, os_name, arch):
-                continue
-
-            downloads = lib.get("downloads", {})
-            name = lib.get("name", "")
-            artifact = downloads.get("artifact")
-
-            # 普通库或 natives（新格式）
-            if artifact:
-                path = os.path.join(libraries_folder_path, artifact["path"])
-                url = artifact["url"]
-                sha1 = artifact["sha1"]
-                tasks.append(self.downloader.download(url, path, expected_sha1=sha1))
-
-                # 判断是否是新格式 natives：name 包含 natives-xxx
-                '''
-                if "natives-" in name:
-                    native_dest = os.path.join("natives", name.replace(":", "_"))
-                    tasks.append(self.extract_natives_if_needed(path, native_dest, lib.get("extract")))
-                '''
-
-            # 老格式 natives（classifiers + natives）
-            classifiers = downloads.get("classifiers")
-            natives = lib.get("natives")
-            if classifiers and natives:
-                key = natives.get(os_name)
-                if key and key in classifiers:
-                    classifier = classifiers[key]
-                    jar_path = os.path.join("libraries", classifier["path"])
-                    url = classifier["url"]
-                    sha1 = classifier["sha1"]
-                    tasks.append(self.downloader.download(url, jar_path, expected_sha1=sha1))
-                    native_dest = os.path.join("natives", name.replace(":", "_"))
-                    '''
-                    tasks.append(self.extract_natives_if_needed(jar_path, native_dest, lib.get("extract")))
-                    '''
-
-        await asyncio.gather(*tasks)
+    def get_tasks_remaining():
+        current_tasks = asyncio.all_tasks()
+        print(f"当前未完成任务数: {len(current_tasks)}")
 
     async def download(self):
-        async def output(info: str):
-            self.label.setText(info)
+        from installer import VersionNotFoundError
+        from loader_profile import ProfileError
 
         try:
-            if self.session is None:
+            if self.installer.session is None:
                 await self.initialize_session()
             version: str = self.version_combo.currentText()
-            asyncio.create_task(output(f"开始下载版本 {version}..."))
-            versions = await self.get_versions()
-            selected_version_info = next((v for v in versions if v["id"] == version), None)
-            if selected_version_info is None:
-                raise VersionNotFoundError(f"找不到版本：{version}")
-
-            minecraft_folder_path = os.path.join(os.getcwd(), ".minecraft")
-            versions_folder_path = os.path.join(minecraft_folder_path, "versions")
-            selected_version_folder_path = os.path.join(versions_folder_path, version)
-            selected_version_json_path = os.path.join(selected_version_folder_path, f"{version}.json")
-            selected_version_jar_path = os.path.join(selected_version_folder_path, f"{version}.jar")
-            assets_folder_path = os.path.join(minecraft_folder_path, "assets")
-            assets_index_path = os.path.join(assets_folder_path, "indexes")
-            libraries_folder_path = os.path.join(minecraft_folder_path, "libraries")
-            selected_version_natives_folder_path = os.path.join(selected_version_folder_path, f"{version}-natives")
-            selected_version_json_url = selected_version_info["url"]
-            selected_version_json_sha1 = selected_version_info["sha1"]
-            asyncio.create_task(output(f"已找到版本 {version}，准备从 {selected_version_json_url} 下载..."))
-
-            await self.downloader.download(selected_version_json_url, selected_version_json_path, expected_sha1=selected_version_json_sha1)
-
-            async with aiofiles.open(selected_version_json_path, "r", encoding="utf-8") as f:
-                selected_version_dict: TypedDict.VersionJsonInfo = json.loads(await f.read())
-                await asyncio.gather(
-                    self.downloader.download(
-                        selected_version_dict["downloads"]["client"]["url"],
-                        selected_version_jar_path,
-                        expected_sha1=selected_version_dict["downloads"]["client"]["sha1"]
-                    ),
-                    self.download_assets_index(
-                        selected_version_dict["assetIndex"]["url"],
-                        selected_version_dict["assetIndex"]["sha1"],
-                        assets_folder_path,
-                        assets_index_path
-                    )
-
-                )
-                '''
-                ,
-
-                self.download_libraries(
-                    selected_version_dict["libraries"],
-                    libraries_folder_path,
-                    selected_version_natives_folder_path
-                )
-                '''
-                asyncio.create_task(output(f"版本 {version} 下载完成！"))
-
-        except VersionNotFoundError as e:
-            asyncio.create_task(output(str(e)))
+            self.installer.verify_index.force = self.force_verify_check.isChecked()
+            self.begin_tracking()
+            minecraft_folder_path = self.dir_edit.text().strip() or self.minecraft_folder_path
+            loader = self.loader_combo.currentData()
+            if loader:
+                await self.installer.install_loader(loader, version, minecraft_folder_path=minecraft_folder_path)
+            else:
+                await self.installer.install(version, minecraft_folder_path)
+        except (VersionNotFoundError, ProfileError) as e:
+            self.label.setText(str(e))
             print(f"[Version Error] {e}")
         except Exception as e:
-            asyncio.create_task(output("下载时发生未知错误"))
+            self.label.setText("下载时发生未知错误")
             print(f"[Download Error] {e}")
         finally:
+            self.end_tracking()
+            await self.installer.save()
             self.download_btn.setEnabled(True)
 
 
 class LaunchPage(QWidget):
-    def __init__(self):
+    # 日志控件最多保留的行数，更早的日志在环形缓冲区和日志文件中
+    LOG_VIEW_LINES = 5000
+
+    def __init__(self, minecraft_folder_path: Callable[[], str]):
         super().__init__()
+        from launcher import Launcher
+
+        # 游戏目录在下载页选择，每次打开启动页时重新读取
+        self.get_minecraft_folder_path = minecraft_folder_path
+        self.minecraft_folder_path = minecraft_folder_path()
+        self.launcher = Launcher(self.minecraft_folder_path)
+        # 校验索引在第一次启动游戏时才读取
+        self.checker: Optional["IntegrityChecker"] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
         layout = QVBoxLayout(self)
 
         form_layout = QFormLayout()
 
         self.username_edit = QLineEdit()
         self.version_combo = QComboBox()
-        self.version_combo.addItems(["1.20.2", "1.19.4", "1.18.2", "1.17.1"])  # 示例版本
+        self.java_edit = QLineEdit()
+        self.java_edit.setPlaceholderText("自动（优先使用下载的 Java 运行时）")
 
         form_layout.addRow("用户名:", self.username_edit)
         form_layout.addRow("启动版本:", self.version_combo)
+        form_layout.addRow("Java 路径:", self.java_edit)
 
         self.progress = QProgressBar()
         self.label = QLabel("准备启动游戏")
@@ -393,12 +342,55 @@ class LaunchPage(QWidget):
         self.launch_btn = QPushButton("启动游戏")
         self.launch_btn.clicked.connect(self.start_launch)
 
+        # 游戏日志：QPlainTextEdit 限制行数，日志再多也不会无限占用内存
+        self.log_level_combo = QComboBox()
+        for text, level in (("调试", "DEBUG"), ("信息", "INFO"), ("警告", "WARN"), ("错误", "ERROR")):
+            self.log_level_combo.addItem(text, level)
+        self.log_level_combo.setCurrentIndex(1)
+        self.log_level_combo.currentIndexChanged.connect(self.change_log_level)
+        self.log_view = QPlainTextEdit()
+        self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(self.LOG_VIEW_LINES)
+        log_bar = QHBoxLayout()
+        log_bar.addWidget(QLabel("游戏日志"))
+        log_bar.addStretch()
+        log_bar.addWidget(self.log_level_combo)
+
         layout.addLayout(form_layout)
         layout.addWidget(self.progress)
         layout.addWidget(self.label)
         layout.addWidget(self.launch_btn)
+        layout.addLayout(log_bar)
+        layout.addWidget(self.log_view)
 
         self._task = None
+        self._log_task: Optional[asyncio.Task] = None
+        self.log_pipeline: Optional["GameLogPipeline"] = None
+
+    def sync_folder(self):
+        """游戏目录变化后换用新目录的启动器，校验索引也在下次启动时重新读取"""
+        from launcher import Launcher
+
+        path = self.get_minecraft_folder_path()
+        if path != self.minecraft_folder_path:
+            self.minecraft_folder_path = path
+            self.launcher = Launcher(path)
+            self.checker = None
+
+    def refresh_versions(self):
+        from launcher import list_installed_versions
+
+        self.sync_folder()
+        current = self.version_combo.currentText()
+        self.version_combo.clear()
+        self.version_combo.addItems(list_installed_versions(self.minecraft_folder_path))
+        if current:
+            self.version_combo.setCurrentText(current)
+
+    def showEvent(self, event):
+        # 每次切换到启动页时重新扫描已安装的版本
+        self.refresh_versions()
+        super().showEvent(event)
 
     def start_launch(self):
         if self._task is None or self._task.done():
@@ -406,17 +398,72 @@ class LaunchPage(QWidget):
             if not username:
                 self.label.setText("用户名不能为空！")
                 return
+            if not self.version_combo.currentText():
+                self.label.setText("没有已安装的版本，请先下载")
+                return
             self.launch_btn.setEnabled(False)
             self.progress.setValue(0)
             self._task = asyncio.create_task(self.launch())
 
     async def launch(self):
-        self.label.setText("游戏启动中...")
-        for i in range(1, 11):
-            await asyncio.sleep(0.3)
-            self.progress.setValue(i * 10)
-        self.label.setText("游戏启动完成！")
-        self.launch_btn.setEnabled(True)
+        from game_log import GameLogPipeline
+        from launcher import LaunchOptions
+
+        version = self.version_combo.currentText()
+        options = LaunchOptions(self.username_edit.text().strip(), java_path=self.java_edit.text().strip() or None)
+        try:
+            if self.checker is None:
+                from integrity import IntegrityChecker
+                from verify_index import VerifyIndex
+
+                self.checker = IntegrityChecker(
+                    self.minecraft_folder_path, self.launcher.resolver,
+                    VerifyIndex(os.path.join(self.minecraft_folder_path, "verify_index.json"))
+                )
+            self.label.setText("正在检查游戏文件...")
+            report = await self.checker.check(version)
+            print(f"[Launch] {report.summary()}")
+            if not report.ok:
+                self.label.setText(f"有 {len(report.repair_plan)} 个文件缺失或损坏，请在下载页“校验并修复”")
+                return
+            self.progress.setValue(50)
+            self.label.setText("正在准备启动参数...")
+            self.process = await self.launcher.launch(version, options, stdout=asyncio.subprocess.PIPE,
+                                                      stderr=asyncio.subprocess.PIPE)
+            self.progress.setValue(100)
+            self.label.setText(f"游戏已启动（PID {self.process.pid}）")
+            from prefetch import record_recent_version
+
+            await asyncio.to_thread(record_recent_version, self.minecraft_folder_path, version)
+            self.log_pipeline = GameLogPipeline(
+                os.path.join(self.minecraft_folder_path, "logs", "launcher", f"{version}.log"))
+            self.log_pipeline.set_min_level(self.log_level_combo.currentData())
+            self.log_pipeline.on_batch = self.append_logs
+            self.log_view.clear()
+            self._log_task = asyncio.create_task(self.watch_game(self.process, self.log_pipeline))
+        except Exception as e:
+            self.label.setText(f"启动失败: {e}")
+            print(f"[Launch Error] {e}")
+        finally:
+            self.launch_btn.setEnabled(True)
+
+    async def watch_game(self, process: asyncio.subprocess.Process, pipeline: "GameLogPipeline"):
+        exit_code = await pipeline.run(process)
+        self.label.setText(f"游戏已退出（退出码 {exit_code}），日志保存在 {pipeline.log_file.path}")
+
+    def append_logs(self, records: List["LogRecord"], skipped: int):
+        """每批只更新一次控件"""
+        lines = [r.format() for r in records]
+        if skipped:
+            lines.insert(0, f"…… 省略 {skipped} 条日志 ……")
+        self.log_view.appendPlainText("\n".join(lines))
+
+    def change_log_level(self):
+        if self.log_pipeline is None:
+            return
+        self.log_pipeline.set_min_level(self.log_level_combo.currentData())
+        records = self.log_pipeline.buffer.snapshot(self.log_pipeline.min_level, self.LOG_VIEW_LINES)
+        self.log_view.setPlainText("\n".join(r.format() for r in records))
 
 
 class HelpPage(QWidget):
@@ -467,21 +514,27 @@ class MainWindow(QWidget):
         nav_layout.addStretch()
 
         self.stack = QStackedWidget()
-        self.home_page = HomePage()
-        self.download_page = DownloadPage()
-        self.launch_page = LaunchPage()
-        self.help_page = HelpPage()
-        self.toolbox_page = ToolboxPage()
-
-        for page in (self.home_page, self.download_page, self.launch_page, self.help_page, self.toolbox_page):
-            self.stack.addWidget(page)
+        # 页面在第一次切换到时才创建：启动时只构造主页，不导入下载、启动相关的模块，也不访问网络
+        # 下载页和启动页共用的游戏目录，在下载页修改
+        self.minecraft_folder_path = os.path.join(os.getcwd(), ".minecraft")
+        self.page_factories: List[Callable[[], QWidget]] = [
+            HomePage,
+            lambda: DownloadPage(self.session_manager(), self.minecraft_folder_path, self.set_minecraft_folder_path),
+            lambda: LaunchPage(lambda: self.minecraft_folder_path),
+            HelpPage, ToolboxPage
+        ]
+        self.pages: List[Optional[QWidget]] = [None] * len(self.page_factories)
+        # 整个应用共用的 HTTP 会话，第一次需要联网时才创建
+        self.sessions: Optional["SessionManager"] = None
+        self._shutdown_task: Optional[asyncio.Task] = None
+        self._shutdown_done = False
 
         main_layout = QVBoxLayout(self)
         main_layout.addLayout(nav_layout)
         main_layout.addWidget(self.stack)
 
         self.buttons = [self.home_btn, self.download_btn, self.launch_btn, self.help_btn, self.toolbox_btn]
-        self.home_btn.setChecked(True)
+        self.switch_page(0)
 
         self.home_btn.clicked.connect(lambda: self.switch_page(0))
         self.download_btn.clicked.connect(lambda: self.switch_page(1))
@@ -489,13 +542,54 @@ class MainWindow(QWidget):
         self.help_btn.clicked.connect(lambda: self.switch_page(3))
         self.toolbox_btn.clicked.connect(lambda: self.switch_page(4))
 
+    def set_minecraft_folder_path(self, path: str):
+        self.minecraft_folder_path = path
+
+    def session_manager(self) -> "SessionManager":
+        if self.sessions is None:
+            from http_session import SessionManager
+
+            self.sessions = SessionManager()
+        return self.sessions
+
+    def closeEvent(self, event):
+        # 联网过时先停止下载、记录续传进度并关闭会话，完成后再真正关闭窗口
+        if self.sessions is None or self._shutdown_done:
+            super().closeEvent(event)
+            return
+        event.ignore()
+        if self._shutdown_task is None:
+            self.setEnabled(False)
+            self._shutdown_task = asyncio.create_task(self.shutdown())
+
+    async def shutdown(self):
+        try:
+            download_page = self.pages[1]
+            if download_page is not None:
+                await download_page.shutdown()
+            await self.sessions.close()
+        except Exception as e:
+            print(f"[Shutdown Error] {e}")
+        finally:
+            self._shutdown_done = True
+            self.close()
+
+    def page(self, index: int) -> QWidget:
+        if self.pages[index] is None:
+            self.pages[index] = self.page_factories[index]()
+            self.stack.addWidget(self.pages[index])
+        return self.pages[index]
+
     def switch_page(self, index):
-        self.stack.setCurrentIndex(index)
+        self.stack.setCurrentWidget(self.page(index))
         for i, btn in enumerate(self.buttons):
             btn.setChecked(i == index)
 
 
 if __name__ == "__main__":
+    # 设置 ECL_STARTUP_PROFILE 环境变量时输出启动各阶段的耗时，见 startup_profiler.py
+    profiler = StartupProfiler()
+    profiler.mark("imports")
     app = QApplication(sys.argv)
     # 读取样式表文件
     try:
@@ -503,11 +597,27 @@ if __name__ == "__main__":
             app.setStyleSheet(qss_f.read())
     except Exception:
         pass
+    profiler.mark("application")
 
     window = MainWindow()
+    profiler.mark("window")
     window.show()
+    # 先处理一次事件让窗口完成首次绘制，再导入 qasync 建立事件循环
+    app.processEvents()
+    profiler.mark("first_paint")
+
+    import qasync
 
     loop = qasync.QEventLoop(app)
     asyncio.set_event_loop(loop)
+    profiler.mark("event_loop")
+
+    def started():
+        profiler.mark("interactive")
+        profiler.finish()
+        if profiler.quit_after_start:
+            loop.stop()
+
+    loop.call_soon(started)
     with loop:
         loop.run_forever()
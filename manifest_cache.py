@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import os.path
+import time
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+import typed_dict
+from file_util import atomic_write_json
+
+
+class ManifestCache:
+    """
+    版本清单（version_manifest_v2.json）的磁盘缓存。
+    - 缓存未过期（ttl 内）时直接使用，不访问网络；
+    - 缓存过期时立即返回旧数据，同时在后台用 ETag/If-Modified-Since 重新验证；
+    - 没有缓存时才等待网络请求。
+    另外维护 版本 id -> VersionInfo 的字典索引，查找版本无需线性扫描。
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url: str, cache_path: str, ttl: float = 600.0,
+                 rewrite: Optional[Callable[[str], str]] = None):
+        self.session = session
+        self.url = url
+        self.cache_path = cache_path
+        self.ttl = ttl
+        # 用于把 URL 改写到镜像
+        self.rewrite = rewrite
+        self.manifest: Optional[Dict] = None
+        self.index: Dict[str, typed_dict.VersionInfo] = {}
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.fetched_at = 0.0
+        # 后台刷新得到新清单时回调，参数为新的版本列表
+        self.on_update: Optional[Callable[[List[typed_dict.VersionInfo]], None]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loaded = False
+
+    @property
+    def versions(self) -> List[typed_dict.VersionInfo]:
+        return self.manifest.get("versions", []) if self.manifest else []
+
+    @property
+    def latest(self) -> Dict[str, str]:
+        return self.manifest.get("latest", {}) if self.manifest else {}
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.manifest is not None and time.time() - self.fetched_at < self.ttl
+
+    def get_version(self, version_id: str) -> Optional[typed_dict.VersionInfo]:
+        return self.index.get(version_id)
+
+    def _set_manifest(self, manifest: Dict):
+        self.manifest = manifest
+        self.index = {v["id"]: v for v in manifest.get("versions", [])}
+
+    def _load_sync(self) -> Optional[Dict]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_sync(self, data: Dict):
+        atomic_write_json(self.cache_path, data, separators=(",", ":"))
+
+    async def _load_cached(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        data = await asyncio.to_thread(self._load_sync)
+        if data and data.get("manifest"):
+            self._set_manifest(data["manifest"])
+            self.etag = data.get("etag")
+            self.last_modified = data.get("last_modified")
+            self.fetched_at = data.get("fetched_at", 0.0)
+
+    async def refresh(self) -> bool:
+        """带条件请求地重新获取清单，返回清单内容是否有变化"""
+        headers = {}
+        if self.manifest is not None:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        url = self.rewrite(self.url) if self.rewrite else self.url
+        async with self.session.get(url, headers=headers) as resp:
+            if resp.status == 304:
+                self.fetched_at = time.time()
+                changed = False
+                manifest = self.manifest
+            else:
+                resp.raise_for_status()
+                manifest = await resp.json(content_type=None)
+                self.etag = resp.headers.get("ETag")
+                self.last_modified = resp.headers.get("Last-Modified")
+                self.fetched_at = time.time()
+                changed = manifest != self.manifest
+                self._set_manifest(manifest)
+        await asyncio.to_thread(self._save_sync, {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": self.fetched_at,
+            "manifest": manifest,
+        })
+        return changed
+
+    async def _background_refresh(self):
+        try:
+            if await self.refresh() and self.on_update is not None:
+                self.on_update(self.versions)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"后台刷新版本清单失败: {e}")
+
+    def refresh_in_background(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+        return self._refresh_task
+
+    async def get(self, force_refresh: bool = False) -> List[typed_dict.VersionInfo]:
+        """返回版本列表，尽量不等待网络"""
+        await self._load_cached()
+        if force_refresh or self.manifest is None:
+            await self.refresh()
+        elif not self.is_fresh:
+            self.refresh_in_background()
+        return self.versions
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+
+class Mirror:
+    """
+    按 URL 前缀改写的镜像源（BMCLAPI 风格）。
+    prefix_map 为 {官方前缀: 镜像前缀}；为空表示官方源本身，原样返回 URL。
+    """
+
+    def __init__(self, name: str, prefix_map: Optional[Dict[str, str]] = None):
+        self.name = name
+        # 长前缀优先匹配
+        self.prefix_map = sorted((prefix_map or {}).items(), key=lambda kv: len(kv[0]), reverse=True)
+        self.speed = 0.0  # 观测到的下载速度（字节/秒）的指数移动平均
+        self.latency: Optional[float] = None
+        self.failures = 0  # 连续失败次数
+
+    @property
+    def is_official(self) -> bool:
+        return not self.prefix_map
+
+    def rewrite(self, url: str) -> Optional[str]:
+        if self.is_official:
+            return url
+        for official, mirror in self.prefix_map:
+            if url.startswith(official):
+                return mirror + url[len(official):]
+        return None
+
+    def __repr__(self) -> str:
+        return f"Mirror({self.name!r}, speed={self.speed:.0f}, latency={self.latency}, failures={self.failures})"
+
+
+OFFICIAL = "official"
+BMCLAPI = "bmclapi"
+
+
+def default_mirrors() -> List[Mirror]:
+    return [
+        Mirror(OFFICIAL),
+        Mirror(BMCLAPI, {
+            "https://launchermeta.mojang.com": "https://bmclapi2.bangbang93.com",
+            "https://launcher.mojang.com": "https://bmclapi2.bangbang93.com",
+            "https://piston-meta.mojang.com": "https://bmclapi2.bangbang93.com",
+            "https://piston-data.mojang.com": "https://bmclapi2.bangbang93.com",
+            "https://resources.download.minecraft.net": "https://bmclapi2.bangbang93.com/assets",
+            "https://libraries.minecraft.net": "https://bmclapi2.bangbang93.com/maven",
+        }),
+    ]
+
+
+class MirrorSelector:
+    """
+    维护镜像源的排名：启动时测速，之后用每次下载观测到的速度做指数移动平均，
+    出错或过慢的镜像会被排到后面，下一次重试自动切换到其他镜像。
+    """
+
+    EWMA_ALPHA = 0.3
+    # 连续失败达到该次数的镜像排到最后
+    MAX_FAILURES = 3
+
+    def __init__(self, mirrors: Optional[List[Mirror]] = None,
+                 probe_url: str = "https://launchermeta.mojang.com/mc/game/version_manifest_v2.json"):
+        self.mirrors = mirrors if mirrors is not None else default_mirrors()
+        self.probe_url = probe_url
+
+    def ranked(self) -> List[Mirror]:
+        return sorted(
+            self.mirrors,
+            key=lambda m: (min(m.failures, self.MAX_FAILURES), -m.speed,
+                           m.latency if m.latency is not None else float("inf"))
+        )
+
+    def pick(self, url: str) -> Tuple[Optional[Mirror], str]:
+        """返回排名最高且能处理该 URL 的镜像及改写后的 URL；没有可用镜像时返回原 URL"""
+        for mirror in self.ranked():
+            rewritten = mirror.rewrite(url)
+            if rewritten is not None:
+                return mirror, rewritten
+        return None, url
+
+    def rewrite(self, url: str) -> str:
+        return self.pick(url)[1]
+
+    def report_success(self, mirror: Optional[Mirror], size: int, elapsed: float):
+        if mirror is None or elapsed <= 0:
+            return
+        speed = size / elapsed
+        mirror.speed = speed if mirror.speed == 0 else (
+            self.EWMA_ALPHA * speed + (1 - self.EWMA_ALPHA) * mirror.speed
+        )
+        mirror.failures = 0
+
+    def report_failure(self, mirror: Optional[Mirror]):
+        if mirror is not None:
+            mirror.failures += 1
+
+    async def _probe_one(self, session: aiohttp.ClientSession, mirror: Mirror, timeout: float):
+        url = mirror.rewrite(self.probe_url)
+        if url is None:
+            return
+        start = time.monotonic()
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                resp.raise_for_status()
+                first_byte = await resp.content.readany()
+                mirror.latency = time.monotonic() - start
+                size = len(first_byte)
+                async for chunk in resp.content.iter_any():
+                    size += len(chunk)
+            self.report_success(mirror, size, time.monotonic() - start)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"镜像 {mirror.name} 测速失败: {e}")
+            self.report_failure(mirror)
+
+    async def probe(self, session: aiohttp.ClientSession, timeout: float = 10.0):
+        """并行测量每个镜像的延迟和吞吐量"""
+        await asyncio.gather(*(self._probe_one(session, m, timeout) for m in self.mirrors))
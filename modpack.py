@@ -0,0 +1,457 @@
+import asyncio
+import hashlib
+import json
+import os
+import os.path
+import shutil
+import threading
+import zipfile
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import aiohttp
+
+import typed_dict
+from download_scheduler import DownloadPriority
+from file_util import atomic_write_json, contained_path
+from json_cache import file_sha1
+
+MRPACK_INDEX = "modrinth.index.json"
+CURSEFORGE_MANIFEST = "manifest.json"
+# mrpack 的依赖名 -> 加载器
+MRPACK_LOADERS = {"fabric-loader": "fabric", "quilt-loader": "quilt", "forge": "forge", "neoforge": "neoforge"}
+# 可以自动安装的加载器，其余（Forge、NeoForge）需要运行官方安装程序
+SUPPORTED_LOADERS = ("fabric", "quilt")
+CURSEFORGE_API_URL = "https://api.curseforge.com"
+# 作者关闭第三方分发的文件 API 不返回 downloadUrl，按文件 id 拼出 CDN 地址
+CURSEFORGE_EDGE_URL = "https://edge.forgecdn.net/files"
+# CurseForge 项目类别 -> 游戏目录下的子目录
+CURSEFORGE_CLASS_FOLDERS = {6: "mods", 12: "resourcepacks", 6552: "shaderpacks"}
+# CurseForge 文件哈希的 algo 字段，1 为 sha1
+CURSEFORGE_SHA1 = 1
+# 导入进度保存在 <游戏根目录>/cache/modpacks/<整合包 sha1>.json
+STATE_FOLDER = os.path.join("cache", "modpacks")
+
+
+class ModpackError(Exception):
+    """整合包无效或无法导入：缺少索引、路径越界、文件下载或校验失败等"""
+    pass
+
+
+def safe_join(root: str, relative: str) -> str:
+    """整合包中的路径只能落在 root 之内"""
+    path = contained_path(root, relative)
+    if path is None:
+        raise ModpackError(f"整合包中的路径无效: {relative}")
+    return path
+
+
+class ModpackFile:
+    __slots__ = ("path", "urls", "sha1", "sha512", "size")
+
+    def __init__(self, path: str, urls: List[str], sha1: Optional[str], sha512: Optional[str] = None,
+                 size: Optional[int] = None):
+        # 相对于游戏目录，例如 mods/sodium.jar
+        self.path = path
+        # 依次尝试的下载地址
+        self.urls = urls
+        self.sha1 = sha1
+        self.sha512 = sha512
+        self.size = size
+
+
+class Modpack:
+    """从整合包中读出的内容：需要的游戏版本和加载器、要下载的文件、overrides 目录"""
+
+    def __init__(self, archive_path: str, archive_sha1: str, format_: str, name: str, version: str,
+                 minecraft: str, loader: Optional[str] = None, loader_version: Optional[str] = None):
+        self.archive_path = archive_path
+        self.archive_sha1 = archive_sha1
+        # mrpack 或 curseforge
+        self.format = format_
+        self.name = name
+        self.version = version
+        self.minecraft = minecraft
+        self.loader = loader
+        self.loader_version = loader_version
+        self.files: List[ModpackFile] = []
+        # CurseForge 的文件只有 (项目 id, 文件 id)，由 CurseForgeAPI.resolve 转换成 files
+        self.curseforge_files: List[Tuple[int, int]] = []
+        # 按顺序解压，后面的覆盖前面的
+        self.override_folders: List[str] = []
+        # overrides 中提供的文件（相对于游戏目录），同路径的文件不再下载
+        self.override_paths: Set[str] = set()
+
+    @property
+    def file_count(self) -> int:
+        return len(self.files) + len(self.curseforge_files)
+
+
+def _override_paths(zf: zipfile.ZipFile, folders: List[str]) -> Set[str]:
+    paths = set()
+    for info in zf.infolist():
+        for folder in folders:
+            if not info.is_dir() and info.filename.startswith(f"{folder}/"):
+                paths.add(info.filename[len(folder) + 1:])
+    return paths
+
+
+def _read_mrpack(zf: zipfile.ZipFile, pack_args: tuple) -> Modpack:
+    index: typed_dict.ModrinthIndex = json.loads(zf.read(MRPACK_INDEX))
+    if index.get("game", "minecraft") != "minecraft":
+        raise ModpackError(f"不支持的游戏: {index.get('game')}")
+    dependencies = index.get("dependencies", {})
+    if "minecraft" not in dependencies:
+        raise ModpackError("整合包没有指定游戏版本")
+    loader = next((name for name in MRPACK_LOADERS if name in dependencies), None)
+    pack = Modpack(*pack_args, "mrpack", index.get("name", ""), index.get("versionId", ""),
+                   dependencies["minecraft"], MRPACK_LOADERS.get(loader), dependencies.get(loader))
+    for entry in index.get("files", []):
+        if entry.get("env", {}).get("client") == "unsupported":
+            continue
+        hashes = entry.get("hashes", {})
+        if not entry.get("downloads") or not hashes.get("sha1"):
+            raise ModpackError(f"文件 {entry.get('path')} 缺少下载地址或 sha1")
+        pack.files.append(ModpackFile(entry["path"], list(entry["downloads"]), hashes["sha1"], hashes.get("sha512"),
+                                      entry.get("fileSize")))
+    # client-overrides 只用于客户端，覆盖通用的 overrides
+    pack.override_folders = ["overrides", "client-overrides"]
+    return pack
+
+
+def _read_curseforge(zf: zipfile.ZipFile, pack_args: tuple) -> Modpack:
+    manifest: typed_dict.CurseForgeManifest = json.loads(zf.read(CURSEFORGE_MANIFEST))
+    if manifest.get("manifestType", "minecraftModpack") != "minecraftModpack" or "minecraft" not in manifest:
+        raise ModpackError("不是 CurseForge 整合包")
+    minecraft = manifest["minecraft"]
+    loaders = minecraft.get("modLoaders", [])
+    primary = next((l for l in loaders if l.get("primary")), loaders[0] if loaders else None)
+    loader, loader_version = None, None
+    if primary is not None:
+        # 例如 forge-47.1.0、fabric-0.14.21
+        loader, _, loader_version = primary["id"].partition("-")
+    pack = Modpack(*pack_args, "curseforge", manifest.get("name", ""), manifest.get("version", ""),
+                   minecraft["version"], loader, loader_version or None)
+    pack.curseforge_files = [(f["projectID"], f["fileID"]) for f in manifest.get("files", [])
+                             if f.get("required", True)]
+    pack.override_folders = [manifest.get("overrides") or "overrides"]
+    return pack
+
+
+def read_modpack(archive_path: str) -> Modpack:
+    """读取 .mrpack 或 CurseForge 整合包 zip 的索引，阻塞调用"""
+    try:
+        pack_args = (archive_path, file_sha1(archive_path))
+        with zipfile.ZipFile(archive_path) as zf:
+            names = set(zf.namelist())
+            if MRPACK_INDEX in names:
+                pack = _read_mrpack(zf, pack_args)
+            elif CURSEFORGE_MANIFEST in names:
+                pack = _read_curseforge(zf, pack_args)
+            else:
+                raise ModpackError(f"{archive_path} 中没有 {MRPACK_INDEX} 或 {CURSEFORGE_MANIFEST}")
+            pack.override_paths = _override_paths(zf, pack.override_folders)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise ModpackError(f"无法读取整合包 {archive_path}: {e}") from e
+    except (ValueError, KeyError, TypeError) as e:
+        raise ModpackError(f"整合包索引无效: {e}") from e
+    return pack
+
+
+class CurseForgeAPI:
+    """
+    把 CurseForge 整合包中的 (项目 id, 文件 id) 批量转换为下载地址、sha1 和放置的目录。
+    官方 API 需要 key（默认读取 CURSEFORGE_API_KEY 环境变量），api_url 可以换成兼容的镜像。
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, api_url: str = CURSEFORGE_API_URL,
+                 api_key: Optional[str] = None):
+        self.session = session
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else os.environ.get("CURSEFORGE_API_KEY")
+
+    async def _post(self, path: str, body: Dict) -> List[Dict]:
+        headers = {"Accept": "application/json"}
+        if self.api_key:
+            headers["x-api-key"] = self.api_key
+        try:
+            async with self.session.post(f"{self.api_url}{path}", json=body, headers=headers) as resp:
+                if resp.status in (401, 403):
+                    raise ModpackError("CurseForge API 拒绝访问，请设置 CURSEFORGE_API_KEY")
+                resp.raise_for_status()
+                return (await resp.json())["data"]
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            raise ModpackError(f"查询 CurseForge 文件信息失败: {e}") from e
+
+    async def resolve(self, pack: Modpack):
+        if not pack.curseforge_files:
+            return
+        project_ids = sorted({project_id for project_id, _ in pack.curseforge_files})
+        files, projects = await asyncio.gather(
+            self._post("/v1/mods/files", {"fileIds": [file_id for _, file_id in pack.curseforge_files]}),
+            self._post("/v1/mods", {"modIds": project_ids})
+        )
+        folders = {p["id"]: CURSEFORGE_CLASS_FOLDERS.get(p.get("classId"), "mods") for p in projects}
+        infos = {f["id"]: f for f in files}
+        for project_id, file_id in pack.curseforge_files:
+            info = infos.get(file_id)
+            if info is None:
+                raise ModpackError(f"CurseForge 上找不到文件 {file_id}（项目 {project_id}）")
+            sha1 = next((h["value"] for h in info.get("hashes", []) if h.get("algo") == CURSEFORGE_SHA1), None)
+            url = info.get("downloadUrl") or \
+                f"{CURSEFORGE_EDGE_URL}/{file_id // 1000}/{file_id % 1000}/{quote(info['fileName'])}"
+            pack.files.append(ModpackFile(f"{folders.get(project_id, 'mods')}/{info['fileName']}", [url], sha1,
+                                          size=info.get("fileLength")))
+        pack.curseforge_files = []
+
+
+class ModpackState:
+    """
+    一次导入的进度，中断后再次导入同一个整合包时使用：
+    overrides 是否已全部解压，以及已通过 sha512 校验的文件（按 size、mtime_ns 判断之后是否被修改）。
+    sha1 的校验结果和下载到一半的大文件分别由校验索引和续传日志记录。
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, game_directory: str):
+        self.path = path
+        self.game_directory = game_directory
+        self.overrides_done = False
+        self._verified: Dict[str, list] = {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: str, game_directory: str) -> "ModpackState":
+        state = cls(path, game_directory)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return state
+        # 同一个整合包导入到另一个游戏目录时从头开始
+        if data.get("version") == cls.VERSION and data.get("game_directory") == os.path.abspath(game_directory):
+            state.overrides_done = data.get("overrides_done", False)
+            state._verified = data.get("verified", {})
+        return state
+
+    def is_verified(self, relative: str, st: os.stat_result, sha512: str) -> bool:
+        return self._verified.get(relative) == [st.st_size, st.st_mtime_ns, sha512]
+
+    def record(self, relative: str, st: os.stat_result, sha512: str):
+        self._verified[relative] = [st.st_size, st.st_mtime_ns, sha512]
+        self._dirty = True
+
+    def mark_overrides_done(self):
+        self.overrides_done = True
+        self._dirty = True
+
+    def save(self):
+        """阻塞调用"""
+        if not self._dirty:
+            return
+        data = {"version": self.VERSION, "game_directory": os.path.abspath(self.game_directory),
+                "overrides_done": self.overrides_done, "verified": self._verified}
+        atomic_write_json(self.path, data, separators=(",", ":"))
+        self._dirty = False
+
+
+def _file_sha512(path: str) -> str:
+    sha512 = hashlib.sha512()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha512.update(chunk)
+    return sha512.hexdigest()
+
+
+def _file_crc32(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def extract_overrides(archive_path: str, folders: List[str], game_directory: str,
+                      stop: Optional[threading.Event] = None) -> int:
+    """
+    把 overrides 目录流式解压到游戏目录（逐个文件边解压边写入，不会把整个文件读入内存），阻塞调用。
+    大小和 CRC 都与压缩包中一致的文件跳过，中断后重新解压时已完成的文件不再写入。
+    stop 被设置时在下一个文件之前停止。返回写入的文件数。
+    """
+    written = 0
+    with zipfile.ZipFile(archive_path) as zf:
+        for folder in folders:
+            prefix = f"{folder}/"
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.startswith(prefix):
+                    continue
+                if stop is not None and stop.is_set():
+                    return written
+                target = safe_join(game_directory, info.filename[len(prefix):])
+                if os.path.isfile(target) and os.path.getsize(target) == info.file_size \
+                        and _file_crc32(target) == info.CRC:
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                part_path = f"{target}.part"
+                # 读取到结尾时 zipfile 会检查 CRC，损坏的条目不会替换到目标路径
+                with zf.open(info) as src, open(part_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.replace(part_path, target)
+                written += 1
+    return written
+
+
+class ModpackImport:
+    __slots__ = ("pack", "version_id", "game_directory", "overrides_written", "missing_loader")
+
+    def __init__(self, pack: Modpack, version_id: str, game_directory: str, overrides_written: int,
+                 missing_loader: Optional[str]):
+        self.pack = pack
+        # 启动整合包时使用的版本（加载器版本或原版）
+        self.version_id = version_id
+        self.game_directory = game_directory
+        self.overrides_written = overrides_written
+        # 无法自动安装的加载器（Forge / NeoForge），需要用户用官方安装程序安装
+        self.missing_loader = missing_loader
+
+
+class ModpackInstaller:
+    """
+    导入 Modrinth（.mrpack）和 CurseForge 整合包，一次完成：
+    - 安装整合包需要的游戏版本和 Fabric / Quilt 加载器；
+    - 所有模组等文件交给 Installer 的调度器并发下载，下载时校验 sha1，完成后在线程中校验 sha512（有时）；
+    - 同时在线程中流式解压 overrides。
+    文件按 sha1 去重：包内多个路径使用同一个文件时只下载一次，其余从共享对象库链接；
+    游戏目录中已有、或其他实例已下载到对象库中的文件也不再下载。进度由调度器统计，和安装版本时一样显示。
+    中断后再次导入同一个整合包从上次的进度继续：已完成的文件由校验索引跳过，下载到一半的大文件从续传日志继续，
+    overrides 和 sha512 的进度记录在 ModpackState 中。
+    """
+
+    def __init__(self, installer, curseforge: Optional[CurseForgeAPI] = None):
+        self.installer = installer
+        self.curseforge = curseforge
+
+    def _status(self, info: str):
+        self.installer._status(info)
+
+    async def read(self, archive_path: str) -> Modpack:
+        """读取整合包，CurseForge 整合包同时查询文件信息"""
+        await self.installer.start()
+        pack = await asyncio.to_thread(read_modpack, archive_path)
+        if pack.curseforge_files:
+            if self.curseforge is None:
+                self.curseforge = CurseForgeAPI(self.installer.session)
+            self._status(f"正在查询 {len(pack.curseforge_files)} 个 CurseForge 文件...")
+            await self.curseforge.resolve(pack)
+        return pack
+
+    async def install(self, archive_path: str, minecraft_folder_path: Optional[str] = None,
+                      game_directory: Optional[str] = None) -> ModpackImport:
+        """
+        game_directory 为模组、配置等文件所在的游戏目录（启动时的 --gameDir），默认与 minecraft_folder_path 相同。
+        任一部分失败时其余部分仍会完成，最后抛出第一个错误；再次导入时只处理未完成的部分。
+        """
+        pack = await self.read(archive_path)
+        minecraft_folder_path = minecraft_folder_path or self.installer.minecraft_folder_path
+        game_directory = game_directory or minecraft_folder_path
+        state = await asyncio.to_thread(
+            ModpackState.load, os.path.join(minecraft_folder_path, STATE_FOLDER, f"{pack.archive_sha1}.json"),
+            game_directory
+        )
+        loader_text = " + " + " ".join(filter(None, [pack.loader, pack.loader_version])) if pack.loader else ""
+        self._status(f"正在导入整合包 {pack.name} {pack.version}：{len(pack.files)} 个文件，"
+                     f"游戏版本 {pack.minecraft}{loader_text}")
+        stop = threading.Event()
+        try:
+            results = await asyncio.gather(
+                self._install_version(pack, minecraft_folder_path),
+                self._download_files(pack, game_directory, state),
+                self._extract_overrides(pack, game_directory, state, stop),
+                return_exceptions=True
+            )
+        finally:
+            # 被取消时让解压线程在下一个文件之前结束
+            stop.set()
+            await asyncio.to_thread(state.save)
+            await self.installer.save()
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        (version_id, missing_loader), _, written = results
+        result = ModpackImport(pack, version_id, game_directory, written, missing_loader)
+        if missing_loader:
+            self._status(f"整合包 {pack.name} 导入完成，但需要手动安装 {missing_loader}")
+        else:
+            self._status(f"整合包 {pack.name} 导入完成，启动版本 {version_id}。"
+                         f"{self.installer.scheduler.meter.report()}")
+        return result
+
+    async def _install_version(self, pack: Modpack, minecraft_folder_path: str) -> Tuple[str, Optional[str]]:
+        """返回 (启动版本, 无法自动安装的加载器)"""
+        if pack.loader in SUPPORTED_LOADERS:
+            version_id = await self.installer.install_loader(pack.loader, pack.minecraft, pack.loader_version,
+                                                             minecraft_folder_path)
+            return version_id, None
+        await self.installer.install(pack.minecraft, minecraft_folder_path)
+        missing = " ".join(filter(None, [pack.loader, pack.loader_version])) if pack.loader else None
+        return pack.minecraft, missing
+
+    async def _fetch(self, file: ModpackFile, game_directory: str, state: ModpackState):
+        target = safe_join(game_directory, file.path)
+        error = None
+        for url in file.urls:
+            try:
+                await self.installer.scheduler.download(url, target, expected_sha1=file.sha1,
+                                                        priority=DownloadPriority.MOD, size=file.size)
+                break
+            except Exception as e:
+                error = e
+        else:
+            raise ModpackError(f"下载 {file.path} 失败: {error}")
+        if file.sha512:
+            await self._check_sha512(file, target, state)
+
+    async def _check_sha512(self, file: ModpackFile, target: str, state: ModpackState):
+        st = os.stat(target)
+        if state.is_verified(file.path, st, file.sha512):
+            return
+        actual = await asyncio.to_thread(_file_sha512, target)
+        if actual != file.sha512:
+            os.remove(target)
+            if self.installer.verify_index is not None:
+                self.installer.verify_index.discard(target)
+            raise ModpackError(f"{file.path} 的 SHA512 校验失败 (期望 {file.sha512}，实际 {actual})")
+        state.record(file.path, st, file.sha512)
+
+    async def _download_files(self, pack: Modpack, game_directory: str, state: ModpackState):
+        groups: Dict[str, List[ModpackFile]] = {}
+        for file in pack.files:
+            # overrides 中有同路径的文件时以 overrides 为准
+            if file.path.replace("\\", "/") not in pack.override_paths:
+                groups.setdefault(file.sha1 or file.path, []).append(file)
+
+        async def fetch_group(files: List[ModpackFile]):
+            first, *duplicates = files
+            await self._fetch(first, game_directory, state)
+            # 第一份下载完成后已进入对象库，其余路径直接链接
+            await asyncio.gather(*(self._fetch(f, game_directory, state) for f in duplicates))
+
+        results = await asyncio.gather(*(fetch_group(files) for files in groups.values()), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for error in errors:
+            if isinstance(error, asyncio.CancelledError):
+                raise error
+        if errors:
+            raise ModpackError(f"{len(errors)} 个文件下载失败，再次导入时会继续: {errors[0]}")
+
+    async def _extract_overrides(self, pack: Modpack, game_directory: str, state: ModpackState,
+                                 stop: threading.Event) -> int:
+        if state.overrides_done or not pack.override_paths:
+            return 0
+        written = await asyncio.to_thread(extract_overrides, pack.archive_path, pack.override_folders,
+                                          game_directory, stop)
+        if not stop.is_set():
+            state.mark_overrides_done()
+        return written
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import os.path
+import shutil
+import zipfile
+from typing import Dict, List, Optional
+
+from file_util import atomic_write_json, contained_path
+
+NATIVE_SUFFIXES = (".so", ".dll", ".dylib", ".jnilib")
+
+
+class NativesExtractor:
+    """
+    把 natives jar 解压到 <version>-natives 目录。
+    每个 jar 在线程池中独立解压（多个 jar 并行），成员逐个流式写出；
+    解压记录以 jar 的 sha1 为键保存在 .extracted.json，
+    再次启动时文件都还在就不会重复解压。
+    """
+
+    RECORD_NAME = ".extracted.json"
+
+    def __init__(self, natives_path: str):
+        self.natives_path = natives_path
+        self.record_path = os.path.join(natives_path, self.RECORD_NAME)
+        # jar sha1 -> [[相对路径, 大小], ...]
+        self._record: Dict[str, List[list]] = {}
+        self._lock = asyncio.Lock()
+        self._dirty = False
+        try:
+            with open(self.record_path, "r", encoding="utf-8") as f:
+                self._record = json.load(f)
+        except (OSError, ValueError):
+            self._record = {}
+
+    def is_extracted(self, sha1: str) -> bool:
+        files = self._record.get(sha1)
+        if files is None:
+            return False
+        for rel_path, size in files:
+            try:
+                if os.path.getsize(os.path.join(self.natives_path, rel_path)) != size:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @staticmethod
+    def _member_target(member: str) -> str:
+        # 新格式（natives-xxx）jar 中的动态库位于 linux/x64/org/lwjgl/ 之类的子目录，
+        # 统一放到 natives 目录根下，java.library.path 才能找到
+        if member.lower().endswith(NATIVE_SUFFIXES):
+            return os.path.basename(member)
+        return member
+
+    def _extract_sync(self, jar_path: str, excludes: List[str]) -> List[list]:
+        extracted = []
+        root = os.path.abspath(self.natives_path)
+        with zipfile.ZipFile(jar_path, "r") as zip_ref:
+            for info in zip_ref.infolist():
+                member = info.filename
+                if info.is_dir() or any(member.startswith(exclude) for exclude in excludes):
+                    continue
+                # 防止 ../ 之类的路径写到 natives 目录之外
+                target = contained_path(root, self._member_target(member))
+                if target is None:
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with zip_ref.open(info) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                extracted.append([os.path.relpath(target, root), info.file_size])
+        return extracted
+
+    async def extract(self, jar_path: str, sha1: str, excludes: Optional[List[str]] = None) -> bool:
+        """解压一个 natives jar，已解压过时直接返回 False"""
+        if self.is_extracted(sha1):
+            return False
+        files = await asyncio.to_thread(self._extract_sync, jar_path, excludes or [])
+        async with self._lock:
+            self._record[sha1] = files
+            self._dirty = True
+        return True
+
+    def _save_sync(self, record: Dict[str, List[list]]):
+        atomic_write_json(self.record_path, record)
+
+    async def save(self):
+        async with self._lock:
+            if self._dirty:
+                self._dirty = False
+                await asyncio.to_thread(self._save_sync, dict(self._record))
@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import errno
+import hashlib
+import json
+import os
+import os.path
+import shutil
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from file_util import atomic_write_json
+from verify_index import VerifyIndex
+
+# 链接方式按优先级排列，某种方式因文件系统不支持而失败后不再尝试。
+# reflink 生成的是独立的文件，实例文件被改写时不会影响对象库，所以排在硬链接前面
+LINK_MODES = ["reflink", "hardlink", "symlink", "copy"]
+# 放入对象库的方式。不支持 reflink 时用硬链接，不再多写一份数据；实例文件被原地改写时对象随之变化，
+# 由 materialize 前的校验发现并删除。不用符号链接：实例文件被删除后对象也会失效
+INGEST_MODES = ["reflink", "hardlink", "copy"]
+# 表示“该文件系统/平台不支持这种链接方式”的错误码
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EACCES, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL,
+                       getattr(errno, "ENOTSUP", errno.EOPNOTSUPP)}
+# 保护各个 link_modes 列表的修改
+_link_modes_lock = threading.Lock()
+
+
+def default_store_root() -> str:
+    return os.environ.get("ECL_OBJECT_STORE") or os.path.join(os.path.expanduser("~"), ".easycraftlauncher", "store")
+
+
+def _reflink(src: str, dst: str):
+    """写时复制克隆（Linux 上的 btrfs/xfs 等支持 FICLONE）"""
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink 仅支持 Linux")
+    import fcntl
+    ficlone = 0x40049409
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), ficlone, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+def link_file(src: str, dst: str, link_modes: List[str]) -> str:
+    """
+    按 link_modes 的顺序尝试各种链接方式生成 dst，返回实际使用的方式。
+    因文件系统不支持而失败的方式会从 link_modes 中移除，之后直接跳过。
+    可以在多个线程中共用同一个 link_modes。
+    """
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    tmp_path = f"{dst}.link"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    for mode in list(link_modes):
+        try:
+            if mode == "hardlink":
+                os.link(src, tmp_path)
+            elif mode == "reflink":
+                _reflink(src, tmp_path)
+            elif mode == "symlink":
+                os.symlink(os.path.abspath(src), tmp_path)
+            else:
+                shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, dst)
+            return mode
+        except (OSError, NotImplementedError) as e:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            if mode == "copy":
+                raise
+            if isinstance(e, NotImplementedError) or e.errno in _UNSUPPORTED_ERRNOS:
+                # 该方式在这里不可用，之后直接跳过；多个线程可能同时发现同一种方式不可用
+                with _link_modes_lock:
+                    if mode in link_modes and len(link_modes) > 1:
+                        link_modes.remove(mode)
+    raise OSError(f"无法生成 {dst}")
+
+
+class ObjectStore:
+    """
+    跨 .minecraft 目录共享的内容寻址对象库，以 sha1 为键保存在 <root>/objects/xx/<sha1>。
+    下载完成的文件以 reflink（不支持时硬链接）放入对象库，不会多写一份数据；
+    实例目录中的文件通过 reflink、硬链接、符号链接（依次尝试，最后退回复制）从对象库生成，
+    同一版本第二次安装到新的实例时无需任何网络流量。
+    生成实例文件前先校验对象（stat 未变化时按校验索引跳过），损坏的对象会被删除，改为重新下载。
+    只在与对象库位于同一文件系统的实例上使用，跨文件系统只能复制，会让磁盘占用翻倍。
+    refs.json 记录每个实例文件引用的对象，用于引用计数和垃圾回收。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or default_store_root()
+        self.objects_path = os.path.join(self.root, "objects")
+        self.refs_path = os.path.join(self.root, "refs.json")
+        self.link_modes: List[str] = list(LINK_MODES)
+        self.ingest_modes: List[str] = list(INGEST_MODES)
+        self.verify_index = VerifyIndex(os.path.join(self.root, "verify_index.json"))
+        # 实例文件绝对路径 -> sha1
+        self._refs: Dict[str, str] = {}
+        # 目录 -> 是否与对象库在同一文件系统
+        self._same_device: Dict[str, bool] = {}
+        self._store_device: Optional[int] = None
+        self._dirty = False
+        self._save_lock = asyncio.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.refs_path, "r", encoding="utf-8") as f:
+                self._refs = json.load(f)
+        except (OSError, ValueError):
+            self._refs = {}
+
+    def _save_sync(self, refs: Dict[str, str]):
+        atomic_write_json(self.refs_path, refs, separators=(",", ":"))
+
+    async def save(self):
+        async with self._save_lock:
+            if self._dirty:
+                self._dirty = False
+                await asyncio.to_thread(self._save_sync, dict(self._refs))
+        await self.verify_index.save()
+
+    def object_path(self, sha1: str) -> str:
+        return os.path.join(self.objects_path, sha1[:2], sha1)
+
+    def has(self, sha1: str) -> bool:
+        return os.path.exists(self.object_path(sha1))
+
+    def add_ref(self, target_path: str, sha1: str):
+        key = os.path.abspath(target_path)
+        if self._refs.get(key) != sha1:
+            self._refs[key] = sha1
+            self._dirty = True
+
+    def ref_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for sha1 in self._refs.values():
+            counts[sha1] = counts.get(sha1, 0) + 1
+        return counts
+
+    def same_filesystem(self, path: str) -> bool:
+        """path（可以还不存在）与对象库是否在同一文件系统上，按所在目录缓存"""
+        directory = os.path.dirname(os.path.abspath(path))
+        same = self._same_device.get(directory)
+        if same is not None:
+            return same
+        try:
+            if self._store_device is None:
+                os.makedirs(self.objects_path, exist_ok=True)
+                self._store_device = os.stat(self.objects_path).st_dev
+            existing = directory
+            while not os.path.exists(existing):
+                existing = os.path.dirname(existing)
+            same = os.stat(existing).st_dev == self._store_device
+        except OSError:
+            same = False
+        self._same_device[directory] = same
+        return same
+
+    def _link_sync(self, src: str, dst: str) -> str:
+        return link_file(src, dst, self.link_modes)
+
+    @staticmethod
+    def _check_sync(obj_path: str, sha1: str, size: Optional[int]) -> bool:
+        try:
+            if size is not None and os.path.getsize(obj_path) != size:
+                return False
+            digest = hashlib.sha1()
+            with open(obj_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            return False
+        return digest.hexdigest() == sha1
+
+    def _evict_sync(self, sha1: str):
+        try:
+            os.remove(self.object_path(sha1))
+        except OSError:
+            pass
+
+    async def evict(self, sha1: str):
+        """删除损坏的对象，之后需要它时重新下载"""
+        await asyncio.to_thread(self._evict_sync, sha1)
+        self.verify_index.discard(self.object_path(sha1))
+
+    async def evict_if_linked(self, path: str, sha1: str):
+        """path 校验失败时调用：它与对象共用同一份数据（硬链接或符号链接）时对象也已损坏"""
+        obj_path = self.object_path(sha1)
+        try:
+            linked = os.path.samefile(path, obj_path)
+        except OSError:
+            return
+        if linked:
+            print(f"对象库中的 {sha1} 与损坏的文件共用数据，已删除")
+            await self.evict(sha1)
+
+    async def materialize(self, sha1: str, target_path: str, size: Optional[int] = None) -> Optional[str]:
+        """
+        从对象库生成实例文件并登记引用，返回使用的链接方式。
+        没有该对象、对象已损坏（会被删除）或 target_path 不在同一文件系统上时返回 None，应改为下载。
+        """
+        obj_path = self.object_path(sha1)
+        if not self.has(sha1) or not self.same_filesystem(target_path):
+            return None
+        if not self.verify_index.is_verified(obj_path, sha1):
+            if not await asyncio.to_thread(self._check_sync, obj_path, sha1, size):
+                print(f"对象库中的 {sha1} 已损坏，将重新下载")
+                await self.evict(sha1)
+                return None
+            self.verify_index.record(obj_path, sha1)
+        mode = await asyncio.to_thread(self._link_sync, obj_path, target_path)
+        self.add_ref(target_path, sha1)
+        return mode
+
+    def _ingest_sync(self, path: str, sha1: str):
+        obj_path = self.object_path(sha1)
+        if os.path.exists(obj_path):
+            return
+        os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+        # 同一对象可能被多个线程同时放入，临时文件名互不相同
+        tmp_path = f"{obj_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        link_file(path, tmp_path, self.ingest_modes)
+        os.replace(tmp_path, obj_path)
+
+    async def ingest(self, path: str, sha1: str):
+        """把已校验通过的文件放入对象库并登记引用，与对象库不在同一文件系统上时跳过"""
+        if not self.same_filesystem(path):
+            return
+        if not self.has(sha1):
+            await asyncio.to_thread(self._ingest_sync, path, sha1)
+            self.verify_index.record(self.object_path(sha1), sha1)
+        self.add_ref(path, sha1)
+
+    def _is_live_ref(self, target_path: str, sha1: str) -> bool:
+        obj_path = self.object_path(sha1)
+        if os.path.islink(target_path):
+            return os.path.realpath(target_path) == os.path.realpath(obj_path)
+        if not os.path.exists(target_path):
+            return False
+        try:
+            if os.path.samefile(target_path, obj_path):
+                return True
+        except OSError:
+            return False
+        # reflink 和复制出来的文件无法从 stat 判断来源，只要大小一致就仍视为引用
+        return os.path.getsize(target_path) == os.path.getsize(obj_path)
+
+    def gc(self, dry_run: bool = False) -> tuple:
+        """
+        清理已失效的引用（实例文件被删除或被替换），并删除没有任何引用的对象。
+        返回 (删除的对象数, 释放的字节数)。
+        """
+        live = {}
+        for target_path, sha1 in self._refs.items():
+            if self._is_live_ref(target_path, sha1):
+                live[target_path] = sha1
+        if len(live) != len(self._refs):
+            self._refs = live
+            self._dirty = True
+        referenced = set(live.values())
+        removed = 0
+        freed = 0
+        if os.path.isdir(self.objects_path):
+            for bucket in os.listdir(self.objects_path):
+                bucket_path = os.path.join(self.objects_path, bucket)
+                if not os.path.isdir(bucket_path):
+                    continue
+                for name in os.listdir(bucket_path):
+                    if name in referenced:
+                        continue
+                    obj_path = os.path.join(bucket_path, name)
+                    freed += os.path.getsize(obj_path)
+                    removed += 1
+                    if not dry_run:
+                        os.remove(obj_path)
+        if not dry_run and self._dirty:
+            self._dirty = False
+            self._save_sync(dict(self._refs))
+        return removed, freed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EasyCraftLauncher 共享对象库")
+    parser.add_argument("command", choices=["gc", "stats"])
+    parser.add_argument("--root", default=None, help="对象库目录")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    args = parser.parse_args()
+    store = ObjectStore(args.root)
+    if args.command == "gc":
+        count, size = store.gc(dry_run=args.dry_run)
+        print(f"{'可' if args.dry_run else '已'}删除 {count} 个对象，释放 {size / 1024 / 1024:.1f} MiB")
+    else:
+        counts = store.ref_counts()
+        print(f"对象库 {store.root}: {len(counts)} 个被引用的对象，{sum(counts.values())} 个引用")
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import os.path
+from typing import Dict, List, Optional
+
+import bandwidth
+from file_util import atomic_write_json
+
+# 最近启动过的版本，最新的在前
+RECENT_VERSIONS_FILE = os.path.join("cache", "recent_versions.json")
+MAX_RECENT_VERSIONS = 10
+
+
+def load_recent_versions(minecraft_folder_path: str) -> List[str]:
+    try:
+        with open(os.path.join(minecraft_folder_path, RECENT_VERSIONS_FILE), "r", encoding="utf-8") as f:
+            versions = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [v for v in versions if isinstance(v, str)] if isinstance(versions, list) else []
+
+
+def record_recent_version(minecraft_folder_path: str, version: str):
+    """启动游戏后调用，阻塞调用"""
+    versions = [version] + [v for v in load_recent_versions(minecraft_folder_path) if v != version]
+    path = os.path.join(minecraft_folder_path, RECENT_VERSIONS_FILE)
+    try:
+        atomic_write_json(path, versions[:MAX_RECENT_VERSIONS])
+    except OSError as e:
+        print(f"写入最近使用的版本失败: {e}")
+
+
+class Prefetcher:
+    """
+    空闲时的后台预下载：用缓存清单中的最新正式版、最新快照和最近启动过的版本，提前下载并校验。
+    清单中有的版本走完整安装（已有的文件按校验索引跳过），其余版本（加载器等）只校验并修复。
+    所有下载都按后台流量进行。前台安装开始时立即让出：进行中的后台下载由调度器中止，
+    正在预下载的版本也被放弃，前台全部结束后重新开始这个版本，已完成的文件不会重复下载，下载到一半的从续传日志继续。
+    """
+
+    def __init__(self, installer, minecraft_folder_path: Optional[str] = None, recent: int = 3,
+                 include_snapshot: bool = True):
+        self.installer = installer
+        self.minecraft_folder_path = minecraft_folder_path or installer.minecraft_folder_path
+        self.recent = recent
+        self.include_snapshot = include_snapshot
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def targets(self) -> List[str]:
+        latest = self.installer.manifest.latest
+        versions = [latest.get("release")]
+        if self.include_snapshot:
+            versions.append(latest.get("snapshot"))
+        versions += load_recent_versions(self.minecraft_folder_path)[:self.recent]
+        return [v for v in dict.fromkeys(versions) if v]
+
+    async def run(self) -> Dict[str, Optional[Exception]]:
+        """依次预下载各个版本，返回 {版本: None 或失败原因}"""
+        await self.installer.start()
+        # 只用缓存的清单，没有缓存时才联网
+        await self.installer.manifest.get()
+        results = {}
+        for version in self.targets():
+            try:
+                await self._prefetch_when_idle(version)
+                results[version] = None
+            except Exception as e:
+                print(f"预下载 {version} 失败: {e}")
+                results[version] = e
+        await self.installer.save()
+        return results
+
+    async def _prefetch(self, version: str):
+        with bandwidth.background():
+            if self.installer.manifest.get_version(version) is not None:
+                await self.installer.install(version, self.minecraft_folder_path)
+            else:
+                await self.installer.verify(version, minecraft_folder_path=self.minecraft_folder_path)
+
+    async def _prefetch_when_idle(self, version: str):
+        scheduler = self.installer.scheduler
+        while True:
+            await scheduler.wait_foreground_idle()
+            task = asyncio.create_task(self._prefetch(version))
+            busy = asyncio.create_task(scheduler.wait_foreground_busy())
+            try:
+                await asyncio.wait({task, busy}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                busy.cancel()
+                if not task.done():
+                    task.cancel()
+                await asyncio.gather(busy, task, return_exceptions=True)
+            if not task.cancelled():
+                return task.result()
+
+    def start(self) -> asyncio.Task:
+        if not self.running:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
@@ -0,0 +1,93 @@
+"""
+启动耗时分析。main.py 在导入界面模块之前创建 StartupProfiler，依次记录各阶段耗时，直到窗口首次绘制。
+设置 ECL_STARTUP_PROFILE 环境变量时输出结果：为 1 时打印到标准错误，为文件路径时保存为 JSON；
+同时设置 ECL_STARTUP_QUIT=1 时窗口可以交互后立即退出，供 benchmark.py startup 使用。
+"""
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 启动阶段不应导入的模块，导入了说明有页面或网络初始化没有延迟
+DEFERRED_MODULES = ("aiohttp", "aiofiles", "installer", "launcher", "integrity", "game_log")
+
+
+def process_age() -> Optional[float]:
+    """进程已运行的秒数（包括解释器自身的启动），只在 Linux 上可用"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            stat = f.read()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        # 第 22 个字段是进程启动时间（开机后的时钟周期数），进程名可能带空格，从最后一个 ) 之后数
+        start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+# main.py 最先导入本模块，以导入的时刻作为开始执行 main.py 的时刻
+_MAIN_STARTED = time.perf_counter()
+# 开始执行 main.py 之前已经过去的时间（解释器启动），/proc 的精度为 10 毫秒
+_INTERPRETER_TIME = process_age()
+
+
+class StartupProfiler:
+    def __init__(self):
+        self._origin = _MAIN_STARTED
+        self._last = self._origin
+        self.interpreter_time = _INTERPRETER_TIME
+        self.phases: List[Tuple[str, float]] = []
+        self.finished = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(os.environ.get("ECL_STARTUP_PROFILE"))
+
+    @property
+    def quit_after_start(self) -> bool:
+        return os.environ.get("ECL_STARTUP_QUIT") == "1"
+
+    def mark(self, phase: str):
+        """记录从上一个标记到现在的耗时，归入 phase"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self) -> Dict:
+        since_main = self._last - self._origin
+        return {
+            "interpreter_ms": self.interpreter_time * 1000 if self.interpreter_time is not None else None,
+            "phases_ms": {phase: elapsed * 1000 for phase, elapsed in self.phases},
+            "since_main_ms": since_main * 1000,
+            "since_process_start_ms": (since_main + (self.interpreter_time or 0.0)) * 1000,
+            # 绝对时间，基准测试用它计算从创建子进程开始的耗时
+            "finished_at": time.time() - (time.perf_counter() - self._last),
+            "modules": len(sys.modules),
+            "deferred_modules_loaded": [name for name in DEFERRED_MODULES if name in sys.modules],
+        }
+
+    def finish(self) -> Optional[Dict]:
+        """启动完成时调用一次；没有启用时只返回 None"""
+        if self.finished:
+            return None
+        self.finished = True
+        if not self.enabled:
+            return None
+        result = self.report()
+        target = os.environ["ECL_STARTUP_PROFILE"]
+        if target == "1":
+            if result["interpreter_ms"] is not None:
+                print(f"[Startup] 解释器启动 {result['interpreter_ms']:.0f} ms", file=sys.stderr)
+            for phase, elapsed in result["phases_ms"].items():
+                print(f"[Startup] {phase:12s} {elapsed:8.1f} ms", file=sys.stderr)
+            print(f"[Startup] 从进程启动到可以交互共 {result['since_process_start_ms']:.0f} ms，"
+                  f"已导入 {result['modules']} 个模块", file=sys.stderr)
+            if result["deferred_modules_loaded"]:
+                print(f"[Startup] 启动时导入了应延迟的模块: {', '.join(result['deferred_modules_loaded'])}",
+                      file=sys.stderr)
+        else:
+            with open(target, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+        return result
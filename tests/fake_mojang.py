@@ -0,0 +1,245 @@
+"""
+模拟 Mojang 下载接口的本地服务器，测试和 benchmark.py 共用。
+可以设置延迟、带宽上限、错误率和传输中途断开的比例，并统计请求数、流量和连接数。
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from asset_planner import ASSETS_BASE_URL
+
+VERSION_ID = "bench-1.0"
+ASSET_INDEX_ID = "bench"
+
+class ServerConfig:
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0, error_rate: float = 0.0,
+                 disconnect_rate: float = 0.0, seed: int = 1):
+        # 每个请求额外的延迟（秒）
+        self.latency = latency
+        # 所有连接共享的带宽上限（字节/秒），0 表示不限
+        self.bandwidth = bandwidth
+        # 返回 503 的请求比例
+        self.error_rate = error_rate
+        # 发送到一半时断开连接的响应比例
+        self.disconnect_rate = disconnect_rate
+        self.seed = seed
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+
+class FakeMojangServer:
+    """
+    模拟 Mojang 下载接口的本地服务器，支持 Range / If-Range、ETag / If-None-Match。
+    所有内容在启动时按种子生成并保存在内存中，同样的参数每次生成的文件完全相同。
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, config: ServerConfig, assets: int = 2000, libraries: int = 60,
+                 large_libraries: int = 2, client_size: int = 24 * 1024 * 1024,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.assets = assets
+        self.libraries = libraries
+        self.large_libraries = large_libraries
+        self.client_size = client_size
+        self.host = host
+        self.port = port
+        self.base_url = ""
+        self.blobs: Dict[str, bytes] = {}
+        self.etags: Dict[str, str] = {}
+        self._rng = random.Random(config.seed)
+        self._bandwidth_next = 0.0
+        self._runner: Optional[web.AppRunner] = None
+        self._connections: set = set()
+        self.stats: Dict[str, int] = {}
+        # 模拟 CurseForge API：文件 id -> 文件信息，项目 id -> 项目信息
+        self.curseforge_files: Dict[int, Dict] = {}
+        self.curseforge_projects: Dict[int, Dict] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self._connections.clear()
+        self.stats = {"requests": 0, "bytes_sent": 0, "connections": 0, "errors_injected": 0,
+                      "disconnects_injected": 0, "not_modified": 0, "partial": 0}
+
+    @property
+    def content_bytes(self) -> int:
+        """一次完整安装需要下载的字节数（资源按哈希去重）"""
+        return sum(len(b) for p, b in self.blobs.items() if p != "/mc/game/version_manifest_v2.json")
+
+    def add(self, path: str, data: bytes) -> Dict:
+        """在 path 上提供 data，返回 {"url", "sha1", "size"}"""
+        self.blobs[path] = data
+        sha1 = hashlib.sha1(data).hexdigest()
+        self.etags[path] = f'"{sha1}"'
+        return {"url": f"{self.base_url}{path}", "sha1": sha1, "size": len(data)}
+
+    def _build(self):
+        rng = random.Random(self.config.seed)
+        self.blobs.clear()
+        self.etags.clear()
+
+        # 资源：大多是几 KB 的小文件，少数几百 KB；约 5% 的名字共用同一个对象
+        objects = {}
+        hashes: List[tuple] = []
+        for i in range(self.assets):
+            if hashes and rng.random() < 0.05:
+                hash_, size = rng.choice(hashes)
+            else:
+                size = rng.choice([rng.randint(200, 8 * 1024)] * 9 + [rng.randint(64 * 1024, 512 * 1024)])
+                data = rng.randbytes(size)
+                hash_ = hashlib.sha1(data).hexdigest()
+                self.add(f"/resources/{hash_[:2]}/{hash_}", data)
+                hashes.append((hash_, size))
+            objects[f"minecraft/bench/{i}.ogg"] = {"hash": hash_, "size": size}
+        asset_index = self.add(f"/v1/packages/{ASSET_INDEX_ID}.json", json.dumps({"objects": objects}).encode())
+
+        libraries = []
+        for i in range(self.libraries + self.large_libraries):
+            size = 12 * 1024 * 1024 if i >= self.libraries else rng.randint(20 * 1024, 2 * 1024 * 1024)
+            path = f"bench/lib{i}/1.0/lib{i}-1.0.jar"
+            artifact = self.add(f"/libraries/{path}", rng.randbytes(size))
+            libraries.append({"name": f"bench:lib{i}:1.0", "downloads": {"artifact": {"path": path, **artifact}}})
+
+        client = self.add(f"/v1/objects/{VERSION_ID}/client.jar", rng.randbytes(self.client_size))
+        version_json = {
+            "id": VERSION_ID, "type": "release", "mainClass": "net.minecraft.client.main.Main",
+            "assets": ASSET_INDEX_ID, "assetIndex": {"id": ASSET_INDEX_ID, "totalSize": 0, **asset_index},
+            "downloads": {"client": client}, "libraries": libraries,
+            "arguments": {"game": ["--version", "${version_name}"], "jvm": ["-cp", "${classpath}"]},
+        }
+        version = self.add(f"/v1/packages/{VERSION_ID}.json", json.dumps(version_json).encode())
+        manifest = {
+            "latest": {"release": VERSION_ID, "snapshot": VERSION_ID},
+            "versions": [{"id": VERSION_ID, "type": "release", "url": version["url"], "sha1": version["sha1"],
+                          "time": "2024-01-01T00:00:00+00:00", "releaseTime": "2024-01-01T00:00:00+00:00"}],
+        }
+        self.add("/mc/game/version_manifest_v2.json", json.dumps(manifest).encode())
+
+    async def _throttle(self, size: int):
+        """所有连接共享一条时间线，按带宽上限给每个数据块排队"""
+        if not self.config.bandwidth:
+            return
+        now = time.monotonic()
+        start = max(now, self._bandwidth_next)
+        self._bandwidth_next = start + size / self.config.bandwidth
+        delay = self._bandwidth_next - now
+        if delay > 0.001:
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _parse_range(header: str, length: int) -> Optional[tuple]:
+        if not header.startswith("bytes=") or "," in header:
+            return None
+        start_text, _, end_text = header[6:].partition("-")
+        try:
+            if not start_text:
+                start, end = max(0, length - int(end_text)), length - 1
+            else:
+                start = int(start_text)
+                end = min(int(end_text), length - 1) if end_text else length - 1
+        except ValueError:
+            return None
+        return (start, end) if start <= end < length else None
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        if request.transport not in self._connections:
+            self._connections.add(request.transport)
+            self.stats["connections"] += 1
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+        body = self.blobs.get(request.path)
+        if body is None:
+            return web.Response(status=404)
+        if self._rng.random() < self.config.error_rate:
+            self.stats["errors_injected"] += 1
+            return web.Response(status=503)
+        etag = self.etags[request.path]
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+
+        start, end, status = 0, len(body) - 1, 200
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == etag):
+            parsed = self._parse_range(range_header, len(body))
+            if parsed is None:
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{len(body)}"})
+            start, end = parsed
+            status = 206
+            self.stats["partial"] += 1
+        headers = {"ETag": etag, "Accept-Ranges": "bytes", "Content-Length": str(end - start + 1),
+                   "Content-Type": "application/octet-stream"}
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+        resp = web.StreamResponse(status=status, headers=headers)
+        data = memoryview(body)[start:end + 1]
+        cut = None
+        if len(data) > self.CHUNK_SIZE and self._rng.random() < self.config.disconnect_rate:
+            cut = self._rng.randint(self.CHUNK_SIZE, len(data) - 1)
+        try:
+            await resp.prepare(request)
+            for offset in range(0, len(data), self.CHUNK_SIZE):
+                if cut is not None and offset >= cut:
+                    self.stats["disconnects_injected"] += 1
+                    request.transport.close()
+                    return resp
+                chunk = data[offset:offset + self.CHUNK_SIZE]
+                await self._throttle(len(chunk))
+                await resp.write(chunk)
+                self.stats["bytes_sent"] += len(chunk)
+            await resp.write_eof()
+        except ConnectionError:
+            # 客户端断开（例如 resume 场景中模拟崩溃）
+            pass
+        return resp
+
+    async def _handle_curseforge(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        body = await request.json()
+        if request.path == "/v1/mods/files":
+            data = [self.curseforge_files[i] for i in body.get("fileIds", []) if i in self.curseforge_files]
+        else:
+            data = [self.curseforge_projects[i] for i in body.get("modIds", []) if i in self.curseforge_projects]
+        return web.json_response({"data": data})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/v1/mods/files", self._handle_curseforge)
+        app.router.add_post("/v1/mods", self._handle_curseforge)
+        app.router.add_get("/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{self.host}:{self.port}"
+        self._build()
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def local_installer(server_url: str, minecraft_folder_path: str, store: str, concurrency: int, **kwargs):
+    """从本地模拟服务器安装的 Installer，kwargs 传给 Installer"""
+    from installer import Installer
+    from mirrors import Mirror, MirrorSelector
+
+    manifest_url = f"{server_url}/mc/game/version_manifest_v2.json"
+    mirrors = MirrorSelector([Mirror("bench", {ASSETS_BASE_URL: f"{server_url}/resources"})],
+                             probe_url=manifest_url)
+    return Installer(minecraft_folder_path, max_concurrency=concurrency, per_host_limit=min(16, concurrency),
+                     object_store_root=store, manifest_url=manifest_url, install_java=False, mirrors=mirrors,
+                     **kwargs)
@@ -0,0 +1,84 @@
+"""测试共用的本地服务器（fake_mojang.FakeMojangServer）和下载器"""
+import asyncio
+import hashlib
+import os.path
+import sys
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import aiohttp
+
+from downloader import SmartDownloader
+from fake_mojang import FakeMojangServer, ServerConfig
+
+CRASH_EXIT_CODE = 75
+# 在子进程中下载，收到 crash_after 字节后直接退出，不做任何清理
+CRASH_SCRIPT = """
+import asyncio, os, sys
+sys.path[:0] = {paths!r}
+from helpers import downloader
+
+async def main():
+    async with downloader() as d:
+        task = asyncio.create_task(d.download({url!r}, {target!r}, expected_sha1={sha1!r}, expected_size={size}))
+        while d.metrics.bytes_received < {crash_after} and not task.done():
+            await asyncio.sleep(0.005)
+        os._exit({code})
+
+asyncio.run(main())
+"""
+
+
+@asynccontextmanager
+async def fake_server(config: Optional[ServerConfig] = None, assets: int = 20, libraries: int = 2,
+                      large_libraries: int = 0, client_size: int = 256 * 1024):
+    server = FakeMojangServer(config or ServerConfig(), assets, libraries, large_libraries, client_size)
+    await server.start()
+    try:
+        yield server
+    finally:
+        await server.stop()
+
+
+@asynccontextmanager
+async def downloader(**kwargs):
+    async with aiohttp.ClientSession() as session:
+        yield SmartDownloader(session, **kwargs)
+
+
+def sha1_of(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def corrupt(path: str, offset: int = 0):
+    """原地改写一个字节，inode 不变"""
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+async def crash_download(info: Dict, target: str, crash_after: int):
+    """模拟进程崩溃：子进程下载 info 描述的文件，收到 crash_after 字节后立即退出"""
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    script = CRASH_SCRIPT.format(paths=[tests_dir, os.path.dirname(tests_dir)], url=info["url"], target=target,
+                                 sha1=info["sha1"], size=info["size"], crash_after=crash_after,
+                                 code=CRASH_EXIT_CODE)
+    process = await asyncio.create_subprocess_exec(sys.executable, "-c", script)
+    assert await process.wait() == CRASH_EXIT_CODE
+
+
+async def cancel_download(info: Dict, target: str, received: int):
+    """下载到 received 字节后取消，留下 .part 和续传日志"""
+    async with downloader() as d:
+        task = asyncio.create_task(d.download(info["url"], target, expected_sha1=info["sha1"],
+                                              expected_size=info["size"]))
+        while d.metrics.bytes_received < received:
+            await asyncio.sleep(0.005)
+        # 与 DownloadScheduler 相同，Python 3.11 的 wait_for 可能吞掉取消，重复取消直到下载真正停止
+        while not task.done():
+            task.cancel()
+            await asyncio.wait({task}, timeout=0.05)
+    assert task.cancelled()
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import json
+import os
+import os.path
+
+from asset_layout import AssetLayout, game_assets_path
+from fake_mojang import local_installer
+from helpers import fake_server
+
+
+def _publish_index(server, index_id: str, files: dict, **flags) -> dict:
+    """在服务器上提供资源对象和索引，files 为 {资源名: 内容}"""
+    objects = {}
+    for name, data in files.items():
+        sha1 = hashlib.sha1(data).hexdigest()
+        server.add(f"/resources/{sha1[:2]}/{sha1}", data)
+        objects[name] = {"hash": sha1, "size": len(data)}
+    return server.add(f"/indexes/{index_id}.json", json.dumps({"objects": objects, **flags}).encode())
+
+
+async def _install_index(installer, root: str, index_id: str, info: dict, game_directory: str):
+    await installer.download_assets_index(info["url"], info["sha1"], os.path.join(root, "assets", "objects"),
+                                          os.path.join(root, "assets", "indexes", f"{index_id}.json"),
+                                          game_directory)
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _record(root: str) -> dict:
+    with open(os.path.join(root, AssetLayout.RECORD_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_legacy_virtual_layout(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as server:
+            root = str(tmp_path / ".minecraft")
+            game_directory = str(tmp_path / "instance")
+            virtual = os.path.join(root, "assets", "virtual", "legacy")
+            files = {"sounds/step/grass1.ogg": b"grass", "sounds/step/grass2.ogg": b"grass",
+                     "lang/en_US.lang": b"en", "icons/icon_16x16.png": b"icon", "../escape.txt": b"evil"}
+            async with local_installer(server.base_url, root, str(tmp_path / "store"), 8) as installer:
+                await _install_index(installer, root, "legacy",
+                                     _publish_index(server, "legacy", files, virtual=True), game_directory)
+                for name, data in files.items():
+                    if name != "../escape.txt":
+                        assert _read(os.path.join(virtual, name)) == data
+                # 不在展开目录之内的名字被跳过
+                assert not os.path.exists(os.path.join(root, "assets", "virtual", "escape.txt"))
+                record = _record(virtual)
+                assert sorted(record) == sorted(n for n in files if n != "../escape.txt")
+                assert record["sounds/step/grass1.ogg"] == record["sounds/step/grass2.ogg"]
+                assert game_assets_path(root, "legacy", game_directory) == virtual
+
+                # 索引更新：删除一个名字、修改一个名字，未变化的文件不重新生成
+                unchanged = os.stat(os.path.join(virtual, "icons/icon_16x16.png")).st_ino
+                updated = {"sounds/step/grass1.ogg": b"grass", "lang/en_US.lang": b"en-2",
+                           "icons/icon_16x16.png": b"icon"}
+                await _install_index(installer, root, "legacy",
+                                     _publish_index(server, "legacy", updated, virtual=True), game_directory)
+                assert not os.path.exists(os.path.join(virtual, "sounds/step/grass2.ogg"))
+                assert _read(os.path.join(virtual, "lang/en_US.lang")) == b"en-2"
+                assert os.stat(os.path.join(virtual, "icons/icon_16x16.png")).st_ino == unchanged
+                assert sorted(_record(virtual)) == sorted(updated)
+
+    asyncio.run(main())
+
+
+def test_pre_1_6_resources_layout(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as server:
+            root = str(tmp_path / ".minecraft")
+            game_directory = str(tmp_path / "instance")
+            files = {"sound/random/click.ogg": b"click", "music/calm1.ogg": b"calm"}
+            async with local_installer(server.base_url, root, str(tmp_path / "store"), 8) as installer:
+                await _install_index(installer, root, "pre-1.6",
+                                     _publish_index(server, "pre-1.6", files, map_to_resources=True),
+                                     game_directory)
+            resources = os.path.join(game_directory, "resources")
+            for name, data in files.items():
+                assert _read(os.path.join(resources, name)) == data
+            assert sorted(_record(resources)) == sorted(files)
+            assert not os.path.exists(os.path.join(root, "assets", "virtual"))
+            assert game_assets_path(root, "pre-1.6", game_directory) == resources
+
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+import os.path
+
+from asset_index import AssetIndex
+from asset_planner import AssetPlanner
+from fake_mojang import ASSET_INDEX_ID, VERSION_ID, local_installer
+from helpers import fake_server, sha1_of
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_only_missing_hashes_are_scheduled(tmp_path, monkeypatch):
+    async def main():
+        async with fake_server(assets=300, libraries=1) as server:
+            root = str(tmp_path / ".minecraft")
+            objects_path = os.path.join(root, "assets", "objects")
+            objects = json.loads(server.blobs[f"/v1/packages/{ASSET_INDEX_ID}.json"])["objects"]
+            hashes = sorted({info["hash"] for info in objects.values()})
+            present, missing = hashes[::2], hashes[1::2]
+            for hash_ in present:
+                _write(os.path.join(objects_path, hash_[:2], hash_), server.blobs[f"/resources/{hash_[:2]}/{hash_}"])
+            # 中断留下的 .part 不算已存在
+            _write(os.path.join(objects_path, missing[0][:2], f"{missing[0]}.part"), b"partial")
+
+            listed = []
+            listdir = os.listdir
+
+            def counting_listdir(path):
+                if os.path.dirname(path) == objects_path:
+                    listed.append(path)
+                return listdir(path)
+
+            monkeypatch.setattr(os, "listdir", counting_listdir)
+            async with local_installer(server.base_url, root, str(tmp_path / "store"), 16) as installer:
+                scheduled = []
+                submit = installer.scheduler.submit
+
+                def recording_submit(url, target_path, *args, **kwargs):
+                    if os.path.dirname(os.path.dirname(target_path)) == objects_path:
+                        scheduled.append(os.path.basename(target_path))
+                    return submit(url, target_path, *args, **kwargs)
+
+                installer.scheduler.submit = recording_submit
+                await installer.install(VERSION_ID)
+            # 每个对象目录只列一次，而不是每个对象 stat 一次
+            assert len(listed) == 256
+            assert sorted(scheduled) == missing
+            for hash_ in missing:
+                assert sha1_of(os.path.join(objects_path, hash_[:2], hash_)) == hash_
+
+    asyncio.run(main())
+
+
+def test_plan_merges_indexes_and_updates_incrementally(tmp_path, monkeypatch):
+    objects_path = str(tmp_path / "objects")
+    first = {f"{i:02x}" + "a" * 38: 100 + i for i in range(8)}
+    second = dict(list(first.items())[4:], **{"ff" + "b" * 38: 7})
+    index_paths = []
+    for name, hashes in (("first", first), ("second", second)):
+        index_paths.append(str(tmp_path / f"{name}.json"))
+        with open(index_paths[-1], "w", encoding="utf-8") as f:
+            json.dump({"objects": {f"minecraft/{h}": {"hash": h, "size": s} for h, s in hashes.items()}}, f)
+    for hash_ in list(first)[:3]:
+        _write(os.path.join(objects_path, hash_[:2], hash_), b"x")
+
+    planner = AssetPlanner(objects_path)
+    plan = planner.plan_files_sync(index_paths)
+    assert (plan.names, plan.unique, plan.present) == (13, 9, 3)
+    assert sorted(plan.missing) == sorted(list(first)[3:] + ["ff" + "b" * 38])
+    assert plan.missing_bytes == sum(list(first.values())[3:]) + 7
+
+    # 之后的规划使用内存中的目录列表，下载完成的对象通过 mark_present 登记
+    def no_listdir(path):
+        raise AssertionError(f"不应重新列目录: {path}")
+
+    monkeypatch.setattr(os, "listdir", no_listdir)
+    for hash_ in list(first)[3:6]:
+        planner.mark_present(hash_)
+    plan = asyncio.run(planner.plan([AssetIndex.load(path) for path in index_paths]))
+    assert plan.present == 6
+    # 强制校验时全部列为缺失
+    assert len(planner.plan_sync([AssetIndex.load(index_paths[0])], trust_disk=False).missing) == 8
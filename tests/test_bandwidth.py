@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+
+from bandwidth import BandwidthLimiter, is_background
+from fake_mojang import VERSION_ID, local_installer
+from helpers import fake_server
+from prefetch import Prefetcher
+
+MIB = 1024 * 1024
+
+
+class _CountingLimiter(BandwidthLimiter):
+    """统计后台流量，以及前台下载进行期间仍在进行的后台流量"""
+
+    def __init__(self, rate: float, background_rate: float):
+        super().__init__(rate, background_rate)
+        self.scheduler = None
+        self.background_bytes = 0
+        self.background_during_foreground = 0
+
+    async def acquire(self, size: int) -> float:
+        if is_background():
+            self.background_bytes += size
+            if self.scheduler is not None and self.scheduler.foreground_active:
+                self.background_during_foreground += size
+        return await super().acquire(size)
+
+
+def test_rate_limit_accuracy(tmp_path):
+    async def main():
+        cap = 4 * MIB
+        async with fake_server(assets=100, libraries=4, client_size=6 * MIB) as server:
+            async with local_installer(server.base_url, str(tmp_path / ".minecraft"), str(tmp_path / "store"), 16,
+                                       rate_limit=cap) as installer:
+                started = time.perf_counter()
+                await installer.install(VERSION_ID)
+                elapsed = time.perf_counter() - started
+                received = installer.metrics.bytes_received
+            assert received >= server.content_bytes
+            # 多个连接同时下载时总速率仍在上限附近；只允许开始时 0.1 秒的突发
+            assert 0.8 <= received / elapsed / cap <= 1.1
+
+    asyncio.run(main())
+
+
+def test_background_prefetch_yields_to_foreground(tmp_path):
+    async def main():
+        async with fake_server(assets=100, libraries=1, client_size=4 * MIB) as server:
+            root = str(tmp_path / ".minecraft")
+            installer = local_installer(server.base_url, root, str(tmp_path / "store"), 16)
+            limiter = installer.limiter = _CountingLimiter(4 * MIB, 2 * MIB)
+            async with installer:
+                limiter.scheduler = installer.scheduler
+                prefetcher = Prefetcher(installer, os.path.join(root, "background"), recent=0)
+                prefetch_task = prefetcher.start()
+                await asyncio.sleep(0.3)
+                # 后台按自己的限速进行，还没有下载完
+                assert 0 < limiter.background_bytes < server.content_bytes / 2
+
+                started = time.perf_counter()
+                await installer.install(VERSION_ID, os.path.join(root, "foreground"))
+                foreground_time = time.perf_counter() - started
+                assert prefetcher.running
+                results = await asyncio.wait_for(prefetch_task, 30)
+            assert results == {VERSION_ID: None}
+            # 前台在总限速下下载了一秒以上；后台不让出时这段时间能拿到远多于 512 KiB 的数据，
+            # 让出后只剩取消生效前已读到的少量数据（与 benchmark.py ratelimit 的 --slack-kb 默认值相同）
+            assert foreground_time > 1
+            assert limiter.background_during_foreground <= 512 * 1024
+
+    asyncio.run(main())
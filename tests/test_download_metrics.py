@@ -0,0 +1,43 @@
+import json
+import os
+
+from download_metrics import DownloadMetrics, LatencyHistogram
+
+
+def test_ttfb_histogram():
+    histogram = LatencyHistogram()
+    for ms in [5] * 50 + [40] * 40 + [300] * 9 + [20000]:
+        histogram.add(ms / 1000)
+    assert histogram.total == 100
+    assert histogram.percentile(0.5) == 10
+    assert histogram.percentile(0.9) == 50
+    assert histogram.percentile(0.99) == 500
+    assert histogram.percentile(1.0) == float("inf")
+    buckets = histogram.to_dict()["buckets"]
+    assert buckets["<=10ms"] == 50 and buckets["<=50ms"] == 40 and buckets[">10000ms"] == 1
+
+
+def test_trace_is_batched_and_ordered(tmp_path):
+    trace_path = str(tmp_path / "trace.jsonl")
+    metrics = DownloadMetrics(trace_path)
+    metrics.TRACE_BATCH = 100
+    metrics.on_response("http://a.example/x", 0.02, 200)
+    metrics.on_response("http://b.example/y", 0.2, 200)
+    metrics.on_retry("http://b.example/y", "503")
+    # 未攒够一批时不写文件
+    assert not os.path.exists(trace_path)
+    for i in range(300):
+        metrics.on_bytes(1000)
+        metrics.on_complete(f"http://a.example/{i}", 1000, 0.01)
+    metrics.on_failure("http://b.example/y", "503")
+    metrics.close(wait=True)
+
+    with open(trace_path, "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f]
+    assert [e["event"] for e in events[:3]] == ["response", "response", "retry"]
+    assert [e["url"] for e in events[3:303]] == [f"http://a.example/{i}" for i in range(300)]
+    assert [e["event"] for e in events[303:]] == ["failure", "summary"]
+    summary = events[-1]
+    assert summary["files_completed"] == 300 and summary["files_failed"] == 1 and summary["retries"] == 1
+    assert summary["bytes_received"] == 300 * 1000
+    assert summary["ttfb"]["a.example"]["count"] == 1 and summary["ttfb"]["b.example"]["buckets"]["<=250ms"] == 1
@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os.path
+
+from download_scheduler import DownloadPriority, DownloadScheduler
+from fake_mojang import ASSET_INDEX_ID, VERSION_ID
+from helpers import downloader, fake_server, sha1_of
+
+
+def test_asset_index_with_4000_objects(tmp_path):
+    async def main():
+        async with fake_server(assets=4000) as server:
+            objects = json.loads(server.blobs[f"/v1/packages/{ASSET_INDEX_ID}.json"])["objects"]
+            unique = {info["hash"] for info in objects.values()}
+            async with downloader() as d:
+                scheduler = DownloadScheduler(d, max_concurrency=64, per_host_limit=16)
+                results = await asyncio.gather(*(
+                    scheduler.submit(f"{server.base_url}/resources/{info['hash'][:2]}/{info['hash']}",
+                                     str(tmp_path / "objects" / info["hash"][:2] / info["hash"]),
+                                     expected_sha1=info["hash"], size=info["size"])
+                    for info in objects.values()
+                ))
+                await scheduler.close()
+                retries = d.metrics.snapshot()["retries"]
+            assert all(results)
+            assert retries == 0
+            # 同一对象只下载一次，同时打开的连接不超过单主机上限
+            assert scheduler.meter.files_done == len(unique)
+            assert server.stats["requests"] == len(unique)
+            assert server.stats["connections"] <= 16
+            for sha1 in list(unique)[:200]:
+                assert sha1_of(str(tmp_path / "objects" / sha1[:2] / sha1)) == sha1
+
+    asyncio.run(main())
+
+
+def test_client_and_libraries_go_before_assets(tmp_path):
+    async def main():
+        async with fake_server(assets=50, libraries=3) as server:
+            version = json.loads(server.blobs[f"/v1/packages/{VERSION_ID}.json"])
+            objects = json.loads(server.blobs[f"/v1/packages/{ASSET_INDEX_ID}.json"])["objects"]
+            finished = []
+            async with downloader() as d:
+                scheduler = DownloadScheduler(d, max_concurrency=1)
+
+                def submit(name: str, url: str, sha1: str, priority: int):
+                    future = scheduler.submit(url, str(tmp_path / name / sha1), expected_sha1=sha1, priority=priority)
+                    future.add_done_callback(lambda _: finished.append(name))
+                    return future
+
+                # 资源先提交，客户端和库后提交
+                futures = [submit("asset", f"{server.base_url}/resources/{info['hash'][:2]}/{info['hash']}",
+                                  info["hash"], DownloadPriority.ASSET) for info in objects.values()]
+                futures += [submit("library", lib["downloads"]["artifact"]["url"], lib["downloads"]["artifact"]["sha1"],
+                                   DownloadPriority.LIBRARY) for lib in version["libraries"]]
+                client = version["downloads"]["client"]
+                futures.append(submit("client", client["url"], client["sha1"], DownloadPriority.CLIENT))
+                await asyncio.gather(*futures)
+                await scheduler.close()
+            assert finished[:4] == ["client", "library", "library", "library"]
+            assert set(finished[4:]) == {"asset"}
+
+    asyncio.run(main())
@@ -0,0 +1,27 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from fake_mojang import ServerConfig
+from helpers import downloader, fake_server
+
+
+@pytest.mark.parametrize("config, wrong_sha1", [(ServerConfig(error_rate=1.0), False), (ServerConfig(), True)])
+def test_retries_are_bounded(tmp_path, config, wrong_sha1):
+    async def main():
+        async with fake_server(config) as server:
+            info = server.add("/data/lib.jar", os.urandom(64 * 1024))
+            sha1 = hashlib.sha1(b"other").hexdigest() if wrong_sha1 else info["sha1"]
+            async with downloader() as d:
+                with pytest.raises(Exception, match="下载失败"):
+                    await d.download(info["url"], str(tmp_path / "lib.jar"), retry=2, expected_sha1=sha1)
+                snapshot = d.metrics.snapshot()
+            # 每次尝试只发一个请求，重试不会层层嵌套
+            assert server.stats["requests"] == 3
+            assert snapshot["retries"] == 2
+            assert snapshot["files_failed"] == 1
+            assert not os.path.exists(tmp_path / "lib.jar.part")
+
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from file_util import atomic_write, atomic_write_json
+
+
+def test_concurrent_writers_of_one_target(tmp_path):
+    path = str(tmp_path / "cache" / "launch.cache.json")
+    payloads = [{"writer": i, "data": "x" * (64 * 1024)} for i in range(16)]
+
+    def write(payload):
+        for _ in range(20):
+            atomic_write_json(path, payload)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, payloads))
+    # 每次读到的都是某一个写入方的完整内容，没有遗留临时文件
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f) in payloads
+    assert os.listdir(tmp_path / "cache") == ["launch.cache.json"]
+
+
+def test_failed_write_keeps_old_content(tmp_path):
+    path = str(tmp_path / "data.bin")
+    with atomic_write(path, "wb") as f:
+        f.write(b"old")
+    try:
+        with atomic_write(path, "wb") as f:
+            f.write(b"half")
+            raise RuntimeError("中途出错")
+    except RuntimeError:
+        pass
+    with open(path, "rb") as f:
+        assert f.read() == b"old"
+    assert os.listdir(tmp_path) == ["data.bin"]
@@ -0,0 +1,141 @@
+import asyncio
+import os
+
+from game_log import GameLogPipeline, Log4jParser, RotatingLogFile
+
+EVENT = """<log4j:Event logger="net.minecraft.client.Minecraft" timestamp="1700000000123" level="ERROR" thread="Render thread">
+  <log4j:Message><![CDATA[Failed to load <texture> & "model"]]></log4j:Message>
+  <log4j:Throwable><![CDATA[java.lang.IllegalStateException: boom
+	at net.minecraft.client.Minecraft.run(Minecraft.java:1)
+]]></log4j:Throwable>
+</log4j:Event>"""
+
+ESCAPED_EVENT = """<log4j:Event logger="a&quot;b" timestamp="1700000000000" level="WARN" thread="Worker-1">
+  <log4j:Message>x &lt; y &amp;&amp; z &gt; 0</log4j:Message>
+</log4j:Event>"""
+
+
+class _Process:
+    def __init__(self, stdout: asyncio.StreamReader, stderr: asyncio.StreamReader):
+        self.stdout = stdout
+        self.stderr = stderr
+
+    async def wait(self) -> int:
+        return 0
+
+
+def _stream(data: bytes) -> asyncio.StreamReader:
+    stream = asyncio.StreamReader()
+    stream.feed_data(data)
+    stream.feed_eof()
+    return stream
+
+
+def test_parser_multiline_cdata_and_escaped_events():
+    parser = Log4jParser()
+    records = []
+    lines = ["Picked up _JAVA_OPTIONS: -Xmx2G", *EVENT.split("\n"), "[12:00:00] [main/WARN]: plain warning",
+             *ESCAPED_EVENT.split("\n")]
+    for line in lines:
+        records += parser.feed(line)
+    records += parser.flush()
+    assert [r.level for r in records] == ["INFO", "ERROR", "WARN", "WARN"]
+
+    error = records[1]
+    assert error.message == 'Failed to load <texture> & "model"'
+    assert error.throwable.startswith("java.lang.IllegalStateException: boom\n\tat net.minecraft")
+    assert (error.logger, error.thread, error.time) == ("net.minecraft.client.Minecraft", "Render thread",
+                                                        1700000000.123)
+    assert (records[2].thread, records[2].message) == ("main", "plain warning")
+    assert records[3].message == "x < y && z > 0"
+    assert records[3].logger == 'a"b'
+
+
+def test_parser_flushes_unfinished_event_as_plain_text():
+    parser = Log4jParser("ERROR", "stderr")
+    for line in EVENT.split("\n")[:2]:
+        assert parser.feed(line) == []
+    records = parser.flush()
+    assert [r.level for r in records] == ["ERROR", "ERROR"]
+    assert records[0].message.startswith("<log4j:Event")
+    assert parser.feed("after") and parser.flush() == []
+
+
+def test_rotating_log_file(tmp_path):
+    path = str(tmp_path / "logs" / "latest.log")
+    log_file = RotatingLogFile(path, max_bytes=100, backups=2)
+    # 每行连同换行符 10 字节，一个文件正好放 10 行
+    log_file.write([f"line {i:04d}" for i in range(35)])
+    log_file.close()
+
+    def read(name):
+        with open(str(tmp_path / "logs" / name), "r", encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def lines(start, stop):
+        return [f"line {i:04d}" for i in range(start, stop)]
+
+    # 最旧的一份（0-9）已被丢弃
+    assert sorted(os.listdir(str(tmp_path / "logs"))) == ["latest.1.log", "latest.2.log", "latest.log"]
+    assert read("latest.2.log") == lines(10, 20)
+    assert read("latest.1.log") == lines(20, 30)
+    assert read("latest.log") == lines(30, 35)
+    for name in os.listdir(str(tmp_path / "logs")):
+        assert os.path.getsize(str(tmp_path / "logs" / name)) <= 100
+
+    # 重新打开时接着已有的大小计算
+    log_file = RotatingLogFile(path, max_bytes=100, backups=2)
+    log_file.write(lines(35, 41))
+    log_file.close()
+    assert read("latest.1.log") == lines(30, 40)
+    assert read("latest.log") == lines(40, 41)
+
+
+def test_pipeline_batches_and_truncates():
+    async def main():
+        pipeline = GameLogPipeline(flush_interval=0.01, max_batch=5)
+        pipeline.set_min_level("WARN")
+        batches = []
+        pipeline.on_batch = lambda records, skipped: batches.append(([r.message for r in records], skipped))
+        levels = ["INFO", "WARN", "ERROR"]
+        stdout = "".join(f"[00:00:00] [main/{levels[i % 3]}]: m{i}\n" for i in range(30)) + "tail without newline"
+        process = _Process(_stream(stdout.encode()), _stream(b"Exception in thread main\n"))
+        assert await pipeline.run(process) == 0
+
+        assert pipeline.lines == 32 and len(pipeline.buffer) == 32
+        messages = [message for batch, _ in batches for message in batch]
+        assert all(len(batch) <= 5 for batch, _ in batches)
+        # 数据一次性到达：只有一批，显示最新的 5 条 WARN 以上的记录，其余计入 skipped
+        assert len(batches) == 1
+        visible = [f"m{i}" for i in range(30) if i % 3] + ["Exception in thread main"]
+        assert messages == visible[-5:]
+        assert batches[0][1] == len(visible) - 5
+        # 完整记录仍在缓冲区
+        assert len(pipeline.buffer.snapshot(min_level=3)) == len(visible)
+
+    asyncio.run(main())
+
+
+def test_pipeline_pauses_reading_until_written(tmp_path):
+    async def main():
+        pipeline = GameLogPipeline(str(tmp_path / "latest.log"), flush_interval=0.001)
+        pipeline.MAX_PENDING = 20
+        pipeline.READ_SIZE = 64
+        backlog = []
+        accept = pipeline._accept
+
+        def recording_accept(records):
+            accept(records)
+            backlog.append(len(pipeline._unwritten))
+
+        pipeline._accept = recording_accept
+        data = "".join(f"line {i:04d}\n" for i in range(1000)).encode()
+        await pipeline.run(_Process(_stream(data), _stream(b"")))
+
+        # 一次读取最多 64 字节（6 行），积压超过上限后等写完才继续读
+        assert max(backlog) < pipeline.MAX_PENDING + 7
+        with open(str(tmp_path / "latest.log"), "r", encoding="utf-8") as f:
+            written = [line.rsplit(": ", 1)[1] for line in f.read().splitlines()]
+        assert written == [f"line {i:04d}" for i in range(1000)]
+
+    asyncio.run(main())
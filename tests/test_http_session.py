@@ -0,0 +1,51 @@
+import asyncio
+
+from fake_mojang import VERSION_ID, local_installer
+from helpers import fake_server
+from http_session import SessionManager
+
+
+def test_installers_share_one_session(tmp_path):
+    async def main():
+        async with fake_server(assets=40, libraries=2) as server:
+            sessions = SessionManager(limit_per_host=4)
+            async with local_installer(server.base_url, str(tmp_path / "a"), str(tmp_path / "store-a"), 4,
+                                       sessions=sessions) as first:
+                session = sessions.session
+                assert first.session is session
+                await first.install(VERSION_ID)
+            # 外部提供的会话不随安装器关闭
+            assert sessions.session is session and not session.closed
+            created = sessions.stats.connections_created
+            reused = sessions.stats.connections_reused
+
+            server.reset_stats()
+            async with local_installer(server.base_url, str(tmp_path / "b"), str(tmp_path / "store-b"), 4,
+                                       sessions=sessions) as second:
+                assert second.session is session
+                await second.install(VERSION_ID)
+            # 第二次安装全部复用保持着的连接，不再握手
+            assert server.stats["requests"] > 40
+            assert sessions.stats.connections_created == created
+            assert sessions.stats.connections_reused - reused >= server.stats["requests"]
+
+            # 关闭时释放会话和连接池，之后可以重新打开
+            await sessions.close()
+            assert session.closed and sessions.session is None
+            async with sessions:
+                assert sessions.session is not session and not sessions.session.closed
+            assert sessions.session is None
+
+    asyncio.run(main())
+
+
+def test_installer_closes_its_own_session(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as server:
+            async with local_installer(server.base_url, str(tmp_path / ".minecraft"), str(tmp_path / "store"),
+                                       4) as installer:
+                session = installer.session
+                assert not session.closed
+            assert session.closed
+
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import os
+import os.path
+
+from fake_mojang import ASSET_INDEX_ID, VERSION_ID, local_installer
+from helpers import corrupt, fake_server, sha1_of
+
+
+def test_only_suspects_are_hashed_and_repaired(tmp_path):
+    async def main():
+        async with fake_server(assets=60, libraries=4) as server:
+            root = str(tmp_path / ".minecraft")
+            version = json.loads(server.blobs[f"/v1/packages/{VERSION_ID}.json"])
+            objects = json.loads(server.blobs[f"/v1/packages/{ASSET_INDEX_ID}.json"])["objects"]
+            hashes = sorted({info["hash"] for info in objects.values()})
+            asset_path = lambda h: os.path.join(root, "assets", "objects", h[:2], h)
+            library_path = lambda i: os.path.join(root, "libraries",
+                                                  version["libraries"][i]["downloads"]["artifact"]["path"])
+
+            async with local_installer(server.base_url, root, str(tmp_path / "store"), 16) as installer:
+                # 与是否支持 reflink 无关：实例文件都与对象库共用数据
+                installer.object_store.ingest_modes = ["hardlink", "copy"]
+                await installer.install(VERSION_ID)
+                report, repaired = await installer.verify(VERSION_ID)
+                # 刚安装完：全部按校验索引通过，不计算任何哈希
+                assert report.ok and repaired == 0
+                assert report.hashed == 0
+                assert report.checked == 1 + len(version["libraries"]) + 1 + len(hashes)
+
+                corrupt(asset_path(hashes[0]))  # 大小不变，只能靠哈希发现
+                os.remove(asset_path(hashes[1]))  # 缺失
+                with open(library_path(0), "r+b") as f:  # 大小不符，不用计算哈希
+                    f.truncate(1000)
+                touched = library_path(1)  # 内容没变，只是修改时间变了
+                os.utime(touched, ns=(0, os.stat(touched).st_mtime_ns + 10 ** 9))
+
+                server.reset_stats()
+                report, repaired = await installer.verify(VERSION_ID)
+                assert report.hashed == 2
+                assert [e.path for e in report.corrupt] == [library_path(0), asset_path(hashes[0])]
+                assert [e.path for e in report.missing] == [asset_path(hashes[1])]
+                # 修复计划按下载优先级排列，只包含缺失和损坏的文件
+                plan = [e.path for e in report.repair_plan]
+                assert plan[0] == library_path(0)
+                assert sorted(plan[1:]) == [asset_path(hashes[0]), asset_path(hashes[1])]
+                assert repaired == 3
+                # 被删除的资源从对象库重新链接；另外两个与对象库共用数据，对象也已损坏，只能重新下载
+                assert server.stats["requests"] == 2
+
+                for path, sha1 in ((library_path(0), version["libraries"][0]["downloads"]["artifact"]["sha1"]),
+                                   (asset_path(hashes[0]), hashes[0]), (asset_path(hashes[1]), hashes[1])):
+                    assert sha1_of(path) == sha1
+                # 修复过和重新计算过哈希的文件都已记入校验索引
+                report, _ = await installer.verify(VERSION_ID, repair=False)
+                assert report.ok and report.hashed == 0
+
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+import lzma
+import os
+import os.path
+import stat
+
+import pytest
+
+from download_scheduler import DownloadScheduler
+from helpers import downloader, fake_server
+from java_runtime import JavaRuntimeInstaller, installed_java, runtime_platform
+from library_resolver import PlatformInfo
+from object_store import ObjectStore
+
+PLATFORM = runtime_platform(PlatformInfo())
+COMPONENT = "java-runtime-gamma"
+
+
+def _runtime_files(modules: bytes, extra: int = 300) -> dict:
+    """{相对路径: 内容}，内容为 None 的是目录"""
+    files = {"bin": None, "lib": None, "bin/java": b"#!/bin/sh\necho java\n", "lib/modules": modules,
+             "lib/libjli.so": os.urandom(40 * 1024)}
+    files.update({f"lib/security/file{i}.dat": os.urandom(512 + i) for i in range(extra)})
+    return files
+
+
+def _publish(server, files: dict, links: dict, generation: int = 0) -> dict:
+    """在服务器上生成运行时清单和总清单，大文件同时提供 LZMA 压缩版本；返回 {相对路径: 下载信息}"""
+    manifest = {}
+    for rel_path, data in files.items():
+        if data is None:
+            manifest[rel_path] = {"type": "directory"}
+            continue
+        raw = server.add(f"/runtime/{generation}/{rel_path}", data)
+        entry = {"type": "file", "executable": rel_path.startswith("bin/"), "downloads": {"raw": raw}}
+        if len(data) > 64 * 1024:
+            entry["downloads"]["lzma"] = server.add(f"/runtime/{generation}/{rel_path}.lzma",
+                                                    lzma.compress(data, format=lzma.FORMAT_ALONE))
+        manifest[rel_path] = entry
+    for rel_path, target in links.items():
+        manifest[rel_path] = {"type": "link", "target": target}
+    info = server.add(f"/runtime/{generation}/manifest.json", json.dumps({"files": manifest}).encode())
+    server.add("/runtime/all.json", json.dumps({
+        PLATFORM: {COMPONENT: [{"manifest": info, "version": {"name": "17.0.8"}}]}
+    }).encode())
+    return manifest
+
+
+def _installer(d, runtime_folder_path: str, server) -> JavaRuntimeInstaller:
+    return JavaRuntimeInstaller(d.session, DownloadScheduler(d), runtime_folder_path,
+                                manifest_url=f"{server.base_url}/runtime/all.json")
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="需要可执行位和符号链接")
+def test_install_runtime_from_manifest(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as server:
+            modules = os.urandom(512 * 1024) + bytes(2 * 1024 * 1024)
+            files = _runtime_files(modules)
+            _publish(server, files, {"lib/libjli-link.so": "libjli.so"})
+            runtime_folder_path = str(tmp_path / "runtime")
+            root = os.path.join(runtime_folder_path, COMPONENT, PLATFORM)
+            async with downloader() as d:
+                installer = _installer(d, runtime_folder_path, server)
+                # 两个版本同时需要同一组件，只安装一次
+                first, second = await asyncio.gather(installer.install(COMPONENT), installer.install(COMPONENT))
+                await installer.scheduler.close()
+            assert first == second == installed_java(runtime_folder_path, COMPONENT, PLATFORM)
+            for rel_path, data in files.items():
+                if data is not None:
+                    assert _read(os.path.join(root, rel_path)) == data
+            assert os.stat(first).st_mode & stat.S_IXUSR
+            assert not os.stat(os.path.join(root, "lib/libjli.so")).st_mode & stat.S_IXUSR
+            assert os.readlink(os.path.join(root, "lib/libjli-link.so")) == "libjli.so"
+            # 每个文件只请求一次，大文件走 LZMA 压缩版本
+            assert server.stats["requests"] == 2 + len([d for d in files.values() if d is not None])
+            assert server.stats["bytes_sent"] < len(modules)
+
+            # 再次安装：清单未变化，不产生任何请求
+            server.reset_stats()
+            async with downloader() as d:
+                assert await _installer(d, runtime_folder_path, server).install(COMPONENT) == first
+            assert server.stats["requests"] == 0
+
+    asyncio.run(main())
+
+
+def test_manifest_update_replaces_changed_files(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as server:
+            files = _runtime_files(os.urandom(128 * 1024), extra=20)
+            _publish(server, files, {})
+            runtime_folder_path = str(tmp_path / "runtime")
+            root = os.path.join(runtime_folder_path, COMPONENT, PLATFORM)
+            async with downloader() as d:
+                await _installer(d, runtime_folder_path, server).install(COMPONENT)
+
+            # 新清单：删除一个文件、修改一个文件，其余不变
+            updated = dict(files)
+            del updated["lib/security/file0.dat"]
+            updated["lib/libjli.so"] = os.urandom(40 * 1024)
+            _publish(server, updated, {}, generation=1)
+            server.reset_stats()
+            async with downloader() as d:
+                installer = _installer(d, runtime_folder_path, server)
+                installer.INDEX_TTL = 0
+                await installer.install(COMPONENT)
+            assert not os.path.exists(os.path.join(root, "lib/security/file0.dat"))
+            assert _read(os.path.join(root, "lib/libjli.so")) == updated["lib/libjli.so"]
+            # 总清单、组件清单和修改过的文件
+            assert server.stats["requests"] == 3
+
+    asyncio.run(main())
+
+
+@pytest.mark.skipif(os.name == "nt", reason="需要可执行位和硬链接")
+def test_executable_bit_does_not_leak_into_store(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as server:
+            files = _runtime_files(os.urandom(16 * 1024), extra=5)
+            _publish(server, files, {})
+            store = ObjectStore(str(tmp_path / "store"))
+            store.ingest_modes = ["hardlink", "copy"]
+            store.link_modes = ["hardlink", "copy"]
+            java_sha1 = hashlib.sha1(files["bin/java"]).hexdigest()
+            for name in ("first", "second"):
+                async with downloader(object_store=store) as d:
+                    java = await _installer(d, str(tmp_path / name), server).install(COMPONENT)
+                assert os.stat(java).st_mode & stat.S_IXUSR
+                assert _read(java) == files["bin/java"]
+                # 可执行文件换成了独立的副本，对象库和另一个实例中的文件权限不变
+                assert not os.path.samefile(java, store.object_path(java_sha1))
+                assert not os.stat(store.object_path(java_sha1)).st_mode & stat.S_IXUSR
+            # 其他文件仍与对象库共用数据
+            lib = os.path.join(str(tmp_path / "second"), COMPONENT, PLATFORM, "lib/libjli.so")
+            assert os.path.samefile(lib, store.object_path(hashlib.sha1(files["lib/libjli.so"]).hexdigest()))
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import json
+import marshal
+import os
+
+import json_cache
+from asset_index import AssetIndex
+from json_cache import CACHE_SUFFIX
+from version_json import VersionJson
+
+
+def _write_json(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _no_parse(*args, **kwargs):
+    raise AssertionError("缓存有效时不应解析 JSON")
+
+
+def _index(names: list) -> dict:
+    return {"objects": {name: {"hash": f"{i:040x}", "size": i} for i, name in enumerate(names)}}
+
+
+def test_cache_is_used_until_json_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "17.json")
+    _write_json(path, _index(["minecraft/a.ogg", "minecraft/b.ogg"]))
+
+    first = AssetIndex.load(path)
+    assert os.path.exists(path + CACHE_SUFFIX)
+    assert first.json_sha1 == json_cache.file_sha1(path)
+
+    # 第二次读取命中缓存，不解析 JSON
+    with monkeypatch.context() as m:
+        m.setattr(json_cache.json, "loads", _no_parse)
+        cached = AssetIndex.load(path)
+    assert list(cached.entries()) == list(first.entries())
+
+    # JSON 更新后缓存失效：读到新内容，缓存按新的 sha1 重写
+    _write_json(path, _index(["minecraft/a.ogg", "minecraft/c.ogg", "minecraft/d.ogg"]))
+    updated = AssetIndex.load(path)
+    assert updated.names == ["minecraft/a.ogg", "minecraft/c.ogg", "minecraft/d.ogg"]
+    assert updated.json_sha1 == json_cache.file_sha1(path) != first.json_sha1
+    with open(path + CACHE_SUFFIX, "rb") as f:
+        assert marshal.loads(f.read())[1] == updated.json_sha1
+    monkeypatch.setattr(json_cache.json, "loads", _no_parse)
+    assert AssetIndex.load(path).names == updated.names
+
+
+def test_bad_cache_falls_back_to_json(tmp_path):
+    path = str(tmp_path / "1.20.1.json")
+    library = {"name": "org.lwjgl:lwjgl:3.3.1",
+               "downloads": {"artifact": {"path": "org/lwjgl/lwjgl/3.3.1/lwjgl-3.3.1.jar", "url": "https://x/",
+                                          "sha1": "0" * 40, "size": 1}}}
+    _write_json(path, {"id": "1.20.1", "mainClass": "net.minecraft.client.main.Main", "libraries": [library]})
+    expected = VersionJson.load(path).to_data()
+    cache_path = path + CACHE_SUFFIX
+
+    # 缓存文件损坏
+    with open(cache_path, "wb") as f:
+        f.write(b"\x00garbage")
+    assert VersionJson.load(path).to_data() == expected
+
+    # 缓存格式版本不同
+    with open(cache_path, "rb") as f:
+        _, json_sha1, data = marshal.loads(f.read())
+    with open(cache_path, "wb") as f:
+        f.write(marshal.dumps((VersionJson.CACHE_VERSION - 1, json_sha1, ("stale",))))
+    loaded = VersionJson.load(path)
+    assert loaded.to_data() == expected
+    assert loaded.libraries[0].name == "org.lwjgl:lwjgl:3.3.1"
+    # 两种情况都重写了有效的缓存
+    with open(cache_path, "rb") as f:
+        assert marshal.loads(f.read()) == (VersionJson.CACHE_VERSION, json_sha1, data)
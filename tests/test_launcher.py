@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import os.path
+import sys
+
+import pytest
+
+from launcher import LAUNCHER_NAME, Launcher, LaunchOptions
+from library_resolver import PlatformInfo
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="java 替身是带 shebang 的脚本")
+
+OS_NAME = PlatformInfo().name
+# 记录收到的参数和工作目录，代替 java
+STUB_JAVA = f"""#!{sys.executable}
+import json, os, sys
+with open(sys.argv[0] + ".calls", "a", encoding="utf-8") as f:
+    f.write(json.dumps({{"argv": sys.argv[1:], "cwd": os.getcwd()}}) + "\\n")
+"""
+
+LIBRARIES = [
+    {"name": "com.example:core:1.0",
+     "downloads": {"artifact": {"path": "com/example/core/1.0/core-1.0.jar", "url": "https://x/core.jar"}}},
+    # 其他系统的库不应进入 classpath
+    {"name": "com.example:other-os:1.0", "rules": [{"action": "allow", "os": {"name": "no-such-os"}}],
+     "downloads": {"artifact": {"path": "com/example/other-os/1.0/other-os-1.0.jar", "url": "https://x/o.jar"}}},
+    # natives 只解压，不进入 classpath
+    {"name": "org.lwjgl:lwjgl:3.3.1:natives-" + OS_NAME,
+     "downloads": {"artifact": {"path": f"org/lwjgl/lwjgl/3.3.1/lwjgl-3.3.1-natives-{OS_NAME}.jar",
+                                "url": "https://x/n.jar"}}},
+]
+
+MODERN = {
+    "id": "modern", "type": "release", "mainClass": "net.minecraft.client.main.Main", "assets": "5",
+    "libraries": LIBRARIES,
+    "arguments": {
+        "jvm": [{"rules": [{"action": "allow", "os": {"name": "no-such-os"}}], "value": "-XstartOnFirstThread"},
+                "-Djava.library.path=${natives_directory}", "-cp", "${classpath}"],
+        "game": ["--username", "${auth_player_name}", "--version", "${version_name}",
+                 "--gameDir", "${game_directory}", "--assetsDir", "${assets_root}",
+                 "--uuid", "${auth_uuid}", "--accessToken", "${auth_access_token}",
+                 {"rules": [{"action": "allow", "features": {"has_custom_resolution": True}}],
+                  "value": ["--width", "${resolution_width}", "--height", "${resolution_height}"]}],
+    },
+}
+
+LEGACY = {
+    "id": "legacy", "type": "release", "mainClass": "net.minecraft.client.main.Main", "assets": "1.8",
+    "libraries": LIBRARIES[:1],
+    "minecraftArguments": "--username ${auth_player_name} --version ${version_name} --gameDir ${game_directory}",
+}
+
+
+def _install(root: str, data: dict):
+    folder = os.path.join(root, "versions", data["id"])
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, f"{data['id']}.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _stub_java(tmp_path) -> str:
+    path = str(tmp_path / "java")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(STUB_JAVA)
+    os.chmod(path, 0o755)
+    return path
+
+
+async def _launch(launcher: Launcher, version: str, options: LaunchOptions) -> dict:
+    process = await launcher.launch(version, options)
+    assert await process.wait() == 0
+    with open(f"{options.java_path}.calls", "r", encoding="utf-8") as f:
+        return json.loads(f.readlines()[-1])
+
+
+def test_launch_assembles_modern_arguments(tmp_path):
+    async def main():
+        root = str(tmp_path / ".minecraft")
+        _install(root, MODERN)
+        game_directory = str(tmp_path / "instance")
+        options = LaunchOptions("Steve", java_path=_stub_java(tmp_path), max_memory_mb=1024, width=854, height=480,
+                                game_directory=game_directory)
+        call = await _launch(Launcher(root), "modern", options)
+        argv = call["argv"]
+        assert call["cwd"] == game_directory
+        assert argv[0] == "-Xmx1024m"
+        assert "-XstartOnFirstThread" not in argv
+        assert f"-Djava.library.path={os.path.join(root, 'versions', 'modern', 'modern-natives')}" in argv
+        classpath = argv[argv.index("-cp") + 1].split(os.pathsep)
+        assert classpath == [os.path.join(root, "libraries", "com/example/core/1.0/core-1.0.jar"),
+                             os.path.join(root, "versions", "modern", "modern.jar")]
+        game = argv[argv.index("net.minecraft.client.main.Main") + 1:]
+        assert game[:8] == ["--username", "Steve", "--version", "modern", "--gameDir", game_directory,
+                            "--assetsDir", os.path.join(root, "assets")]
+        assert game[-4:] == ["--width", "854", "--height", "480"]
+        assert not any("${" in arg for arg in argv)
+
+    asyncio.run(main())
+
+
+def test_launch_legacy_minecraft_arguments(tmp_path):
+    async def main():
+        root = str(tmp_path / ".minecraft")
+        _install(root, LEGACY)
+        options = LaunchOptions("Alex", java_path=_stub_java(tmp_path), max_memory_mb=None)
+        call = await _launch(Launcher(root), "legacy", options)
+        argv = call["argv"]
+        assert call["cwd"] == root
+        assert argv[:3] == [f"-Djava.library.path={os.path.join(root, 'versions', 'legacy', 'legacy-natives')}",
+                            f"-Dminecraft.launcher.brand={LAUNCHER_NAME}", "-Dminecraft.launcher.version=1.0"]
+        assert argv[-7:] == ["net.minecraft.client.main.Main", "--username", "Alex", "--version", "legacy",
+                             "--gameDir", root]
+
+    asyncio.run(main())
+
+
+def test_warm_launch_uses_template_until_json_changes(tmp_path):
+    async def main():
+        root = str(tmp_path / ".minecraft")
+        _install(root, MODERN)
+        options = LaunchOptions("Steve", java_path=_stub_java(tmp_path))
+        cold = await _launch(Launcher(root), "modern", options)
+        cache_path = os.path.join(root, "versions", "modern", "launch.cache.json")
+        assert os.path.exists(cache_path)
+
+        # 热启动只读模板：模板中改过的主类说明没有重新解析版本 JSON
+        with open(cache_path, "r", encoding="utf-8") as f:
+            template = json.load(f)
+        template["main_class"] = "from.the.Template"
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(template, f)
+        warm = await _launch(Launcher(root), "modern", options)
+        assert warm["argv"] == [a if a != "net.minecraft.client.main.Main" else "from.the.Template"
+                                for a in cold["argv"]]
+
+        # 版本 JSON 变化（sha1 不同）后重新生成模板
+        _install(root, dict(MODERN, mainClass="net.minecraft.client.Changed"))
+        changed = await _launch(Launcher(root), "modern", options)
+        assert "net.minecraft.client.Changed" in changed["argv"]
+
+    asyncio.run(main())
+
+
+def test_find_java_falls_back_to_java_home(tmp_path, monkeypatch):
+    root = str(tmp_path / ".minecraft")
+    _install(root, MODERN)
+    launcher = Launcher(root)
+    template = asyncio.run(launcher.load_template("modern", LaunchOptions("Steve")))
+    monkeypatch.delenv("JAVA_HOME", raising=False)
+    assert launcher.find_java(template) == "java"
+    monkeypatch.setenv("JAVA_HOME", str(tmp_path / "jdk"))
+    assert launcher.find_java(template) == os.path.join(str(tmp_path / "jdk"), "bin", "java")
+    # Windows 上与安装的运行时一样使用 javaw.exe
+    monkeypatch.setattr(os, "name", "nt")
+    assert launcher.find_java(template) == os.path.join(str(tmp_path / "jdk"), "bin", "javaw.exe")
+    monkeypatch.delenv("JAVA_HOME")
+    assert launcher.find_java(template) == "javaw.exe"
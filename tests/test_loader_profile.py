@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import json
+import os
+import os.path
+
+import pytest
+
+from fake_mojang import VERSION_ID, local_installer
+from helpers import fake_server
+from loader_profile import load_version
+from version_json import maven_path
+
+LOADER_ID = f"fabric-loader-0.15.0-{VERSION_ID}"
+
+
+def _maven(server, coordinate: str, sidecar: bool = True, wrong_sidecar: bool = False) -> dict:
+    """按 Maven 目录结构发布一个库，可选发布 .sha1 文件；返回 {"data", "sha1"}"""
+    data = os.urandom(200 * 1024)
+    path = maven_path(coordinate)
+    info = server.add(f"/maven/{path}", data)
+    if sidecar:
+        sha1 = hashlib.sha1(b"wrong").hexdigest() if wrong_sidecar else info["sha1"]
+        server.add(f"/maven/{path}.sha1", f"{sha1}  {os.path.basename(path)}\n".encode())
+    return {"data": data, "sha1": info["sha1"]}
+
+
+def _publish_loader(server, wrong_sidecar: bool = False) -> dict:
+    """模拟 Fabric meta 服务和 Maven 仓库，返回 {坐标: 库信息}"""
+    maven = f"{server.base_url}/maven/"
+    libraries = {
+        "net.fabricmc:fabric-loader:0.15.0": _maven(server, "net.fabricmc:fabric-loader:0.15.0",
+                                                    wrong_sidecar=wrong_sidecar),
+        f"net.fabricmc:intermediary:{VERSION_ID}": _maven(server, f"net.fabricmc:intermediary:{VERSION_ID}"),
+        # 配置中直接给出 sha1，仓库中没有 .sha1 文件
+        "org.ow2.asm:asm:9.6": _maven(server, "org.ow2.asm:asm:9.6", sidecar=False),
+        # 覆盖父版本中的 bench:lib0:1.0
+        "bench:lib0:2.0": _maven(server, "bench:lib0:2.0"),
+    }
+    profile_libraries = [{"name": name, "url": maven} for name in libraries]
+    profile_libraries[2]["sha1"] = libraries["org.ow2.asm:asm:9.6"]["sha1"]
+    profile = {
+        "id": LOADER_ID, "inheritsFrom": VERSION_ID, "type": "release",
+        "mainClass": "net.fabricmc.loader.impl.launch.knot.KnotClient",
+        "arguments": {"game": [], "jvm": ["-DFabricMcEmu= net.minecraft.client.main.Main "]},
+        "libraries": profile_libraries,
+    }
+    server.add(f"/fabric/v2/versions/loader/{VERSION_ID}", json.dumps([
+        {"loader": {"version": "0.15.1-beta.1", "stable": False}},
+        {"loader": {"version": "0.15.0", "stable": True}},
+    ]).encode())
+    server.add(f"/fabric/v2/versions/loader/{VERSION_ID}/0.15.0/profile/json", json.dumps(profile).encode())
+    return libraries
+
+
+async def _install_loader(server, root: str):
+    installer = local_installer(server.base_url, root, os.path.join(root, "store"), 16)
+    async with installer:
+        installer.loader_profiles.meta_urls["fabric"] = f"{server.base_url}/fabric/v2"
+        return await installer.install_loader("fabric", VERSION_ID)
+
+
+def test_install_fabric_profile_from_maven(tmp_path):
+    async def main():
+        async with fake_server() as server:
+            libraries = _publish_loader(server)
+            root = str(tmp_path / ".minecraft")
+            assert await _install_loader(server, root) == LOADER_ID
+
+            for name, info in libraries.items():
+                with open(os.path.join(root, "libraries", maven_path(name)), "rb") as f:
+                    assert f.read() == info["data"]
+            # 写入的配置中只有坐标的库已补全 downloads（sha1 来自 .sha1 文件或配置本身）
+            with open(os.path.join(root, "versions", LOADER_ID, f"{LOADER_ID}.json"), "r", encoding="utf-8") as f:
+                written = json.load(f)
+            assert {lib["name"]: lib["downloads"]["artifact"]["sha1"] for lib in written["libraries"]} == \
+                   {name: info["sha1"] for name, info in libraries.items()}
+
+            version = load_version(os.path.join(root, "versions"), LOADER_ID)
+            assert version.main_class == "net.fabricmc.loader.impl.launch.knot.KnotClient"
+            assert version.jar == VERSION_ID
+            assert version.arguments["jvm"][-1] == "-DFabricMcEmu= net.minecraft.client.main.Main "
+            names = [lib.name for lib in version.libraries]
+            assert names[:4] == list(libraries)
+            assert "bench:lib0:1.0" not in names and "bench:lib1:1.0" in names
+
+            # 再次安装：库都已校验，只请求配置和 .sha1 文件
+            server.reset_stats()
+            assert await _install_loader(server, root) == LOADER_ID
+            assert server.stats["bytes_sent"] < 200 * 1024
+
+    asyncio.run(main())
+
+
+def test_merged_profile_cache_follows_parent(tmp_path):
+    async def main():
+        async with fake_server() as server:
+            _publish_loader(server)
+            root = str(tmp_path / ".minecraft")
+            await _install_loader(server, root)
+        versions_folder_path = os.path.join(root, "versions")
+        first = load_version(versions_folder_path, LOADER_ID)
+        assert os.path.exists(os.path.join(versions_folder_path, LOADER_ID, f"{LOADER_ID}.merged.bin"))
+        # 缓存命中时结果相同
+        assert load_version(versions_folder_path, LOADER_ID).json_sha1 == first.json_sha1
+
+        # 父版本变化后重新合并
+        parent_path = os.path.join(versions_folder_path, VERSION_ID, f"{VERSION_ID}.json")
+        with open(parent_path, "r", encoding="utf-8") as f:
+            parent = json.load(f)
+        parent["assets"] = "changed"
+        with open(parent_path, "w", encoding="utf-8") as f:
+            json.dump(parent, f)
+        second = load_version(versions_folder_path, LOADER_ID)
+        assert second.assets == "changed"
+        assert second.json_sha1 != first.json_sha1
+
+    asyncio.run(main())
+
+
+def test_wrong_sidecar_fails_install(tmp_path):
+    async def main():
+        async with fake_server() as server:
+            _publish_loader(server, wrong_sidecar=True)
+            root = str(tmp_path / ".minecraft")
+            with pytest.raises(Exception, match="SHA1"):
+                await _install_loader(server, root)
+            assert not os.path.exists(os.path.join(root, "libraries", maven_path("net.fabricmc:fabric-loader:0.15.0")))
+
+    asyncio.run(main())
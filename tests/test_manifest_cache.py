@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import aiohttp
+
+from fake_mojang import VERSION_ID
+from helpers import fake_server
+from manifest_cache import ManifestCache
+
+MANIFEST_PATH = "/mc/game/version_manifest_v2.json"
+
+
+def test_revalidate_expire_and_fall_back_offline(tmp_path):
+    async def main():
+        cache_path = str(tmp_path / "version_manifest_v2.json")
+        async with aiohttp.ClientSession() as session:
+            async with fake_server(assets=0, libraries=0) as server:
+                url = f"{server.base_url}{MANIFEST_PATH}"
+
+                # 没有缓存时等待网络，写入缓存和 ETag
+                versions = await ManifestCache(session, url, cache_path).get()
+                assert [v["id"] for v in versions] == [VERSION_ID]
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    assert json.load(f)["etag"] == server.etags[MANIFEST_PATH]
+
+                # 缓存未过期：不访问网络
+                server.reset_stats()
+                assert await ManifestCache(session, url, cache_path).get() == versions
+                assert server.stats["requests"] == 0
+
+                # 缓存过期：立即返回旧数据，后台条件请求得到 304
+                cache = ManifestCache(session, url, cache_path, ttl=0)
+                updates = []
+                cache.on_update = updates.append
+                assert await cache.get() == versions
+                await cache._refresh_task
+                assert server.stats["requests"] == 1
+                assert server.stats["not_modified"] == 1
+                assert updates == []
+
+                # 服务器上的清单变化后，过期时的后台刷新拿到新清单
+                manifest = json.loads(server.blobs[MANIFEST_PATH])
+                manifest["versions"].append(dict(manifest["versions"][0], id="bench-1.1"))
+                server.add(MANIFEST_PATH, json.dumps(manifest).encode())
+                cache = ManifestCache(session, url, cache_path, ttl=0)
+                cache.on_update = updates.append
+                await cache.get()
+                await cache._refresh_task
+                assert [[v["id"] for v in update] for update in updates] == [[VERSION_ID, "bench-1.1"]]
+                assert cache.get_version("bench-1.1") is not None
+
+            # 离线：过期的缓存照常返回，后台刷新失败不影响结果，缓存文件保持不变
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            cache = ManifestCache(session, url, cache_path, ttl=0)
+            assert [v["id"] for v in await cache.get()] == [VERSION_ID, "bench-1.1"]
+            await cache._refresh_task
+            assert cache.get_version("bench-1.1") is not None
+            with open(cache_path, "r", encoding="utf-8") as f:
+                assert json.load(f) == cached
+
+    asyncio.run(main())
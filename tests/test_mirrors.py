@@ -0,0 +1,105 @@
+import asyncio
+import os
+from contextlib import AsyncExitStack
+
+from download_scheduler import DownloadScheduler
+from fake_mojang import ServerConfig
+from helpers import downloader, fake_server, sha1_of
+from mirrors import Mirror, MirrorSelector
+
+OFFICIAL = "https://piston-data.mojang.com"
+
+
+async def _servers(stack: AsyncExitStack, *configs: ServerConfig):
+    return [await stack.enter_async_context(fake_server(config, assets=0, libraries=0)) for config in configs]
+
+
+def _mirror(name: str, server) -> Mirror:
+    return Mirror(name, {OFFICIAL: f"{server.base_url}/data"})
+
+
+def _publish(servers, name: str, data: bytes) -> dict:
+    """所有服务器提供同一个文件，返回官方地址下的信息"""
+    for server in servers:
+        info = server.add(f"/data/{name}", data)
+    return {**info, "url": f"{OFFICIAL}/{name}"}
+
+
+def test_probe_ranks_mirrors_by_latency():
+    async def main():
+        async with AsyncExitStack() as stack:
+            slow, fast, broken = await _servers(stack, ServerConfig(latency=0.3), ServerConfig(latency=0.01),
+                                                ServerConfig(error_rate=1.0))
+            _publish([slow, fast, broken], "probe.json", b"{}" * 1024)
+            selector = MirrorSelector([_mirror("slow", slow), _mirror("broken", broken), _mirror("fast", fast)],
+                                      probe_url=f"{OFFICIAL}/probe.json")
+            async with downloader() as d:
+                await selector.probe(d.session)
+            assert [m.name for m in selector.ranked()] == ["fast", "slow", "broken"]
+            assert selector.mirrors[0].latency >= 0.3 > selector.mirrors[2].latency
+
+    asyncio.run(main())
+
+
+def test_failover_from_erroring_mirror(tmp_path):
+    async def main():
+        async with AsyncExitStack() as stack:
+            broken, healthy = await _servers(stack, ServerConfig(error_rate=1.0), ServerConfig())
+            info = _publish([broken, healthy], "lib.jar", os.urandom(256 * 1024))
+            first, second = _mirror("broken", broken), _mirror("healthy", healthy)
+            # 出错的镜像一开始排在前面
+            first.speed = 10 * 1024 * 1024
+            selector = MirrorSelector([first, second])
+            target = str(tmp_path / "lib.jar")
+            async with downloader(mirrors=selector) as d:
+                assert await d.download(info["url"], target, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert sha1_of(target) == info["sha1"]
+            assert broken.stats["errors_injected"] == 1
+            assert healthy.stats["bytes_sent"] == info["size"]
+            assert selector.ranked()[0] is second
+
+    asyncio.run(main())
+
+
+def test_failover_mid_download_keeps_received_data(tmp_path):
+    async def main():
+        async with AsyncExitStack() as stack:
+            dropping, healthy = await _servers(stack, ServerConfig(disconnect_rate=1.0), ServerConfig())
+            info = _publish([dropping, healthy], "client.jar", os.urandom(8 * 1024 * 1024))
+            first, second = _mirror("dropping", dropping), _mirror("healthy", healthy)
+            first.speed = 10 * 1024 * 1024
+            selector = MirrorSelector([first, second])
+            target = str(tmp_path / "client.jar")
+            async with downloader(mirrors=selector) as d:
+                assert await d.download(info["url"], target, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert sha1_of(target) == info["sha1"]
+            assert dropping.stats["disconnects_injected"] == 1
+            # 换到另一个镜像后用 Range 请求剩余部分，已收到的数据不再重新下载
+            assert healthy.stats["partial"] == 1
+            assert dropping.stats["bytes_sent"] + healthy.stats["bytes_sent"] <= info["size"] + 1024 * 1024
+
+    asyncio.run(main())
+
+
+def test_host_limit_applies_to_mirror_host(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as mirror_server:
+            # 两个官方主机改写到同一个镜像主机，并发上限按镜像主机计算
+            mirror = Mirror("mirror", {"https://libraries.minecraft.net": f"{mirror_server.base_url}/libraries",
+                                       "https://resources.download.minecraft.net": f"{mirror_server.base_url}/assets"})
+            files = []
+            for i in range(20):
+                for official, prefix in (("https://libraries.minecraft.net", "libraries"),
+                                         ("https://resources.download.minecraft.net", "assets")):
+                    info = mirror_server.add(f"/{prefix}/{i}.bin", os.urandom(64 * 1024))
+                    files.append({**info, "url": f"{official}/{i}.bin", "target": str(tmp_path / prefix / f"{i}.bin")})
+            async with downloader(mirrors=MirrorSelector([mirror])) as d:
+                scheduler = DownloadScheduler(d, max_concurrency=64, per_host_limit=2)
+                assert all(await asyncio.gather(*(
+                    scheduler.submit(f["url"], f["target"], expected_sha1=f["sha1"], size=f["size"]) for f in files
+                )))
+                await scheduler.close()
+            assert mirror_server.stats["requests"] == len(files)
+            assert mirror_server.stats["connections"] <= 2
+
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from typing import Optional
+
+import pytest
+
+from fake_mojang import VERSION_ID, local_installer
+from helpers import fake_server
+from modpack import ModpackError, ModpackInstaller, extract_overrides
+
+OVERRIDES = {"config/a.toml": b"a = 1\n", "config/b.toml": b"b = 2\n", "mods/patched.jar": b"patched"}
+CLIENT_OVERRIDES = {"options.txt": b"lang:zh_cn\n", "config/a.toml": b"a = client\n"}
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _entry(server, path: str, data: bytes, env: str = "required", sha512: Optional[str] = None) -> dict:
+    info = server.add(f"/data/{hashlib.sha1(path.encode()).hexdigest()}/{os.path.basename(path)}", data)
+    return {"path": path, "hashes": {"sha1": info["sha1"], "sha512": sha512 or hashlib.sha512(data).hexdigest()},
+            "env": {"client": env, "server": "required"}, "downloads": [info["url"]], "fileSize": info["size"]}
+
+
+def _write_mrpack(path: str, files: list):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("modrinth.index.json", json.dumps({
+            "formatVersion": 1, "game": "minecraft", "versionId": "1.0", "name": "tiny", "files": files,
+            "dependencies": {"minecraft": VERSION_ID},
+        }))
+        for name, data in OVERRIDES.items():
+            zf.writestr(f"overrides/{name}", data)
+        for name, data in CLIENT_OVERRIDES.items():
+            zf.writestr(f"client-overrides/{name}", data)
+
+
+def test_import_mrpack(tmp_path):
+    async def main():
+        async with fake_server(assets=5, libraries=1) as server:
+            mods = {"mods/a.jar": b"mod a" * 1000, "mods/b.jar": b"mod b" * 1000, "resourcepacks/c.zip": b"c" * 500}
+            files = [_entry(server, path, data) for path, data in mods.items()]
+            # 同一个文件在另一个路径再用一次
+            files.append(dict(files[0], path="mods/copy/a.jar"))
+            files.append(_entry(server, "mods/server-only.jar", b"server", env="unsupported"))
+            files.append(_entry(server, "mods/patched.jar", b"original"))
+            pack_path = str(tmp_path / "tiny.mrpack")
+            _write_mrpack(pack_path, files)
+
+            root = str(tmp_path / ".minecraft")
+            async with local_installer(server.base_url, root, str(tmp_path / "store"), 8) as installer:
+                await installer.install(VERSION_ID)
+                server.reset_stats()
+                result = await ModpackInstaller(installer).install(pack_path)
+                assert (result.version_id, result.missing_loader) == (VERSION_ID, None)
+                # 重复的文件只下载一次，服务端文件和被 overrides 覆盖的文件不下载
+                assert server.stats["requests"] == len(mods)
+                for path, data in dict(mods, **{"mods/copy/a.jar": mods["mods/a.jar"]}).items():
+                    assert _read(os.path.join(root, path)) == data
+                assert not os.path.exists(os.path.join(root, "mods/server-only.jar"))
+                # client-overrides 覆盖 overrides
+                for name, data in dict(OVERRIDES, **CLIENT_OVERRIDES).items():
+                    assert _read(os.path.join(root, name)) == data
+                assert result.overrides_written == len(OVERRIDES) + len(CLIENT_OVERRIDES)
+
+                # 再次导入：不下载、不解压，sha512 按记录跳过
+                server.reset_stats()
+                result = await ModpackInstaller(installer).install(pack_path)
+                assert server.stats["requests"] == 0
+                assert result.overrides_written == 0
+
+    asyncio.run(main())
+
+
+def test_sha512_mismatch(tmp_path):
+    async def main():
+        async with fake_server(assets=0, libraries=0) as server:
+            files = [_entry(server, "mods/good.jar", b"good"),
+                     _entry(server, "mods/bad.jar", b"bad", sha512="0" * 128)]
+            pack_path = str(tmp_path / "tiny.mrpack")
+            _write_mrpack(pack_path, files)
+            root = str(tmp_path / ".minecraft")
+            async with local_installer(server.base_url, root, str(tmp_path / "store"), 8) as installer:
+                with pytest.raises(ModpackError, match="mods/bad.jar"):
+                    await ModpackInstaller(installer).install(pack_path)
+            # 校验失败的文件被删除，其余部分照常完成
+            assert not os.path.exists(os.path.join(root, "mods/bad.jar"))
+            assert _read(os.path.join(root, "mods/good.jar")) == b"good"
+            assert _read(os.path.join(root, "options.txt")) == CLIENT_OVERRIDES["options.txt"]
+
+    asyncio.run(main())
+
+
+def test_extract_overrides_resumes(tmp_path):
+    pack_path = str(tmp_path / "tiny.mrpack")
+    _write_mrpack(pack_path, [])
+    game_directory = str(tmp_path / "game")
+    folders = ["overrides", "client-overrides"]
+
+    # 中断：在第一个文件之前停止
+    stop = threading.Event()
+    stop.set()
+    assert extract_overrides(pack_path, folders, game_directory, stop) == 0
+    assert not os.path.exists(game_directory)
+
+    assert extract_overrides(pack_path, folders, game_directory) == len(OVERRIDES) + len(CLIENT_OVERRIDES)
+    # 继续时只写入内容不一致的文件：被修改的文件，以及两个目录中内容不同的 config/a.toml（依次写入两次）
+    with open(os.path.join(game_directory, "config/b.toml"), "wb") as f:
+        f.write(b"b = 3\n")
+    assert extract_overrides(pack_path, folders, game_directory) == 3
+    assert _read(os.path.join(game_directory, "config/b.toml")) == OVERRIDES["config/b.toml"]
+    assert _read(os.path.join(game_directory, "config/a.toml")) == CLIENT_OVERRIDES["config/a.toml"]
+    assert not any(name.endswith(".part") for _, _, names in os.walk(game_directory) for name in names)
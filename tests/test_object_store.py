@@ -0,0 +1,100 @@
+import asyncio
+import os
+import os.path
+
+from helpers import corrupt, downloader, fake_server, sha1_of
+from object_store import ObjectStore
+from verify_index import VerifyIndex
+
+
+def _paths(tmp_path, *names):
+    return [str(tmp_path / name / "lib.jar") for name in names]
+
+
+def test_ingest_links_instead_of_copying(tmp_path):
+    async def main():
+        async with fake_server() as server:
+            info = server.add("/data/lib.jar", os.urandom(200 * 1024))
+            store = ObjectStore(str(tmp_path / "store"))
+            # 没有 reflink 的文件系统上放入对象库不多写一份数据
+            store.ingest_modes = ["hardlink", "copy"]
+            first, second = _paths(tmp_path, "a", "b")
+            async with downloader(object_store=store) as d:
+                assert await d.download(info["url"], first, expected_sha1=info["sha1"], expected_size=info["size"])
+            obj_path = store.object_path(info["sha1"])
+            assert os.path.samefile(first, obj_path)
+
+            # 实例文件被原地改写后对象随之损坏，生成下一个实例前发现并重新下载
+            corrupt(first)
+            server.reset_stats()
+            async with downloader(object_store=store) as d:
+                assert await d.download(info["url"], second, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert sha1_of(second) == info["sha1"]
+            assert server.stats["bytes_sent"] == info["size"]
+
+    asyncio.run(main())
+
+
+def test_repair_does_not_relink_corrupt_object(tmp_path):
+    async def main():
+        async with fake_server() as server:
+            info = server.add("/data/lib.jar", os.urandom(200 * 1024))
+            store = ObjectStore(str(tmp_path / "store"))
+            # 第二个实例与对象库共用同一个 inode
+            store.link_modes = ["hardlink", "copy"]
+            first, second, third = _paths(tmp_path, "a", "b", "c")
+            async with downloader(object_store=store) as d:
+                assert await d.download(info["url"], first, expected_sha1=info["sha1"], expected_size=info["size"])
+                assert await d.download(info["url"], second, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert os.path.samefile(second, store.object_path(info["sha1"]))
+
+            corrupt(second)
+            verify_index = VerifyIndex(str(tmp_path / "b" / "verify_index.json"), force=True)
+            server.reset_stats()
+            async with downloader(verify_index=verify_index, object_store=store) as d:
+                assert await d.download(info["url"], second, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert sha1_of(second) == info["sha1"]
+            assert server.stats["bytes_sent"] == info["size"]
+            assert verify_index.get_sha1(second) == info["sha1"]
+
+            # 之后从对象库生成的文件也是完好的
+            server.reset_stats()
+            async with downloader(object_store=store) as d:
+                assert await d.download(info["url"], third, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert sha1_of(third) == info["sha1"]
+            assert server.stats["bytes_sent"] == 0
+
+    asyncio.run(main())
+
+
+def test_corrupt_object_is_evicted_and_downloaded(tmp_path):
+    async def main():
+        async with fake_server() as server:
+            info = server.add("/data/lib.jar", os.urandom(200 * 1024))
+            store = ObjectStore(str(tmp_path / "store"))
+            first, second = _paths(tmp_path, "a", "b")
+            async with downloader(object_store=store) as d:
+                assert await d.download(info["url"], first, expected_sha1=info["sha1"], expected_size=info["size"])
+                corrupt(store.object_path(info["sha1"]), 1000)
+                server.reset_stats()
+                assert await d.download(info["url"], second, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert sha1_of(second) == info["sha1"]
+            assert server.stats["bytes_sent"] == info["size"]
+            assert sha1_of(store.object_path(info["sha1"])) == info["sha1"]
+
+    asyncio.run(main())
+
+
+def test_store_skipped_across_filesystems(tmp_path):
+    async def main():
+        async with fake_server() as server:
+            info = server.add("/data/lib.jar", os.urandom(64 * 1024))
+            store = ObjectStore(str(tmp_path / "store"))
+            store.same_filesystem = lambda path: False
+            target, = _paths(tmp_path, "a")
+            async with downloader(object_store=store) as d:
+                assert await d.download(info["url"], target, expected_sha1=info["sha1"], expected_size=info["size"])
+            assert not store.has(info["sha1"])
+            assert await store.materialize(info["sha1"], target) is None
+
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import os.path
+
+from aiohttp import web
+
+from download_journal import DownloadJournal
+from fake_mojang import ServerConfig
+from helpers import cancel_download, crash_download, downloader, fake_server, sha1_of
+
+# 小于分段下载的阈值，走单连接续传
+SIZE = 12 * 1024 * 1024
+
+
+def test_resume_after_disconnect(tmp_path):
+    async def main():
+        async with fake_server(ServerConfig(disconnect_rate=1.0)) as server:
+            info = server.add("/data/client.jar", os.urandom(SIZE))
+            target = str(tmp_path / "client.jar")
+
+            async def heal():
+                # 只断开一次，之后的请求正常返回
+                while not server.stats["disconnects_injected"]:
+                    await asyncio.sleep(0.005)
+                server.config.disconnect_rate = 0.0
+
+            healer = asyncio.create_task(heal())
+            async with downloader() as d:
+                assert await d.download(info["url"], target, expected_sha1=info["sha1"], expected_size=SIZE)
+                retries = d.metrics.snapshot()["retries"]
+            await healer
+            assert sha1_of(target) == info["sha1"]
+            assert retries == 1
+            assert server.stats["partial"] == 1
+            # 断开前已收到的数据不再重新下载（少于 1 MiB 时不记录进度）
+            assert server.stats["bytes_sent"] <= SIZE + 1024 * 1024
+
+    asyncio.run(main())
+
+
+def test_resume_after_crash(tmp_path):
+    async def main():
+        async with fake_server(ServerConfig(bandwidth=64 * 1024 * 1024)) as server:
+            info = server.add("/data/client.jar", os.urandom(SIZE))
+            target = str(tmp_path / "client.jar")
+            await crash_download(info, target, SIZE * 5 // 6)
+            journal = DownloadJournal.load(f"{target}.part", info["url"], info["sha1"])
+            assert journal is not None and journal.segments is None and journal.size > 0
+
+            server.reset_stats()
+            async with downloader() as d:
+                assert await d.download(info["url"], target, expected_sha1=info["sha1"], expected_size=SIZE)
+            assert sha1_of(target) == info["sha1"]
+            assert server.stats["partial"] == 1
+            assert server.stats["bytes_sent"] == SIZE - journal.size
+            assert not os.path.exists(f"{target}.part.json")
+
+    asyncio.run(main())
+
+
+def test_changed_etag_restarts_download(tmp_path):
+    async def main():
+        async with fake_server(ServerConfig(bandwidth=64 * 1024 * 1024)) as server:
+            # 没有 SHA1 时日志不会因为校验值变化而作废，只能靠 If-Range 发现文件已变化
+            info = {**server.add("/data/client.jar", os.urandom(SIZE)), "sha1": None}
+            target = str(tmp_path / "client.jar")
+            await cancel_download(info, target, SIZE // 2)
+            journal = DownloadJournal.load(f"{target}.part", info["url"])
+            assert journal is not None and journal.size > 0 and journal.etag is not None
+
+            data = os.urandom(SIZE)
+            server.add("/data/client.jar", data)
+            server.reset_stats()
+            async with downloader() as d:
+                assert await d.download(info["url"], target, expected_size=SIZE)
+            # 服务器因 ETag 不符返回 200，不能把新内容追加在旧数据后面
+            assert server.stats["partial"] == 0
+            assert server.stats["bytes_sent"] == SIZE
+            with open(target, "rb") as f:
+                assert f.read() == data
+
+    asyncio.run(main())
+
+
+def test_server_ignoring_range_restarts_download(tmp_path):
+    async def main():
+        data = os.urandom(4 * 1024 * 1024)
+        ranges = []
+
+        async def handle(request: web.Request) -> web.StreamResponse:
+            # 忽略 Range，总是返回完整的 200；第一次发送一半后断开
+            ranges.append(request.headers.get("Range"))
+            resp = web.StreamResponse(headers={"Content-Length": str(len(data))})
+            await resp.prepare(request)
+            if len(ranges) == 1:
+                await resp.write(data[:len(data) // 2])
+                request.transport.close()
+                return resp
+            await resp.write(data)
+            await resp.write_eof()
+            return resp
+
+        app = web.Application()
+        app.router.add_get("/client.jar", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        target = str(tmp_path / "client.jar")
+        try:
+            async with downloader() as d:
+                assert await d.download(f"http://127.0.0.1:{port}/client.jar", target, expected_size=len(data))
+        finally:
+            await runner.cleanup()
+        assert ranges[0] is None and ranges[1] is not None
+        with open(target, "rb") as f:
+            assert f.read() == data
+
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import os.path
+
+from download_journal import DownloadJournal
+from fake_mojang import ServerConfig
+from helpers import cancel_download, crash_download, downloader, fake_server, sha1_of
+
+SIZE = 24 * 1024 * 1024
+
+
+def _journal(target: str, info) -> DownloadJournal:
+    journal = DownloadJournal.load(f"{target}.part", info["url"], info["sha1"])
+    assert journal is not None and journal.segments is not None
+    return journal
+
+
+async def _resume(server, target: str, info) -> int:
+    """重新下载，返回服务器实际发送的字节数"""
+    server.reset_stats()
+    async with downloader() as d:
+        assert await d.download(info["url"], target, expected_sha1=info["sha1"], expected_size=info["size"])
+    assert sha1_of(target) == info["sha1"]
+    assert not os.path.exists(f"{target}.part") and not os.path.exists(f"{target}.part.json")
+    return server.stats["bytes_sent"]
+
+
+def test_segmented_download_resumes_after_cancel(tmp_path):
+    async def main():
+        # 限制带宽，保证取消时下载还在进行
+        async with fake_server(ServerConfig(bandwidth=64 * 1024 * 1024)) as server:
+            info = server.add("/data/client.jar", os.urandom(SIZE))
+            target = str(tmp_path / "client.jar")
+            await cancel_download(info, target, SIZE // 2)
+            assert server.stats["partial"] == 4
+            done = _journal(target, info).size
+            # 重复取消可能打断最后一次写入，记录的进度只会偏少
+            assert done >= SIZE // 3
+            assert await _resume(server, target, info) == SIZE - done
+
+    asyncio.run(main())
+
+
+def test_segmented_download_resumes_after_crash(tmp_path):
+    async def main():
+        async with fake_server(ServerConfig(bandwidth=64 * 1024 * 1024)) as server:
+            info = server.add("/data/client.jar", os.urandom(SIZE))
+            target = str(tmp_path / "client.jar")
+            await crash_download(info, target, SIZE * 3 // 4)
+            # 崩溃前至少保存过一次日志
+            done = _journal(target, info).size
+            assert done > 0
+            assert await _resume(server, target, info) == SIZE - done
+
+    asyncio.run(main())
+
+
+def test_changed_file_restarts_segmented_download(tmp_path):
+    async def main():
+        async with fake_server(ServerConfig(bandwidth=64 * 1024 * 1024)) as server:
+            info = server.add("/data/client.jar", os.urandom(SIZE))
+            target = str(tmp_path / "client.jar")
+            await cancel_download(info, target, SIZE // 2)
+            # 服务器上的文件变了（ETag 不同），If-Range 让服务器返回 200，只能从头下载
+            info = server.add("/data/client.jar", os.urandom(SIZE))
+            assert await _resume(server, target, info) == SIZE
+
+    asyncio.run(main())
@@ -86,6 +86,10 @@ class Library(TypedDict, total=False):
     rules: List[LibraryRule]
     extract: LibraryExtract
     natives: LibraryNatives
+    # 加载器的库可能只有 Maven 坐标（name）和仓库地址
+    url: str
+    sha1: str
+    size: int
 
 
 class JavaVersion(TypedDict, total=False):
@@ -121,6 +125,9 @@ class Arguments(TypedDict):
 
 
 class VersionJsonInfo(TypedDict, total=False):
+    # 加载器配置：继承的版本和使用的客户端 jar
+    inheritsFrom: str
+    jar: str
     assetIndex: AssetIndexInfo
     assets: str
     complianceLevel: Optional[int]
@@ -136,3 +143,56 @@ class VersionJsonInfo(TypedDict, total=False):
     time: str
     type: Literal['release', 'snapshot', 'old_alpha', 'old_beta']
     logging: Optional[Logging]
+
+
+class ModrinthFileEnv(TypedDict, total=False):
+    client: Literal['required', 'optional', 'unsupported']
+    server: Literal['required', 'optional', 'unsupported']
+
+
+class ModrinthFile(TypedDict, total=False):
+    path: str
+    hashes: Dict[str, str]
+    env: ModrinthFileEnv
+    downloads: List[str]
+    fileSize: int
+
+
+class ModrinthIndex(TypedDict, total=False):
+    # .mrpack 中的 modrinth.index.json
+    formatVersion: int
+    game: str
+    versionId: str
+    name: str
+    summary: str
+    files: List[ModrinthFile]
+    # minecraft、fabric-loader、quilt-loader、forge、neoforge -> 版本
+    dependencies: Dict[str, str]
+
+
+class CurseForgeModLoader(TypedDict):
+    id: str
+    primary: bool
+
+
+class CurseForgeMinecraft(TypedDict):
+    version: str
+    modLoaders: List[CurseForgeModLoader]
+
+
+class CurseForgeManifestFile(TypedDict, total=False):
+    projectID: int
+    fileID: int
+    required: bool
+
+
+class CurseForgeManifest(TypedDict, total=False):
+    # CurseForge 整合包 zip 中的 manifest.json
+    minecraft: CurseForgeMinecraft
+    manifestType: str
+    manifestVersion: int
+    name: str
+    version: str
+    author: str
+    files: List[CurseForgeManifestFile]
+    overrides: str
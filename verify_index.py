@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+import os.path
+from typing import Dict, Optional
+
+from file_util import atomic_write_json
+
+
+class VerifyIndex:
+    """
+    持久化的 SHA1 校验索引。
+    以文件路径为键，记录上次校验通过时的 size、mtime_ns、inode 和 sha1。
+    stat 信息没有变化的文件直接视为已校验，不再重新读取计算哈希。
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_path: str, force: bool = False, autosave_every: int = 1000):
+        self.index_path = index_path
+        # force=True 时忽略已有记录，所有文件都重新计算哈希（但仍会更新索引）
+        self.force = force
+        self.autosave_every = autosave_every
+        self._entries: Dict[str, list] = {}
+        self._dirty = 0
+        self._save_lock = asyncio.Lock()
+        self._autosave_task: Optional[asyncio.Task] = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self._entries = data.get("entries", {})
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _stat_tuple(st: os.stat_result) -> list:
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def is_verified(self, path: str, expected_sha1: str, st: Optional[os.stat_result] = None) -> bool:
+        """
+        文件自上次校验后未被修改，且当时的 SHA1 与期望一致时返回 True。
+        调用方已经 stat 过时可以传入 st，避免重复系统调用。
+        """
+        if self.force:
+            return False
+        entry = self._entries.get(self._key(path))
+        if entry is None or entry[3] != expected_sha1:
+            return False
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return False
+        return entry[:3] == self._stat_tuple(st)
+
+    def record(self, path: str, sha1: str):
+        """记录一个刚校验通过的文件"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self._entries[self._key(path)] = self._stat_tuple(st) + [sha1]
+        self._dirty += 1
+        if self._dirty >= self.autosave_every:
+            if self._autosave_task is not None and not self._autosave_task.done():
+                return
+            try:
+                self._autosave_task = asyncio.get_running_loop().create_task(self.save())
+            except RuntimeError:
+                self._dirty = 0
+                self._save_sync(dict(self._entries))
+
+    def discard(self, path: str):
+        if self._entries.pop(self._key(path), None) is not None:
+            self._dirty += 1
+
+    def _save_sync(self, entries: Dict[str, list]):
+        atomic_write_json(self.index_path, {"version": self.VERSION, "entries": entries}, separators=(",", ":"))
+
+    async def save(self):
+        """把索引写回磁盘（先写临时文件再原子替换）"""
+        async with self._save_lock:
+            if self._dirty:
+                self._dirty = 0
+                # 在事件循环线程里拷贝一份，避免写盘时字典被并发修改
+                await asyncio.to_thread(self._save_sync, dict(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        return self._key(path) in self._entries
+
+    def get_sha1(self, path: str) -> Optional[str]:
+        entry = self._entries.get(self._key(path))
+        return entry[3] if entry else None
@@ -0,0 +1,177 @@
+import sys
+from typing import Dict, List, Optional
+
+import typed_dict
+from json_cache import load_json_model
+
+# 只有 Maven 坐标、没有写明仓库的库从这里下载
+LIBRARIES_BASE_URL = "https://libraries.minecraft.net/"
+
+
+def maven_path(coordinate: str) -> Optional[str]:
+    """group:artifact:version[:classifier][@扩展名] -> group/路径/artifact/version/artifact-version[-classifier].jar"""
+    coordinate, _, extension = coordinate.partition("@")
+    parts = coordinate.split(":")
+    if len(parts) < 3 or not all(parts[:3]):
+        return None
+    group, artifact, version = parts[:3]
+    classifier = f"-{parts[3]}" if len(parts) > 3 and parts[3] else ""
+    return f"{group.replace('.', '/')}/{artifact}/{version}/{artifact}-{version}{classifier}.{extension or 'jar'}"
+
+
+class FileRef:
+    """版本 JSON 中的一个可下载文件（客户端、资源索引、日志配置、库）"""
+
+    __slots__ = ("id", "path", "url", "sha1", "size")
+
+    def __init__(self, url: str, sha1: Optional[str], size: Optional[int], id: Optional[str] = None,
+                 path: Optional[str] = None):
+        self.url = url
+        self.sha1 = sha1
+        self.size = size
+        self.id = id
+        self.path = path
+
+    @classmethod
+    def from_json(cls, data: Optional[Dict]) -> Optional["FileRef"]:
+        if not data:
+            return None
+        return cls(data["url"], data.get("sha1"), data.get("size"), data.get("id"), data.get("path"))
+
+    def to_data(self) -> tuple:
+        return self.url, self.sha1, self.size, self.id, self.path
+
+    @classmethod
+    def from_data(cls, data: Optional[tuple]) -> Optional["FileRef"]:
+        return cls(*data) if data is not None else None
+
+
+def _ref_data(ref: Optional[FileRef]) -> Optional[tuple]:
+    return ref.to_data() if ref is not None else None
+
+
+class LibraryEntry:
+    __slots__ = ("name", "rules", "artifact", "classifiers", "natives", "extract_excludes")
+
+    def __init__(self, name: str, rules: Optional[List[typed_dict.LibraryRule]], artifact: Optional[FileRef],
+                 classifiers: Dict[str, FileRef], natives: Dict[str, str], extract_excludes: List[str]):
+        self.name = name
+        # 规则保持原样，交给 RuleEvaluator 计算
+        self.rules = rules
+        self.artifact = artifact
+        self.classifiers = classifiers
+        self.natives = natives
+        self.extract_excludes = extract_excludes
+
+    @classmethod
+    def from_json(cls, data: typed_dict.Library) -> "LibraryEntry":
+        downloads = data.get("downloads") or {}
+        classifiers = {key: FileRef.from_json(value) for key, value in (downloads.get("classifiers") or {}).items()}
+        natives = dict(data.get("natives") or {})
+        artifact = FileRef.from_json(downloads.get("artifact"))
+        if artifact is None and not natives:
+            artifact = cls.maven_artifact(data)
+        return cls(sys.intern(data.get("name", "")), data.get("rules") or None, artifact, classifiers, natives,
+                   list((data.get("extract") or {}).get("exclude", [])))
+
+    @staticmethod
+    def maven_artifact(data: typed_dict.Library) -> Optional[FileRef]:
+        """
+        加载器（Fabric、Quilt、旧版 Forge）的库只给出 Maven 坐标和仓库地址。
+        url 为空字符串表示文件由加载器安装程序放在本地，没有下载地址。
+        """
+        path = maven_path(data.get("name", ""))
+        if path is None:
+            return None
+        base_url = data.get("url", LIBRARIES_BASE_URL)
+        url = f"{base_url.rstrip('/')}/{path}" if base_url else ""
+        return FileRef(url, data.get("sha1"), data.get("size"), path=path)
+
+    def to_data(self) -> tuple:
+        return (self.name, self.rules, _ref_data(self.artifact),
+                {key: ref.to_data() for key, ref in self.classifiers.items()}, self.natives, self.extract_excludes)
+
+    @classmethod
+    def from_data(cls, data: tuple) -> "LibraryEntry":
+        name, rules, artifact, classifiers, natives, extract_excludes = data
+        return cls(name, rules, FileRef.from_data(artifact),
+                   {key: FileRef.from_data(value) for key, value in classifiers.items()}, natives, extract_excludes)
+
+
+class VersionJson:
+    """
+    版本 JSON（versions/<id>/<id>.json）中安装和启动用到的字段。
+    inherits_from 不为空时只是加载器配置的一层，完整的版本由 loader_profile.load_version 合并得到。
+    通过 VersionJson.load 读取时结果缓存在 <id>.json.bin；
+    libraries 只在第一次访问时才从缓存数据构造，库解析结果命中缓存时不会用到。
+    """
+
+    __slots__ = ("json_sha1", "id", "inherits_from", "jar", "type", "main_class", "assets", "asset_index", "client",
+                 "logging_argument", "logging_file", "java_component", "minecraft_arguments", "arguments",
+                 "_libraries", "_libraries_data")
+
+    CACHE_VERSION = 2
+
+    def __init__(self, json_sha1: str, id: str, inherits_from: Optional[str], jar: str, type: str, main_class: str,
+                 assets: str, asset_index: Optional[FileRef], client: Optional[FileRef],
+                 logging_argument: Optional[str], logging_file: Optional[FileRef], java_component: Optional[str],
+                 minecraft_arguments: Optional[str], arguments: Optional[typed_dict.Arguments],
+                 libraries: Optional[List[LibraryEntry]] = None, libraries_data: Optional[list] = None):
+        self.json_sha1 = json_sha1
+        self.id = id
+        self.inherits_from = inherits_from
+        # 客户端 jar 所在的版本：加载器版本使用原版的 versions/<jar>/<jar>.jar
+        self.jar = jar
+        self.type = type
+        self.main_class = main_class
+        self.assets = assets
+        self.asset_index = asset_index
+        self.client = client
+        self.logging_argument = logging_argument
+        self.logging_file = logging_file
+        # javaVersion.component，旧版本没有时为 None
+        self.java_component = java_component
+        self.minecraft_arguments = minecraft_arguments
+        self.arguments = arguments
+        self._libraries = libraries
+        self._libraries_data = libraries_data
+
+    @property
+    def libraries(self) -> List[LibraryEntry]:
+        if self._libraries is None:
+            self._libraries = [LibraryEntry.from_data(item) for item in self._libraries_data or []]
+            self._libraries_data = None
+        return self._libraries
+
+    @classmethod
+    def from_json(cls, data: typed_dict.VersionJsonInfo, json_sha1: str = "") -> "VersionJson":
+        client_logging = (data.get("logging") or {}).get("client") or {}
+        asset_index = data.get("assetIndex")
+        return cls(
+            json_sha1, data.get("id", ""), data.get("inheritsFrom"), data.get("jar") or data.get("id", ""),
+            data.get("type", "release"), data.get("mainClass", ""),
+            data.get("assets") or (asset_index or {}).get("id", ""), FileRef.from_json(asset_index),
+            FileRef.from_json((data.get("downloads") or {}).get("client")), client_logging.get("argument"),
+            FileRef.from_json(client_logging.get("file")), (data.get("javaVersion") or {}).get("component"),
+            data.get("minecraftArguments"), data.get("arguments"),
+            [LibraryEntry.from_json(lib) for lib in data.get("libraries", [])]
+        )
+
+    def to_data(self) -> tuple:
+        libraries = (self._libraries_data if self._libraries is None
+                     else [lib.to_data() for lib in self._libraries])
+        return (self.id, self.inherits_from, self.jar, self.type, self.main_class, self.assets,
+                _ref_data(self.asset_index), _ref_data(self.client), self.logging_argument,
+                _ref_data(self.logging_file), self.java_component, self.minecraft_arguments, self.arguments, libraries)
+
+    @classmethod
+    def from_data(cls, data: tuple, json_sha1: str) -> "VersionJson":
+        (id_, inherits_from, jar, type_, main_class, assets, asset_index, client, logging_argument, logging_file,
+         java_component, minecraft_arguments, arguments, libraries) = data
+        return cls(json_sha1, id_, inherits_from, jar, type_, main_class, assets, FileRef.from_data(asset_index),
+                   FileRef.from_data(client), logging_argument, FileRef.from_data(logging_file), java_component,
+                   minecraft_arguments, arguments, libraries_data=libraries)
+
+    @classmethod
+    def load(cls, path: str, raw: Optional[bytes] = None) -> "VersionJson":
+        return load_json_model(cls, path, raw)